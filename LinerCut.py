@@ -3,25 +3,24 @@ import os
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QGroupBox, QLineEdit, QTableWidget,
                              QHeaderView, QMessageBox, QFileDialog, QLabel, QItemDelegate, QTableWidgetItem,
-                             QProgressDialog, QDesktopWidget, QSystemTrayIcon, QMenu, QAction)
-from PyQt5.QtGui import QFont, QIntValidator, QIcon, QPalette, QColor, QPixmap, QClipboard
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QMutex, QWaitCondition
+                             QProgressDialog, QDesktopWidget, QSystemTrayIcon, QMenu, QAction, QComboBox, QCheckBox)
+from PyQt5.QtGui import QFont, QIntValidator, QDoubleValidator, QIcon, QPalette, QColor, QPixmap, QClipboard
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QMutex
 import pandas as pd
-import itertools
-from ortools.linear_solver import pywraplp
-from collections import defaultdict
 import datetime
-import math
+import time
 import io
-import openpyxl
-from openpyxl.styles import Border, Side, PatternFill, Font, Alignment
+import contextlib
+import multiprocessing
+from LinerCutEngine import (PATTERN_MEMORY_BUDGET_MB, PATTERN_TIME_BUDGET, WORKER_CANCEL_GRACE, session_worker,
+                            default_report_path)
+from LinerCutService import ServiceClient, ServiceBusy
 
 
 # 定义全局变量
 stock_data = []
 demands_data = []
 
-
 class IntegerDelegate(QItemDelegate):
     """
     A delegate class to ensure only integers can be entered into the table cells.
@@ -44,41 +43,240 @@ class IntegerDelegate(QItemDelegate):
         model.setData(index, value, Qt.EditRole)
 
 
+class SessionProcess:
+    """
+    界面会话的常驻计算子进程（LinerCutEngine.session_worker）：第一次计算时启动，之后一直保留。
+    子进程中的 SolveSession 记住上一次的方案、模式和模型，订单小改后再计算时增量求解。
+    子进程被强制结束或意外退出后，下一次计算重新启动（增量状态随之丢失）。
+    """
+    def __init__(self):
+        self.process = None
+        self.connection = None
+
+    def connect(self):
+        """返回与子进程通信的管道，子进程没有运行时先启动"""
+        if not self.is_alive():
+            self.close()
+            # 子进程还要用进程池枚举模式，不能设为 daemon；界面进程退出时管道关闭，子进程随之结束
+            context = multiprocessing.get_context("spawn")
+            self.connection, child_connection = context.Pipe()
+            self.process = context.Process(target=session_worker, args=(child_connection,))
+            self.process.start()
+            child_connection.close()
+        return self.connection
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def terminate(self):
+        """强制结束子进程（取消后没有按时结束，或意外中断了通信），下一次计算重新启动"""
+        if self.is_alive():
+            self.process.terminate()
+        self.close()
+
+    def close(self):
+        """关闭管道让子进程退出，WORKER_CANCEL_GRACE 秒内没有退出则强制结束"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self.process is not None:
+            self.process.join(WORKER_CANCEL_GRACE)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.process = None
+
+
 class OptimizationThread(QThread):
     """
     A QThread class to run the optimization in a separate thread,
     allowing the GUI to remain responsive and display progress.
+
+    计算本身在独立的子进程中运行（SessionProcess），枚举模式等纯 Python 计算不再占用界面进程的 GIL。
+    给出 session_process 时使用界面会话的常驻子进程（增量求解），否则本次计算单独启动一个、算完关闭。
+    本线程只负责把任务发给子进程、经管道收发消息，并把进度、结果转成原来的信号；取消时先通知子进程中断求解，
+    WORKER_CANCEL_GRACE 秒内没有结束则强制结束子进程。
+    给出 server（优化服务的地址，见 LinerCutService.py）时改为把任务发给服务器计算，轮询进度后下载报告。
     """
     progress_update = pyqtSignal(int)  # Signal to update progress bar
+    status_update = pyqtSignal(str)  # 当前阶段和预计剩余时间
     result_ready = pyqtSignal(str)  # Signal to send the result (path to the Excel file) or error message
     error_signal = pyqtSignal(str)
+    incumbent_ready = pyqtSignal(int)  # 取消时已有可行方案，参数为其原材料根数，等待用户选择是否生成报告
 
-    def __init__(self, kerf_width, solver_time_limit, max_cut_types):
+    def __init__(self, kerf_width, solver_time_limit, max_cut_types, engine="enumerate", dominance=False,
+                 backend="SCIP", num_workers=1, mip_gap=0.0, memory_budget=PATTERN_MEMORY_BUDGET_MB,
+                 time_budget=PATTERN_TIME_BUDGET, auto_fallback=True, detail_mode="bars", detail_csv=False,
+                 server=None, reuse_result=False, session_process=None):
         super().__init__()
         self.kerf_width = kerf_width
         self.solver_time_limit = solver_time_limit
         self.max_cut_types = max_cut_types
+        self.engine = engine
+        self.dominance = dominance
+        self.backend = backend
+        self.num_workers = num_workers
+        self.mip_gap = mip_gap
+        self.memory_budget = memory_budget
+        self.time_budget = time_budget
+        self.auto_fallback = auto_fallback
+        self.detail_mode = detail_mode
+        self.detail_csv = detail_csv
+        self.server = server
+        self.reuse_result = reuse_result
+        self.session_process = session_process
         self.error_message = None  # Store error message if optimization fails
         self.mutex = QMutex()
-        self.wait_condition = QWaitCondition()
         self.cancelled = False
+        self.incumbent_answered = False
+        self.keep_incumbent = False
+        self.notices = []  # 预处理等阶段给用户的提示，优化结束时一并显示
+        self.connection = None  # 与子进程通信的管道
+        self.kill_deadline = None  # 取消后强制结束子进程的时间
 
     def run(self):
+        if self.server:
+            self.run_remote()
+            return
+        worker = self.session_process or SessionProcess()
+        options = dict(engine=self.engine, dominance=self.dominance, backend=self.backend, num_workers=self.num_workers,
+                       mip_gap=self.mip_gap, memory_budget=self.memory_budget, time_budget=self.time_budget,
+                       auto_fallback=self.auto_fallback, detail_mode=self.detail_mode, detail_csv=self.detail_csv)
+        if self.reuse_result:
+            options["result_cache"] = True
+        job = ({"kerf_width": self.kerf_width, "stock": stock_data, "demands": demands_data},
+               (self.solver_time_limit, self.max_cut_types), options)
+        output_path = None
+        finished = False  # 子进程已发回本次任务的最后一条消息
         try:
-            output_path = main(self.kerf_width, self.solver_time_limit, self.max_cut_types, self.progress_update, self.mutex, self.wait_condition, self)
+            connection = worker.connect()
+            connection.send(("solve", job))
+            self.mutex.lock()
+            self.connection = connection
+            if self.cancelled:
+                self._send(("cancel", None))  # 任务发出前就已取消
+            self.mutex.unlock()
+            while not finished:
+                if connection.poll(0.1):
+                    try:
+                        kind, value = connection.recv()
+                    except EOFError:
+                        break
+                    if kind == "progress":
+                        self.progress_update.emit(value)
+                    elif kind == "status":
+                        self.status_update.emit(value)
+                    elif kind == "notices":
+                        self.notices = value
+                    elif kind == "incumbent":
+                        # 子进程在等用户选择，不能强制结束
+                        self.mutex.lock()
+                        self.kill_deadline = None
+                        self.mutex.unlock()
+                        self.incumbent_ready.emit(value)
+                    elif kind == "result":
+                        output_path = value
+                        finished = True
+                    elif kind == "error":
+                        finished = True
+                        raise RuntimeError(value)
+                elif not worker.is_alive():
+                    break
+                self.mutex.lock()
+                expired = self.kill_deadline is not None and time.monotonic() > self.kill_deadline
+                self.mutex.unlock()
+                if expired:
+                    print("子进程未在取消后结束，强制结束")
+                    worker.terminate()
+                    break
             if not self.cancelled:
+                if not finished:
+                    raise RuntimeError(f"计算进程意外退出（退出码 {worker.process.exitcode}）")
                 self.result_ready.emit(output_path)  # Emit the path to the Excel file
         except Exception as e:
             self.error_message = str(e)  # Store the error message
             self.error_signal.emit(self.error_message)  # Emit the error message
             print(f"OptimizationThread.run error: {e}")
+        finally:
+            self.mutex.lock()
+            self.connection = None
+            self.mutex.unlock()
+            if not finished:
+                worker.terminate()  # 任务没有正常结束，子进程的状态不可靠
+            elif self.session_process is None:
+                worker.close()
+
+    def run_remote(self):
+        """把任务发给优化服务：排队已满时按服务器建议的时间重试，完成后把报告下载到桌面"""
+        client = ServiceClient(self.server)
+        data = {"kerf_width": self.kerf_width, "stock": stock_data, "demands": demands_data}
+        job_id = None
+        try:
+            while job_id is None and not self.cancelled:
+                try:
+                    job_id = client.submit(data, self.solver_time_limit, self.max_cut_types, engine=self.engine,
+                                           dominance=self.dominance, backend=self.backend,
+                                           num_workers=self.num_workers, mip_gap=self.mip_gap,
+                                           memory_budget=self.memory_budget, time_budget=self.time_budget,
+                                           auto_fallback=self.auto_fallback, detail_mode=self.detail_mode,
+                                           reuse_result=self.reuse_result)
+                except ServiceBusy as e:
+                    self.status_update.emit(f"服务器繁忙，{e.retry_after} 秒后重试")
+                    deadline = time.monotonic() + e.retry_after
+                    while time.monotonic() < deadline and not self.cancelled:
+                        time.sleep(0.1)
+            while not self.cancelled:
+                status = client.status(job_id)
+                if status["status"] == "queued":
+                    self.status_update.emit(f"服务器排队中，前面还有 {status.get('position', 0)} 个任务")
+                elif status["status"] == "running":
+                    self.progress_update.emit(status["progress"])
+                    self.status_update.emit(f"服务器计算中 {status['progress']}%")
+                elif status["status"] == "done":
+                    self.notices = status["result"]["notices"]
+                    output_path = client.download_report(job_id, default_report_path())
+                    self.progress_update.emit(100)
+                    self.result_ready.emit(output_path)
+                    return
+                else:
+                    raise RuntimeError(status["error"] or "任务已被取消")
+                time.sleep(0.5)
+            if job_id is not None:
+                with contextlib.suppress(RuntimeError):  # 任务可能刚好已经结束
+                    client.cancel(job_id)
+        except Exception as e:
+            self.error_message = f"{e}（服务器 {self.server}）"
+            self.error_signal.emit(self.error_message)
+            print(f"OptimizationThread.run_remote error: {e}")
+
+    def _send(self, message):
+        # 在持有 mutex 时调用；子进程已经结束时忽略
+        if self.connection is not None:
+            try:
+                self.connection.send(message)
+            except OSError:
+                pass
 
     def cancel(self):
         self.mutex.lock()
         self.cancelled = True
-        self.wait_condition.wakeAll()  # Wake up the thread if it's waiting
+        self._send(("cancel", None))  # 子进程立即中断正在运行的求解器
+        self.kill_deadline = time.monotonic() + WORKER_CANCEL_GRACE
         self.mutex.unlock()
 
+    def choose_incumbent(self, keep):
+        """用户对取消时已有方案的选择：keep 为 True 时撤销取消，用该方案生成报告"""
+        self.mutex.lock()
+        self.keep_incumbent = keep
+        if keep:
+            self.cancelled = False
+        else:
+            self.kill_deadline = time.monotonic() + WORKER_CANCEL_GRACE
+        self.incumbent_answered = True
+        self._send(("incumbent", keep))
+        self.mutex.unlock()
+
+
 class CustomProgressDialog(QProgressDialog):  # 继承自QProgressDialog
     def __init__(self, parent=None): # 继承自QProgressDialog
         super().__init__("优化计算中...", "取消", 0, 100, parent)
@@ -165,6 +363,7 @@ class MainWindow(QWidget):
         except Exception as e:
             print(f"Error setting icon: {e}")
             self.app_icon = None
+        self.session_process = SessionProcess()  # 常驻计算子进程，第一次计算时启动
         self.initUI()
         self.set_table_style()  # 应用表格样式
 
@@ -204,7 +403,8 @@ class MainWindow(QWidget):
 
         # 第二排：参数设置
         parameter_group = QGroupBox("参数设置")
-        parameter_layout = QHBoxLayout()
+        # 参数分三行：基本参数、求解器与枚举预算、报告与计算服务器。新增的选项放进后两行，不要再加宽第一行
+        parameter_layout = QVBoxLayout()
 
         # 创建一个 QHBoxLayout 用于锯缝标签和输入框，实现水平布局
         saw_kerf_hbox = QHBoxLayout()
@@ -242,13 +442,112 @@ class MainWindow(QWidget):
         solver_time_hbox.addWidget(self.solver_time_label)
         solver_time_hbox.addWidget(self.solver_time_input)
 
-        # 将水平布局添加到参数布局中
-        parameter_layout.addLayout(saw_kerf_hbox)
-        parameter_layout.addLayout(saw_count_hbox)
-        parameter_layout.addLayout(solver_time_hbox)
-
-        # 添加伸缩器，使标签和输入框靠左对齐
-        parameter_layout.addStretch(1)
+        # 允许的最优间隙：方案与下界相差不超过该比例即停止求解
+        self.gap_label = QLabel("允许间隙 (%):")
+        self.gap_input = QLineEdit("0")
+        self.gap_input.setAlignment(Qt.AlignCenter)  # 设置文本居中
+        self.gap_input.setValidator(QDoubleValidator(0.0, 100.0, 2))  # 只允许 0-100 的小数
+        self.gap_input.setMaximumWidth(40)
+        solver_time_hbox.addWidget(self.gap_label)
+        solver_time_hbox.addWidget(self.gap_input)
+
+        # 创建一个 QHBoxLayout 用于求解器标签、下拉框和线程数输入框，实现水平布局
+        backend_hbox = QHBoxLayout()
+        self.backend_label = QLabel("求解器:")
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItem("SCIP", "SCIP")  # 单线程
+        self.backend_combo.addItem("CP-SAT", "CP-SAT")  # 多线程并行搜索
+        self.workers_label = QLabel("线程数:")
+        self.workers_input = QLineEdit(str(os.cpu_count() or 1))
+        self.workers_input.setAlignment(Qt.AlignCenter)  # 设置文本居中
+        self.workers_input.setValidator(QIntValidator(1, 256))  # 只允许正整数
+        self.workers_input.setMaximumWidth(40)
+        self.workers_input.setEnabled(False)  # 只有 CP-SAT 使用线程数
+        self.backend_combo.currentIndexChanged.connect(
+            lambda: self.workers_input.setEnabled(self.backend_combo.currentData() == "CP-SAT"))
+
+        # 将标签、下拉框和输入框添加到水平布局中
+        backend_hbox.addWidget(self.backend_label)
+        backend_hbox.addWidget(self.backend_combo)
+        backend_hbox.addWidget(self.workers_label)
+        backend_hbox.addWidget(self.workers_input)
+
+        # 创建一个 QHBoxLayout 用于求解模式标签和下拉框，实现水平布局
+        engine_hbox = QHBoxLayout()
+        self.engine_label = QLabel("求解模式:")
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("枚举", "enumerate")  # 完整枚举切割模式
+        self.engine_combo.addItem("列生成", "column_generation")  # 规格较多时使用
+        self.engine_combo.addItem("弧流", "arc_flow")  # 不生成模式的精确模型
+        self.engine_combo.addItem("快速", "heuristic")  # 启发式，用于报价
+
+        # 将标签和下拉框添加到水平布局中
+        engine_hbox.addWidget(self.engine_label)
+        engine_hbox.addWidget(self.engine_combo)
+
+        # 只保留极大模式，枚举模式数量大时可明显缩小模型
+        self.dominance_checkbox = QCheckBox("极大模式")
+        self.dominance_checkbox.setToolTip("只保留余料中再放不下任何成品的切割模式，最优解不变")
+        engine_hbox.addWidget(self.dominance_checkbox)
+
+        # 枚举模式的内存和时间预算，预计超出时改用列生成（不勾选则提示后不计算）
+        budget_hbox = QHBoxLayout()
+        self.memory_budget_label = QLabel("内存上限 (MB):")
+        self.memory_budget_input = QLineEdit(str(PATTERN_MEMORY_BUDGET_MB))
+        self.memory_budget_input.setAlignment(Qt.AlignCenter)  # 设置文本居中
+        self.memory_budget_input.setValidator(QIntValidator(1, 1024 * 1024))  # 只允许正整数
+        self.memory_budget_input.setFixedWidth(50)  # 最窄时也要显示完四位数
+        self.time_budget_label = QLabel("枚举时限 (秒):")
+        self.time_budget_input = QLineEdit(str(PATTERN_TIME_BUDGET))
+        self.time_budget_input.setAlignment(Qt.AlignCenter)  # 设置文本居中
+        self.time_budget_input.setValidator(QIntValidator(1, 86400))  # 只允许正整数
+        self.time_budget_input.setMaximumWidth(50)
+        self.fallback_checkbox = QCheckBox("超出时改用列生成")
+        self.fallback_checkbox.setChecked(True)
+        self.fallback_checkbox.setToolTip("枚举模式预计超出内存上限或枚举时限时自动改用列生成，否则提示后停止计算")
+        budget_hbox.addWidget(self.memory_budget_label)
+        budget_hbox.addWidget(self.memory_budget_input)
+        budget_hbox.addWidget(self.time_budget_label)
+        budget_hbox.addWidget(self.time_budget_input)
+        budget_hbox.addWidget(self.fallback_checkbox)
+
+        # 报告的详细记录：逐根原材料一行，或原材料很多时按切割模式合并，另可流式写出逐根的 CSV
+        report_hbox = QHBoxLayout()
+        self.detail_label = QLabel("详细记录:")
+        self.detail_combo = QComboBox()
+        self.detail_combo.addItem("逐根", "bars")
+        self.detail_combo.addItem("按模式合并", "grouped")  # 每个模式一行，序号写成区间
+        self.detail_csv_checkbox = QCheckBox("另存逐根 CSV")
+        self.detail_csv_checkbox.setToolTip("在报告旁边另存每根原材料一行的详细记录 CSV，适合方案很大时查看明细")
+        report_hbox.addWidget(self.detail_label)
+        report_hbox.addWidget(self.detail_combo)
+        report_hbox.addWidget(self.detail_csv_checkbox)
+        self.reuse_result_checkbox = QCheckBox("复用结果")
+        self.reuse_result_checkbox.setChecked(False)
+        self.reuse_result_checkbox.setToolTip("相同的订单和参数算过最优方案时直接用它生成报告（缓存在用户目录的 .linercut 下）")
+        report_hbox.addWidget(self.reuse_result_checkbox)
+
+        # 计算服务器：填写后把任务发给 LinerCutService.py 运行的服务计算，留空在本机计算
+        server_hbox = QHBoxLayout()
+        self.server_label = QLabel("计算服务器:")
+        self.server_input = QLineEdit()
+        self.server_input.setPlaceholderText("留空在本机计算，如 192.168.1.10:8765")
+        self.server_input.setToolTip("把任务发给局域网中的优化服务（python LinerCutService.py）计算，完成后报告下载到桌面")
+        server_hbox.addWidget(self.server_label)
+        server_hbox.addWidget(self.server_input)
+        # 服务只返回 Excel 报告，发给服务器计算时不能另存逐根 CSV
+        self.server_input.textChanged.connect(self.update_remote_options)
+
+        # 将水平布局按行添加到参数布局中
+        for row in ((saw_kerf_hbox, saw_count_hbox, solver_time_hbox),
+                    (engine_hbox, backend_hbox, budget_hbox),
+                    (report_hbox, server_hbox)):
+            row_layout = QHBoxLayout()
+            for hbox in row:
+                row_layout.addLayout(hbox)
+            # 添加伸缩器，使标签和输入框靠左对齐
+            row_layout.addStretch(1)
+            parameter_layout.addLayout(row_layout)
 
         parameter_group.setLayout(parameter_layout)
         main_layout.addWidget(parameter_group)
@@ -429,6 +728,15 @@ class MainWindow(QWidget):
                 item = str(data.iloc[row, col])  # 将数据转换为字符串
                 self_table.setItem(row, col, QTableWidgetItem(item))
 
+    def update_remote_options(self):
+        """填写计算服务器时禁用服务不支持的选项（另存逐根 CSV），并在提示中说明原因"""
+        remote = bool(self.server_input.text().strip())
+        if remote:
+            self.detail_csv_checkbox.setChecked(False)
+        self.detail_csv_checkbox.setEnabled(not remote)
+        self.detail_csv_checkbox.setToolTip("发给服务器计算时只下载 Excel 报告，不能另存逐根 CSV" if remote else
+                                            "在报告旁边另存每根原材料一行的详细记录 CSV，适合方案很大时查看明细")
+
     def save_data(self): # 保存数据
         # 使用全局变量
         global stock_data, demands_data
@@ -491,6 +799,13 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "警告", "无效的求解时间值，请使用整数。")
             return
 
+        # 获取允许间隙的值
+        try:
+            mip_gap = float(self.gap_input.text()) / 100
+        except ValueError:
+            QMessageBox.warning(self, "警告", "无效的允许间隙值，请使用数字。")
+            return
+
         # 获取调锯次数的值
         try:
             max_cut_types = int(self.saw_count_input.text())
@@ -498,6 +813,22 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "警告", "无效的调锯次数值，请使用整数。")
             return
 
+        # 获取求解器和线程数
+        backend = self.backend_combo.currentData()
+        try:
+            num_workers = int(self.workers_input.text())
+        except ValueError:
+            QMessageBox.warning(self, "警告", "无效的线程数，请使用正整数。")
+            return
+
+        # 获取枚举模式的内存和时间预算
+        try:
+            memory_budget = int(self.memory_budget_input.text())
+            time_budget = int(self.time_budget_input.text())
+        except ValueError:
+            QMessageBox.warning(self, "警告", "无效的内存上限或枚举时限，请使用正整数。")
+            return
+
         # 创建并显示进度对话框
         self.progress_dialog = CustomProgressDialog(self)
         self.progress_dialog.canceled.connect(self.cancel_optimization)  # Connect cancel signal
@@ -505,11 +836,19 @@ class MainWindow(QWidget):
         self.progress_dialog.show()
 
         # 创建并启动优化线程
-        self.optimization_thread = OptimizationThread(kerf_width, solver_time_limit, max_cut_types)
+        engine = self.engine_combo.currentData()
+        dominance = self.dominance_checkbox.isChecked()
+        self.optimization_thread = OptimizationThread(kerf_width, solver_time_limit, max_cut_types, engine, dominance,
+                                                      backend, num_workers, mip_gap, memory_budget, time_budget,
+                                                      self.fallback_checkbox.isChecked(), self.detail_combo.currentData(),
+                                                      self.detail_csv_checkbox.isChecked(), self.server_input.text().strip(),
+                                                      self.reuse_result_checkbox.isChecked(), self.session_process)
         try:
             self.optimization_thread.progress_update.connect(self.update_progress)
+            self.optimization_thread.status_update.connect(self.progress_dialog.setLabelText)
             self.optimization_thread.result_ready.connect(self.optimization_finished)
             self.optimization_thread.error_signal.connect(self.optimization_failed)
+            self.optimization_thread.incumbent_ready.connect(self.offer_incumbent)
         except TypeError as e:
             print(f"Error connecting signals: {e}")  # Debugging
             QMessageBox.critical(self, "错误", f"信号连接失败: {e}")
@@ -531,14 +870,21 @@ class MainWindow(QWidget):
         Handles the result of the optimization thread.
         Displays a message box with the result or any error message.
         """
+        notices = "".join(f"\n{notice}" for notice in self.optimization_thread.notices)
         if output_path:
-            QMessageBox.information(self, "优化完成", f"优化切割方案已生成至：{output_path}")
+            QMessageBox.information(self, "优化完成", f"优化切割方案已生成至：{output_path}{notices}")
         else:
-            QMessageBox.critical(self, "优化失败", f"优化失败，请查看控制台输出。")
+            QMessageBox.critical(self, "优化失败", f"优化失败，请查看控制台输出。{notices}")
 
     def optimization_failed(self, error_message):
         QMessageBox.critical(self, "优化失败", f"优化失败: {error_message}")
 
+    def offer_incumbent(self, bars): # 取消后询问是否使用已有方案
+        reply = QMessageBox.question(self, "优化已取消",
+                                     f"已找到使用 {bars} 根原材料的可行方案（未证明最优），是否生成报告？",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        self.optimization_thread.choose_incumbent(reply == QMessageBox.Yes)
+
     def cancel_optimization(self): # 取消优化
         """
         Cancels the optimization process.
@@ -593,6 +939,7 @@ class MainWindow(QWidget):
         """Overrides the close event to minimize to tray instead of closing."""
         # 修改为完全退出程序
         self.tray_icon.hide()  # 确保托盘图标被移除
+        self.session_process.close()
         QApplication.instance().quit()
         event.accept()
 
@@ -649,344 +996,10 @@ class MainWindow(QWidget):
         """Adds a row to the demands table."""
         self.demands_table.insertRow(self.demands_table.rowCount())
 
-def generate_patterns(stock_length, demand_lengths, kerf_width, max_cut_types, progress_callback, total_demands):
-    """生成考虑锯缝的有效切割模式"""
-    patterns = []
-    max_counts = [stock_length // length for length in demand_lengths]
-
-    # 生成所有可能的切割组合
-    for i, combo in enumerate(itertools.product(*[range(0, c + 1) for c in max_counts])):
-        # 限制每种切割模式最多只能包含 max_cut_types 种不同的长度规格
-        if sum(1 for c in combo if c > 0) > max_cut_types:
-            continue
-
-        total_pieces = sum(combo)
-        if total_pieces == 0:
-            continue
-
-        # 计算总消耗长度（含锯缝）
-        total_used = sum(int(c) * int(l) for c, l in zip(combo, demand_lengths))
-        total_kerf = int(kerf_width) * (total_pieces - 1) if total_pieces > 1 else 0
-        total_consumption = total_used + total_kerf
-
-        if total_consumption <= stock_length:
-            utilization = round((total_consumption / stock_length) * 100, 2)
-            patterns.append({
-                "combo": combo,
-                "waste": stock_length - total_consumption,
-                "kerf": total_kerf,
-                "utilization": utilization  # 新增单个方案利用率
-            })
-        # 计算进度
-        progress = int((i + 1) / total_demands * 100)
-        progress_callback.emit(progress)
-    return patterns
-
-def create_data_model(kerf_width):
-    """包含锯缝参数的数据模型"""
-    global stock_data, demands_data
-    return {
-        "kerf_width": kerf_width,
-        "stock": stock_data,
-        "demands": demands_data
-    }
-
-
-def main(kerf_width, solver_time_limit, max_cut_types, progress_callback, mutex, wait_condition, thread):
-    """
-    Main function to run the optimization.
-    Includes a callback to update the progress bar.
-    """
-    try:
-        data = create_data_model(kerf_width)
-        kerf_width = data["kerf_width"]
-        stock = data["stock"]
-        demands = data["demands"]
-        demand_lengths = [d["length"] for d in demands]
-        total_stock_count = len(stock)
-
-        # 计算总的需求数量，用于计算进度
-        total_demands = 1
-        for length in demand_lengths:
-            total_demands *= (stock[0]["length"] // length + 1)
-
-        # 生成所有原材料的切割模式
-        stock_patterns = {}
-        for i, s in enumerate(stock):
-            # Check for cancellation
-            mutex.lock()
-            if thread.cancelled:
-                mutex.unlock()
-                return None
-            mutex.unlock()
-
-            # 将 progress_callback 传递给 generate_patterns
-            patterns = generate_patterns(s["length"], demand_lengths, kerf_width, max_cut_types, progress_callback, total_demands)
-            stock_patterns[s["length"]] = {
-                "patterns": patterns,
-                "stock_qty": s["quantity"]
-            }
-            #progress = int(math.pow((i + 1) / total_stock_count, 0.5) * 20)  # Apply a non-linear mapping (sqrt)
-            #progress_callback.emit(progress)
-
-        # 创建求解器
-        solver = pywraplp.Solver.CreateSolver("SCIP")
-
-        # 创建变量字典
-        variables = defaultdict(list)
-        for stock_len in stock_patterns:
-            stock_qty = stock_patterns[stock_len]["stock_qty"]
-            patterns = stock_patterns[stock_len]["patterns"]
-            vars = [
-                solver.IntVar(0, stock_qty, f"x_{stock_len}_{i}")
-                for i in range(len(patterns))
-            ]
-            variables[stock_len] = vars
-
-        # 库存约束
-        for stock_len in stock_patterns:
-            solver.Add(sum(variables[stock_len]) <= stock_patterns[stock_len]["stock_qty"])
-
-        # 需求约束
-        for i, demand in enumerate(demands):
-            constraint = solver.Constraint(demand["quantity"], demand["quantity"])
-            for stock_len in variables:
-                for var_idx, var in enumerate(variables[stock_len]):
-                    pattern = stock_patterns[stock_len]["patterns"][var_idx]["combo"]
-                    coefficient = pattern[i]
-                    constraint.SetCoefficient(var, coefficient)
-
-        # 目标函数：最小化总使用次数
-        objective = solver.Objective()
-        for stock_len in variables:
-            for var in variables[stock_len]:
-                objective.SetCoefficient(var, 1)
-        objective.SetMinimization()
-
-        # 求解
-        #progress_callback.emit(20)  # Indicate solver is running
-
-        # 在求解器运行过程中更新进度条
-        #solver_time_limit = 60000  # 设置求解器时间限制为60秒 (milliseconds)
-        solver.SetTimeLimit(solver_time_limit)
-        status = solver.Solve()
-
-        if (status == solver.OPTIMAL) or (status == solver.FEASIBLE):
-            print("优化成功，正在生成报告...")
-            detailed_records = []
-            plan_summary = []
-            serial_no = 1
-
-            # 初始化统计数据
-            total_stock_length_used = 0
-            total_finished_count = 0
-            total_finished_length = 0
-            max_waste = 0
-
-            # 解析结果
-            for stock_len in variables:
-                for var_idx, var in enumerate(variables[stock_len]):
-                    # Check for cancellation
-                    mutex.lock()
-                    if thread.cancelled:
-                        mutex.unlock()
-                        return None
-                    mutex.unlock()
-
-                    used = int(var.solution_value())
-                    if used == 0:
-                        continue
-
-                    pattern = stock_patterns[stock_len]["patterns"][var_idx]
-                    # 汇总统计
-                    cutting_pattern = " + ".join([f"{l}mm×{c}" for c, l in zip(pattern["combo"], demand_lengths) if c > 0])
-                    plan_summary.append({
-                        "原材料长度(mm)": stock_len,
-                        "使用次数": used,
-                        "总余料(mm)": pattern["waste"] * used,
-                        "总锯缝损耗(mm)": pattern["kerf"] * used,
-                        "平均利用率(%)": pattern["utilization"],
-                        "切割模式": cutting_pattern  # 剔除数量为0的成品尺寸
-                    })
-
-                    # 详细记录
-                    for _ in range(used):
-                        detail = {
-                            "序号": serial_no,
-                            "原材料长度(mm)": stock_len,
-                            "成品组合": " , ".join([f"{l}mm×{c}"
-                                                    for l, c in zip(demand_lengths, pattern["combo"])
-                                                    if c > 0]),
-                            "余料(mm)": pattern["waste"],
-                            "锯缝损耗(mm)": pattern["kerf"],
-                            "总消耗(mm)": stock_len - pattern["waste"],
-                            "材料利用率(%)": pattern["utilization"]  # 添加单个方案利用率
-                        }
-                        detailed_records.append(detail)
-                        serial_no += 1
-
-                        # 更新统计数据
-                        total_stock_count += 1
-                        total_stock_length_used += stock_len
-                        total_finished_count += sum(pattern["combo"])
-                        total_finished_length += sum(c * l for c, l in zip(pattern["combo"], demand_lengths))
-                        max_waste = max(max_waste, pattern["waste"])
-
-            progress_callback.emit(70)
-
-            # 计算总材料利用率
-            total_initial_stock_length = sum(s["length"] * s["quantity"] for s in stock)
-            total_utilization = round((total_finished_length / total_stock_length_used) * 100, 2) if total_stock_length_used else 0
-
-            # 计算总材料利用率（含锯缝）
-            total_kerf_loss = sum(detail["锯缝损耗(mm)"] for detail in detailed_records)
-            total_material_used_with_kerf = total_finished_length + total_kerf_loss
-            total_utilization_with_kerf = round((total_finished_length / total_material_used_with_kerf) * 100, 2) if total_material_used_with_kerf else 0
-
-            # 生成Excel报告
-            desktop = os.path.join(os.path.expanduser("~"), "Desktop")
-            # 获取当前时间并格式化
-            current_time = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-            output_path = os.path.join(desktop, f"优化切割方案_{current_time}.xlsx")
-
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                # 详细记录表
-                df_detail = pd.DataFrame(detailed_records)
-                df_detail = df_detail[[
-                    "序号", "原材料长度(mm)", "成品组合",
-                    "总消耗(mm)", "锯缝损耗(mm)", "余料(mm)", "材料利用率(%)"
-                ]]
-                df_detail.to_excel(writer, sheet_name="详细记录", index=False)
-
-                # 方案汇总表
-                # 创建包含序号的列表
-                plan_summary_with_index = []
-                for i, summary in enumerate(plan_summary):
-                    summary_with_index = {"序号": i + 1, **summary}  # 将序号添加到字典中
-                    plan_summary_with_index.append(summary_with_index)
-
-                df_summary = pd.DataFrame(plan_summary_with_index)
-
-                # 计算整体利用率
-                total_consumption = df_summary["原材料长度(mm)"] * df_summary["使用次数"] - df_summary["总余料(mm)"]
-                total_stock = df_summary["原材料长度(mm)"] * df_summary["使用次数"]
-                df_summary["整体利用率(%)"] = round((total_consumption / total_stock) * 100, 2)
-
-                # 确保 "序号" 列在最前面
-                df_summary = df_summary[[
-                    "序号", "原材料长度(mm)", "使用次数", "切割模式",
-                    "总锯缝损耗(mm)", "总余料(mm)", "平均利用率(%)", "整体利用率(%)"
-                ]]
-                df_summary.to_excel(writer, sheet_name="方案汇总", index=False)
-
-                # 需求完成情况
-                completed_with_index = []
-                for i, demand in enumerate(demands):
-                    total = sum(
-                        p["combo"][i] * var.solution_value()
-                        for stock_len in variables
-                        for p, var in zip(
-                            stock_patterns[stock_len]["patterns"],
-                            variables[stock_len]
-                        )
-                    )
-                    # Ensure that the completed quantity does not exceed the demand quantity
-                    completed_quantity = min(int(total), demands[i]["quantity"])
-
-                    completed_with_index.append({
-                        "序号": i + 1,  # 添加序号
-                        "成品规格(mm)": demands[i]["length"],
-                        "需求数量": demands[i]["quantity"],
-                        "完成数量": completed_quantity,
-                        "完成率(%)": round(min(100, 100 * completed_quantity / demands[i]["quantity"]), 2)
-                    })
-                df_completed = pd.DataFrame(completed_with_index)
-                df_completed.to_excel(writer, sheet_name="需求完成", index=False)
-
-                # 新增统计信息表
-                summary_data = {
-                    "项目": [
-                        "原材料总数",
-                        "原材料总使用长度(m)",
-                        "切割出来的成品总数量",
-                        "切割出来的成品总长度(m)",
-                        "总材料利用率(%)",
-                        "总材料利用率（含锯缝）(%)",
-                        "最长余料长度(mm)"
-                    ],
-                    "数值": [
-                        total_stock_count,
-                        round(total_stock_length_used / 1000, 2),
-                        total_finished_count,
-                        round(total_finished_length / 1000, 2),
-                        total_utilization,
-                        total_utilization_with_kerf,
-                        max_waste
-                    ]
-                }
-                df_summary_info = pd.DataFrame(summary_data, index=range(1, len(summary_data["项目"]) + 1))
-                df_summary_info.index.name = "序号"  # 设置索引列名为 "序号"
-                df_summary_info.to_excel(writer, sheet_name="统计信息")
-
-                # 定义微软雅黑字体，不加粗
-                msyh_font = Font(name='微软雅黑', bold=False)
-
-                # 定义居中对齐样式
-                center_alignment = Alignment(horizontal='center', vertical='center')
-
-                # 循环所有sheet，添加隔行浅灰色背景
-                for sheet_name in writer.sheets:
-                    sheet = writer.sheets[sheet_name]
-
-                    # 应用字体样式到所有单元格
-                    for row in sheet.iter_rows(min_row=1, max_row=sheet.max_row, min_col=1, max_col=sheet.max_column):
-                        for cell in row:
-                            cell.font = msyh_font
-                            # 设置所有单元格不对齐
-                            cell.border = Border(bottom=None,
-                                                 top=None,
-                                                 left=None,
-                                                 right=None)
-
-                    # 居中显示序号列
-                    for cell in sheet['A']:  # 'A' 是序号列
-                        cell.alignment = center_alignment
-
-                    # 隔行设置背景色
-                    for row_index, row in enumerate(sheet.iter_rows(min_row=2, max_row=sheet.max_row, min_col=1, max_col=sheet.max_column), start=2):
-                        if row_index % 2 == 0:  # 偶数行
-                            for cell in row:
-                                cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-
-                    # 自适应列宽
-                    for column_cells in sheet.columns:
-                        max_length = 0
-                        column = column_cells[0].column_letter  # 获取列字母
-                        for cell in column_cells:
-                            try:  # 必要的，因为不是所有单元格都有值
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = (max_length + 2) * 1.5
-                        sheet.column_dimensions[column].width = adjusted_width
-
-                    # 取消网格线
-                    sheet.sheet_view.showGridLines = False
-
-            print(f"报告已生成至：{output_path}")
-            progress_callback.emit(100) # Indicate completion of Excel writing
-
-            return output_path
-        else:
-            print("未找到可行解")
-            return None
-    except Exception as e:
-        print(f"Error in main function: {e}")  # 打印错误信息
-        raise e
-
 
 if __name__ == "__main__":
+    # 打包成 exe 后进程池的子进程也从这里启动，需要先交给 multiprocessing 处理
+    multiprocessing.freeze_support()
     # 设置适当的标志以禁用Windows上的控制台窗口
     if os.name == 'nt':
         import ctypes
@@ -0,0 +1,2701 @@
+"""
+LinerCut 的计算引擎：切割模式枚举、整数规划求解和报告，不依赖 Qt 和界面的全局变量。
+
+界面（LinerCut.py）在子进程中调用这里的 solve；也可以直接在脚本中使用，或者在命令行中批量处理订单：
+    python LinerCutEngine.py 订单目录 --output 报告目录 --workers 4
+"""
+import sys
+import os
+import argparse
+import pandas as pd
+import numpy as np
+from ortools.linear_solver import pywraplp
+from ortools.linear_solver import linear_solver_pb2
+from collections import defaultdict
+import datetime
+import math
+import time
+import threading
+import tempfile
+import json
+import hashlib
+import contextlib
+import csv
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import openpyxl
+from openpyxl.styles import Border, PatternFill, Font, Alignment, NamedStyle
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+
+# 切割模式磁盘缓存的位置和容量上限（见 PatternCache）
+PATTERN_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".linercut", "pattern_cache")
+PATTERN_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# 整个方案的结果缓存（见 ResultCache），每个方案只记录用到的模式，很小
+RESULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".linercut", "result_cache")
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 预计模式总数达到该值时才用进程池并行枚举（启动进程、传回结果也有开销）
+PARALLEL_PATTERN_THRESHOLD = 200000
+# 未指定进程数时，只有多核且模式数达到该值才并行（见 default_pattern_workers）：刚过阈值时启动进程、
+# 传回结果的开销和省下的时间差不多，单核上并行反而更慢
+PARALLEL_PATTERN_DEFAULT_THRESHOLD = 4 * PARALLEL_PATTERN_THRESHOLD
+# 并行枚举时每个子任务至少包含的模式数，再小就不值得单独交给一个进程
+MIN_PATTERN_TASK = 20000
+
+# 枚举模式的默认预算：预计内存或枚举时间超出时改用列生成（或拒绝计算），见 estimate_pattern_model
+PATTERN_MEMORY_BUDGET_MB = 2048
+PATTERN_TIME_BUDGET = 120  # 秒
+# 模式放不进内存预算时流式写入磁盘（见 generate_pattern_chunks、PatternStore.stream_from_longest），
+# 枚举、建模和统计结果时内存中每次只处理约这么大的一块模式矩阵
+PATTERN_CHUNK_BYTES = 32 * 1024 * 1024
+# 估算用的经验值：单线程每秒枚举的模式数，求解器中每个模式变量占用的内存（含约束系数）
+ENUMERATION_PATTERNS_PER_SECOND = 300000
+MODEL_BYTES_PER_VARIABLE = {"SCIP": 4096, "CP-SAT": 2560}
+
+# 精确模式的热启动（见 warm_start_budget）：模式少于该数时不做；启发式的时间按每秒这么多个模式给
+WARM_START_MIN_PATTERNS = 2000
+WARM_START_PATTERNS_PER_SECOND = 200000
+
+# 快速模式的搜索时间（秒）；库存紧张、到时方案仍超出库存时最多再延长这么久，之后放弃
+HEURISTIC_TIME_BUDGET = 1.0
+HEURISTIC_STOCK_EXTENSION = 1.0
+
+# 批量模式报告文件名的后缀（<订单名>_优化切割方案.xlsx），find_orders 据此跳过上次写出的报告
+BATCH_REPORT_SUFFIX = "_优化切割方案"
+
+# 计算在子进程中进行（见 OptimizationThread）；取消后等待子进程自行结束的秒数，超时则强制结束
+WORKER_CANCEL_GRACE = 3
+
+
+class ProgressReporter:
+    """
+    按阶段汇总进度：每个阶段占总进度的固定权重，阶段内进度为 0-1 的比例。
+    发送限流（至少间隔 min_interval 秒且数值有变化），并按已用时间估算剩余时间，
+    状态文字（阶段、百分比、预计剩余时间）通过 status_signal 发送。两个信号都可以为 None（不汇报）。
+
+    emit(value) 接受 0-100 的阶段内进度，可以直接代替 progress_callback 传给各个阶段的函数。
+    """
+    PHASE_LABELS = {"patterns": "生成切割模式", "build": "建立模型", "solve": "求解", "report": "生成报告"}
+
+    def __init__(self, progress_signal, phases, status_signal=None, min_interval=0.1):
+        self.progress_signal = progress_signal
+        self.status_signal = status_signal
+        self.min_interval = min_interval
+        total = sum(phases.values())
+        self.weights = {name: weight / total for name, weight in phases.items()}
+        self.offsets = {}
+        offset = 0.0
+        for name in phases:
+            self.offsets[name] = offset
+            offset += self.weights[name]
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.phase = None
+        self.phase_deadline = None
+        self.detail = ""
+        self.fraction = 0.0
+        self.last_emit = 0.0
+        self.last_percent = -1
+        self.ticker = None
+
+    def start_phase(self, name, detail="", duration=None):
+        """进入新阶段。给出 duration（秒）时阶段内进度按已用时间推进，用于不汇报进度的求解器"""
+        self._stop_ticker()
+        start = time.perf_counter()
+        with self.lock:
+            self.phase = name
+            self.phase_deadline = start + duration if duration else None
+            self.detail = detail
+            self.fraction = 0.0
+            self._send(force=True)
+        if duration:
+            stop = threading.Event()
+
+            def tick():
+                while not stop.wait(0.5):
+                    self.update(min((time.perf_counter() - start) / duration, 0.99))
+
+            self.ticker = (stop, threading.Thread(target=tick, daemon=True))
+            self.ticker[1].start()
+
+    def update(self, fraction, detail=None):
+        with self.lock:
+            self.fraction = max(self.fraction, min(fraction, 1.0))
+            if detail is not None:
+                self.detail = detail
+            self._send()
+
+    def emit(self, value):
+        self.update(value / 100)
+
+    def finish(self):
+        self._stop_ticker()
+        with self.lock:
+            self.phase = None
+            self._send(force=True)
+
+    def close(self):
+        self._stop_ticker()
+
+    def _stop_ticker(self):
+        if self.ticker is not None:
+            self.ticker[0].set()
+            self.ticker[1].join()
+            self.ticker = None
+
+    def _send(self, force=False):
+        if self.phase is None:
+            overall = 1.0
+        else:
+            overall = self.offsets[self.phase] + self.weights[self.phase] * self.fraction
+        percent = int(overall * 100)
+        now = time.perf_counter()
+        if not force and (percent == self.last_percent or now - self.last_emit < self.min_interval):
+            return
+        self.last_emit = now
+        self.last_percent = percent
+        if self.progress_signal is not None:
+            self.progress_signal.emit(percent)
+        if self.status_signal is not None and self.phase is not None:
+            text = f"{self.PHASE_LABELS.get(self.phase, self.phase)} {percent}%"
+            elapsed = now - self.start_time
+            if self.phase_deadline is not None:
+                # 按时间推进的阶段最多持续到时间限制
+                remaining = int(max(self.phase_deadline - now, 0))
+                text += f"，最多剩余 {remaining // 60}:{remaining % 60:02d}"
+            elif overall > 0.01 and elapsed > 1:
+                remaining = int(elapsed * (1 - overall) / overall)
+                text += f"，预计剩余 {remaining // 60}:{remaining % 60:02d}"
+            if self.detail:
+                text += f"\n{self.detail}"
+            self.status_signal.emit(text)
+
+
+def generate_patterns(stock_length, demand_lengths, kerf_width, max_cut_types, progress_callback, total_patterns,
+                      is_cancelled=None, done_patterns=0, max_counts=None):
+    """
+    生成考虑锯缝的有效切割模式。
+
+    按需求顺序深度优先枚举每种长度的数量，剩余长度（含锯缝）或调锯次数用尽时立即剪枝，
+    只访问可行的部分组合。结果与遍历 itertools.product 再过滤得到的模式完全相同，顺序也一致。
+    进度按 (done_patterns + 已生成模式数) / total_patterns 汇报（总数见 count_patterns），progress_callback 可以为 None。
+    is_cancelled 返回 True 时提前结束枚举，返回已经得到的部分模式。
+    max_counts 给出每种规格在一个模式中的数量上限（见 presolve），默认只受原材料长度限制。
+
+    返回 模式数 × 需求规格数 的整数矩阵（每行一个 combo），按 count_patterns 的数量一次分配，
+    余料、锯缝损耗和利用率由 PatternStore 统一计算。
+    """
+    n = len(demand_lengths)
+    kerf_width = int(kerf_width)
+    demand_lengths = [int(l) for l in demand_lengths]
+    max_counts = _max_counts(stock_length, demand_lengths, max_counts)
+
+    # 每段成品占用 长度+锯缝，最后一段不需要锯缝，因此可用容量为 原材料长度+锯缝
+    capacity = stock_length + kerf_width
+    widths = [l + kerf_width for l in demand_lengths]
+
+    # suffix_min_width[d]: 第 d 个及以后需求的最小占用，剩余容量小于它时后续只能全部为 0
+    suffix_min_width = [capacity + 1] * (n + 1)
+    for d in range(n - 1, -1, -1):
+        suffix_min_width[d] = min(widths[d], suffix_min_width[d + 1])
+
+    combo = [0] * n
+    patterns = np.zeros((count_patterns(stock_length, demand_lengths, kerf_width, max_cut_types, max_counts), n),
+                        dtype=np.int32)
+    found = 0
+
+    # 用显式的栈代替递归：第 d 层的剩余容量、已用调锯次数和已切段数，combo[d] 为该层当前的数量
+    remaining = [0] * (n + 1)
+    types = [0] * (n + 1)
+    pieces = [0] * (n + 1)
+    remaining[0] = capacity
+    d = 0
+    while True:
+        if d == n or types[d] >= max_cut_types or remaining[d] < suffix_min_width[d]:
+            # 剩余容量或调锯次数已用尽：后续需求只能取 0，直接得到一个模式
+            if pieces[d] > 0:
+                patterns[found] = combo
+                found += 1
+            # 回溯到还能再多切一段的一层
+            while True:
+                d -= 1
+                if d < 0:
+                    return patterns[:found]
+                if d < 3:
+                    # 只在前三层汇报进度和检查取消，避免逐个组合发送信号
+                    if progress_callback is not None:
+                        progress_callback.emit(int((done_patterns + found) / total_patterns * 100))
+                    if is_cancelled is not None and is_cancelled():
+                        return patterns[:found]
+                count = combo[d] + 1
+                if count <= max_counts[d] and count * widths[d] <= remaining[d]:
+                    combo[d] = count
+                    break
+                combo[d] = 0
+        # 进入下一层（新进入的一层从 0 段开始，combo 中已经是 0）
+        count = combo[d]
+        remaining[d + 1] = remaining[d] - count * widths[d]
+        types[d + 1] = types[d] + (count > 0)
+        pieces[d + 1] = pieces[d] + count
+        d += 1
+
+
+def _max_counts(stock_length, demand_lengths, max_counts=None):
+    """每种规格在一个模式中最多切几段：不超过原材料长度能容纳的段数，也不超过给定的上限"""
+    limits = [stock_length // int(length) for length in demand_lengths]
+    if max_counts is not None:
+        limits = [min(limit, int(cap)) for limit, cap in zip(limits, max_counts)]
+    return limits
+
+
+def update_patterns(patterns, old_lengths, old_caps, stock_length, demand_lengths, kerf_width, max_cut_types,
+                    max_counts=None):
+    """
+    需求规格或数量上限改变后，由上一次的模式矩阵得到新的，只枚举受影响的模式。
+    结果与 generate_patterns 直接枚举的模式集合相同（行顺序不同）。
+
+    patterns 的列按 old_lengths，old_caps 为枚举时实际起作用的数量上限（见 _max_counts）；
+    新的规格和上限由 demand_lengths/max_counts 给出。去掉的规格：删除含该规格的模式；上限降低：删除超出的模式；
+    新增的规格（旧上限视为 0）和上限提高的规格 i：补上第 i 种切 k 段（旧上限 < k ≤ 新上限）、
+    其余容量和调锯次数切其他规格的模式。几种规格同时提高时依次补，补第 i 种时排在它后面的规格仍用旧上限，
+    因此每个模式只补一次。返回 (新的模式矩阵, 新的数量上限, 新增的模式数)。
+    """
+    n = len(demand_lengths)
+    kerf_width = int(kerf_width)
+    demand_lengths = [int(l) for l in demand_lengths]
+    caps = _max_counts(stock_length, demand_lengths, max_counts)
+    old_column = {int(length): j for j, length in enumerate(old_lengths)}
+
+    # 保留的模式：去掉含已删除规格的行，列换成新的顺序，再去掉超出新上限的行
+    removed = [j for length, j in old_column.items() if length not in set(demand_lengths)]
+    if removed:
+        patterns = patterns[~(patterns[:, removed] > 0).any(axis=1)]
+    kept = np.zeros((len(patterns), n), dtype=np.int32)
+    for i, length in enumerate(demand_lengths):
+        if length in old_column:
+            kept[:, i] = patterns[:, old_column[length]]
+    kept = kept[(kept <= np.array(caps, dtype=np.int32)).all(axis=1)]
+
+    # 补上段数超出旧上限的模式；limits 为已经覆盖到的上限
+    limits = [min(old_caps[old_column[length]], cap) if length in old_column else 0
+              for length, cap in zip(demand_lengths, caps)]
+    widths = [l + kerf_width for l in demand_lengths]
+    added = []
+    for i in range(n):
+        others = [j for j in range(n) if j != i]
+        for k in range(limits[i] + 1, caps[i] + 1):
+            rest = stock_length - k * widths[i]  # 切完 k 段后剩余的原材料长度（最后一段的锯缝已计入容量）
+            if rest + kerf_width < 0:
+                break
+            block = np.zeros((1, n - 1), dtype=np.int32)  # 只切第 i 种
+            if rest > 0 and others and max_cut_types > 1:
+                block = np.vstack([block, generate_patterns(rest, [demand_lengths[j] for j in others], kerf_width,
+                                                            max_cut_types - 1, None, 1,
+                                                            max_counts=[limits[j] for j in others])])
+            rows = np.zeros((len(block), n), dtype=np.int32)
+            rows[:, others] = block
+            rows[:, i] = k
+            added.append(rows)
+        limits[i] = caps[i]
+    new_rows = sum(len(rows) for rows in added)
+    return (np.vstack([kept] + added) if added else kept), caps, new_rows
+
+
+def count_patterns(stock_length, demand_lengths, kerf_width, max_cut_types, max_counts=None):
+    """
+    不枚举，直接计算 generate_patterns 会生成的模式数量（用于进度和规模估计）。
+
+    与 generate_patterns 的搜索树相同，按层倒推每个状态（剩余容量, 已用规格数）下面的叶子数，
+    NumPy 一次处理所有剩余容量。全为 0 的组合也是一个叶子，但不算模式。
+    """
+    tables = _pattern_count_tables(stock_length, demand_lengths, kerf_width, max_cut_types, max_counts)
+    return int(tables[0][stock_length + int(kerf_width), 0]) - 1
+
+
+def _pattern_count_tables(stock_length, demand_lengths, kerf_width, max_cut_types, max_counts=None):
+    """
+    count_patterns 的逐层结果：tables[d][r, t] 为搜索到第 d 层、剩余容量 r、已用 t 种规格时
+    下面的叶子数（数值可能很大，用浮点数）。
+    """
+    n = len(demand_lengths)
+    kerf_width = int(kerf_width)
+    capacity = stock_length + kerf_width
+    widths = [int(l) + kerf_width for l in demand_lengths]
+    max_counts = _max_counts(stock_length, demand_lengths, max_counts)
+    suffix_min_width = [capacity + 1] * (n + 1)
+    for d in range(n - 1, -1, -1):
+        suffix_min_width[d] = min(widths[d], suffix_min_width[d + 1])
+
+    # 一个模式最多用到 n 种规格，调锯次数再大也按 n 建表（同 price_pattern、弧流模型）
+    max_types = min(max_cut_types, n)
+    tables = [None] * (n + 1)
+    tables[n] = np.ones((capacity + 1, max_types + 1))
+    for d in range(n - 1, -1, -1):
+        below = tables[d + 1]
+        leaves = below.copy()  # 数量取 0 的分支
+        width = widths[d]
+        for count in range(1, max_counts[d] + 1):
+            if count * width > capacity:
+                break
+            leaves[count * width:, :max_types] += below[:capacity + 1 - count * width, 1:]
+        # 剩余容量不够任何后续规格，或调锯次数已用尽：该状态本身就是叶子
+        leaves[:suffix_min_width[d]] = 1
+        leaves[:, max_types] = 1
+        tables[d] = leaves
+    return tables
+
+
+def estimate_pattern_model(stock_lengths, demand_lengths, kerf_width, max_cut_types, max_counts=None, scale=1,
+                           backend="SCIP"):
+    """
+    枚举前估算枚举模式的规模：各原材料的模式数、模式模型的变量数、内存和枚举时间。
+
+    只对最长原材料做一次 _pattern_count_tables：较短原材料的模式是其中消耗不超过自身长度的那些
+    （见 PatternStore.from_longest），数量就是同一张表在较小剩余容量处的值，因此各原材料都是精确计数。
+    内存包括枚举矩阵、PatternStore 和求解器中的模型（MODEL_BYTES_PER_VARIABLE 为实测的经验值），
+    时间按 ENUMERATION_PATTERNS_PER_SECOND 估算。scale 为 presolve 得到的缩放比例。
+
+    返回 {"counts": {原材料长度: 模式数}, "patterns", "variables", "pattern_bytes"（模式矩阵）,
+    "model_bytes"（求解器模型）, "bytes"（两者之和）, "seconds"}。
+    """
+    kerf_width = int(kerf_width)
+    n = len(demand_lengths)
+    longest = max(stock_lengths, default=0)
+    counts = {stock_length: 0 for stock_length in stock_lengths}
+    if n and longest > 0:
+        tables = _pattern_count_tables((longest + kerf_width) // scale - kerf_width // scale,
+                                       [int(l) // scale for l in demand_lengths], kerf_width // scale,
+                                       max_cut_types, max_counts)
+        for stock_length in stock_lengths:
+            counts[stock_length] = int(tables[0][(stock_length + kerf_width) // scale, 0]) - 1
+    patterns = counts.get(longest, 0)
+    variables = sum(counts.values())
+    # 枚举矩阵 int32；PatternStore 每行 combos（int32）加余料、锯缝、利用率三个 8 字节数组
+    pattern_bytes = patterns * n * 4 + variables * (n * 4 + 24)
+    model_bytes = variables * MODEL_BYTES_PER_VARIABLE.get(backend, 4096)
+    return {
+        "counts": counts,
+        "patterns": patterns,
+        "variables": variables,
+        "pattern_bytes": pattern_bytes,
+        "model_bytes": model_bytes,
+        "bytes": pattern_bytes + model_bytes,
+        "seconds": patterns / ENUMERATION_PATTERNS_PER_SECOND
+    }
+
+
+def _split_prefix(stock_length, demand_lengths, kerf_width, max_cut_types, prefix, tables, max_counts=None):
+    """
+    把前缀 prefix 下的模式按下一种规格的数量再分开，按 generate_patterns 的搜索顺序
+    返回 [(子前缀, 该子前缀下的模式数), ...]，模式数从 _pattern_count_tables 的 tables 中查出；
+    该分支已被剪枝（后面只能全为 0）时返回 None。
+    """
+    d = len(prefix)
+    sub_length, sub_types = _prefix_subproblem(stock_length, demand_lengths, kerf_width, max_cut_types, prefix)
+    remaining = sub_length + kerf_width
+    widths = [int(l) + kerf_width for l in demand_lengths[d:]]
+    if d == len(demand_lengths) or sub_types <= 0 or remaining < min(widths):
+        return None
+    children = []
+    count = 0
+    limit = _max_counts(stock_length, demand_lengths, max_counts)[d]
+    while count <= limit and count * widths[0] <= remaining:
+        child = prefix + (count,)
+        types = max_cut_types - sub_types + (count > 0)
+        # 叶子数减去全为 0 的组合（只在前缀全为 0 时出现）
+        leaves = int(tables[d + 1][remaining - count * widths[0], types])
+        children.append((child, leaves - (sum(child) == 0)))
+        count += 1
+    return children
+
+
+def _prefix_subproblem(stock_length, demand_lengths, kerf_width, max_cut_types, prefix):
+    """
+    前缀固定后剩下的规格构成一个同样形式的子问题：容量扣掉前缀占用的 数量×(长度+锯缝)，
+    调锯次数扣掉前缀用到的规格数。返回 (子问题原材料长度, 子问题剩余调锯次数)。
+    """
+    used = sum(c * (int(l) + kerf_width) for c, l in zip(prefix, demand_lengths))
+    return stock_length - used, max_cut_types - sum(1 for c in prefix if c > 0)
+
+
+# 进程池工作进程中共享的当前任务批次号（由 _init_pattern_worker 设置），取消时主进程把它加一
+_worker_run_id = None
+
+
+def _init_pattern_worker(run_id):
+    global _worker_run_id
+    _worker_run_id = run_id
+
+
+def _prefix_patterns(stock_length, demand_lengths, kerf_width, max_cut_types, prefix, is_cancelled=None,
+                     max_counts=None):
+    """枚举前几种规格数量固定为 prefix 的全部模式，返回与 generate_patterns 同样格式（int32）的矩阵"""
+    sub_length, sub_types = _prefix_subproblem(stock_length, demand_lengths, kerf_width, max_cut_types, prefix)
+    rest = demand_lengths[len(prefix):]
+    if sub_types > 0 and rest:
+        sub = generate_patterns(sub_length, rest, kerf_width, sub_types, None, 1, is_cancelled,
+                                max_counts=max_counts[len(prefix):] if max_counts is not None else None)
+    else:
+        sub = np.zeros((0, len(rest)), dtype=np.int32)
+    if sum(prefix) > 0:
+        sub = np.vstack([np.zeros((1, len(rest)), dtype=np.int32), sub])
+    patterns = np.empty((len(sub), len(demand_lengths)), dtype=np.int32)
+    patterns[:, :len(prefix)] = prefix
+    patterns[:, len(prefix):] = sub
+    return patterns
+
+
+def _generate_prefix_patterns(stock_length, demand_lengths, kerf_width, max_cut_types, prefix, run_id,
+                              max_counts=None):
+    """
+    进程池任务：枚举前几种规格数量固定为 prefix 的全部模式（见 _prefix_patterns）。
+    批次号 run_id 已经不是当前批次（被取消）时尽快退出。
+    """
+    patterns = _prefix_patterns(stock_length, demand_lengths, kerf_width, max_cut_types, prefix,
+                                lambda: _worker_run_id.value != run_id, max_counts)
+    # 传回主进程时用能装下的最小整数类型（通常是 uint8），减少序列化的数据量
+    return patterns.astype(np.min_scalar_type(patterns.max(initial=0)))
+
+
+def _split_tasks(stock_lengths, demand_lengths, kerf_width, max_cut_types, tables, target, max_counts=None):
+    """
+    把各原材料的枚举切成互不重叠的子任务：反复把模式最多的子任务按下一种规格再分开（见 _split_prefix），
+    直到每个子任务不超过 target 个模式（或已不能再分）。
+    返回按原材料、前缀顺序排列的 [(原材料长度, 前缀, 模式数), ...]，依次拼接即为 generate_patterns 的结果。
+    """
+    tasks = [(stock_length, (), int(tables[stock_length][0][stock_length + kerf_width, 0]) - 1)
+             for stock_length in stock_lengths]
+    final = set()  # 已被剪枝、不能再分的子任务
+    while True:
+        splittable = [i for i, (stock_length, prefix, count) in enumerate(tasks)
+                      if count > target and (stock_length, prefix) not in final]
+        if not splittable:
+            return tasks
+        i = max(splittable, key=lambda i: tasks[i][2])
+        stock_length, prefix, count = tasks[i]
+        children = _split_prefix(stock_length, demand_lengths, kerf_width, max_cut_types, prefix,
+                                 tables[stock_length], max_counts)
+        if children is None:
+            final.add((stock_length, prefix))
+            continue
+        tasks[i:i + 1] = [(stock_length, child, child_count) for child, child_count in children if child_count > 0]
+
+
+def _chunk_rows(num_demands):
+    """每块模式矩阵的行数（int32 矩阵约 PATTERN_CHUNK_BYTES 字节）"""
+    return max(PATTERN_CHUNK_BYTES // (4 * max(num_demands, 1)), 1)
+
+
+def generate_pattern_chunks(stock_length, demand_lengths, kerf_width, max_cut_types, progress_callback,
+                            total_patterns, is_cancelled=None, max_counts=None):
+    """
+    流式枚举：与 generate_patterns 的结果和顺序完全相同，但逐块产出，每块最多约 _chunk_rows 行。
+
+    按 _split_tasks 把搜索树切成约 1/4 块的子任务，连续的子任务凑成一块：按子任务的模式数分配整块，
+    再依次填入。内存中只保留当前这一块和一个子任务。被取消时停止产出。
+    """
+    kerf_width = int(kerf_width)
+    demand_lengths = [int(l) for l in demand_lengths]
+    chunk_rows = _chunk_rows(len(demand_lengths))
+    tables = {stock_length: _pattern_count_tables(stock_length, demand_lengths, kerf_width, max_cut_types,
+                                                  max_counts)}
+    tasks = _split_tasks([stock_length], demand_lengths, kerf_width, max_cut_types, tables,
+                         max(chunk_rows // 4, 1), max_counts)
+    groups = [[]]
+    rows = 0
+    for task in tasks:
+        if rows + task[2] > chunk_rows and groups[-1]:
+            groups.append([])
+            rows = 0
+        groups[-1].append(task)
+        rows += task[2]
+
+    done = 0
+    for group in groups:
+        chunk = np.empty((sum(count for _, _, count in group), len(demand_lengths)), dtype=np.int32)
+        filled = 0
+        for _, prefix, count in group:
+            patterns = _prefix_patterns(stock_length, demand_lengths, kerf_width, max_cut_types, prefix,
+                                        is_cancelled, max_counts)
+            # 被取消时子任务只枚举了一部分
+            if is_cancelled is not None and is_cancelled():
+                return
+            chunk[filled:filled + count] = patterns
+            filled += count
+            done += count
+            if progress_callback is not None:
+                progress_callback.emit(int(done / total_patterns * 100))
+        if len(chunk):
+            yield chunk
+
+
+_pattern_pool = None
+
+
+def _get_pattern_pool(num_workers):
+    """
+    返回 (进程池, 共享的批次号)。进程池在多次计算之间复用，避免每次都重新启动进程、导入模块；
+    用 spawn 启动，不在有 Qt 线程的进程里 fork。
+    """
+    global _pattern_pool
+    if _pattern_pool is None or _pattern_pool[2] != num_workers:
+        # 等旧进程池退出：还在启动的进程要用旧的批次号，不等的话它先被回收，进程启动时出错
+        shutdown_pattern_pool()
+        context = multiprocessing.get_context("spawn")
+        run_id = context.Value("i", 0)
+        executor = ProcessPoolExecutor(num_workers, mp_context=context, initializer=_init_pattern_worker,
+                                       initargs=(run_id,))
+        _pattern_pool = (executor, run_id, num_workers)
+    return _pattern_pool[:2]
+
+
+def shutdown_pattern_pool():
+    """关闭 _get_pattern_pool 复用的进程池（没有则什么也不做），常驻进程退出前调用。"""
+    global _pattern_pool
+    if _pattern_pool is not None:
+        _pattern_pool[0].shutdown(wait=True, cancel_futures=True)
+        _pattern_pool = None
+
+
+def default_pattern_workers(total_patterns):
+    """未指定 pattern_workers 时枚举模式的进程数：多核且模式数达到 PARALLEL_PATTERN_DEFAULT_THRESHOLD 时为 CPU 核数，否则为 1。"""
+    cpu_count = os.cpu_count() or 1
+    return cpu_count if cpu_count > 1 and total_patterns >= PARALLEL_PATTERN_DEFAULT_THRESHOLD else 1
+
+
+def generate_patterns_parallel(stock_lengths, demand_lengths, kerf_width, max_cut_types, progress_callback,
+                               is_cancelled, num_workers, total_patterns, done_patterns=0, max_counts=None):
+    """
+    用进程池枚举多种原材料的切割模式，结果与逐个调用 generate_patterns 完全相同（max_counts 含义也相同）。
+
+    每种原材料按前几种规格的数量切成互不重叠的子任务：反复把模式最多的子任务按下一种规格再分开
+    （见 _split_prefix），直到每个子任务不超过总数的 1/(8×进程数)。不同原材料、同一根长料的不同部分
+    都可以分给不同进程；子任务返回紧凑的整数矩阵，按前缀顺序拼接。
+    主线程等待时汇报进度（按已完成子任务的模式数）并检查取消，取消后通知所有进程停止。
+
+    返回 {原材料长度: 模式矩阵}；被取消时返回 None。
+    """
+    kerf_width = int(kerf_width)
+    demand_lengths = [int(l) for l in demand_lengths]
+    executor, shared_run_id = _get_pattern_pool(num_workers)
+    run_id = shared_run_id.value
+
+    # 切分子任务，进程之间负载均衡，进度也更平滑
+    tables = {stock_length: _pattern_count_tables(stock_length, demand_lengths, kerf_width, max_cut_types, max_counts)
+              for stock_length in stock_lengths}
+    total = sum(int(tables[stock_length][0][stock_length + kerf_width, 0]) - 1 for stock_length in stock_lengths)
+    tasks = _split_tasks(stock_lengths, demand_lengths, kerf_width, max_cut_types, tables,
+                         max(total // (8 * num_workers), MIN_PATTERN_TASK), max_counts)
+
+    futures = {
+        executor.submit(_generate_prefix_patterns, stock_length, demand_lengths, kerf_width, max_cut_types,
+                        prefix, run_id, max_counts): (i, count)
+        for i, (stock_length, prefix, count) in enumerate(tasks)
+    }
+    results = [None] * len(tasks)
+    pending = set(futures)
+    while pending:
+        finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+        for future in finished:
+            i, count = futures[future]
+            results[i] = future.result()
+            done_patterns += count
+        progress_callback.emit(int(done_patterns / total_patterns * 100))
+        if is_cancelled():
+            with shared_run_id.get_lock():
+                shared_run_id.value += 1
+            for future in pending:
+                future.cancel()
+            return None
+
+    blocks = {}
+    for stock_length in stock_lengths:
+        parts = [result for (length, _, _), result in zip(tasks, results) if length == stock_length]
+        blocks[stock_length] = np.vstack(parts).astype(np.int32) if parts \
+            else np.zeros((0, len(demand_lengths)), dtype=np.int32)
+    return blocks
+
+
+class PatternStore:
+    """
+    紧凑的切割模式容器，所有原材料的模式按原材料顺序连续存放：
+    combos 为 模式数 × 需求规格数 的整数矩阵，waste/kerf/utilization 为对应的并行数组，
+    offsets[stock_len]/counts[stock_len] 给出每种原材料的模式在矩阵中的起始行和行数。
+    用量（usage）是与行对齐的整数数组。
+    """
+
+    def __init__(self, demand_lengths, kerf_width, stock_qty, blocks=None):
+        """stock_qty 为 {原材料长度: 库存数量}，blocks 为 {原材料长度: 该原材料的 combos 矩阵}"""
+        self.demand_lengths = np.asarray(demand_lengths, dtype=np.int64)
+        self.kerf_width = int(kerf_width)
+        self.stock_qty = dict(stock_qty)
+        n = len(self.demand_lengths)
+        blocks = blocks or {}
+        self.offsets = {}
+        self.counts = {}
+        parts = []
+        total = 0
+        for stock_len in self.stock_qty:
+            block = np.asarray(blocks.get(stock_len, np.zeros((0, n))), dtype=np.int32).reshape(-1, n)
+            self.offsets[stock_len] = total
+            self.counts[stock_len] = len(block)
+            total += len(block)
+            parts.append(block)
+        self.combos = np.vstack(parts) if parts else np.zeros((0, n), dtype=np.int32)
+
+        stock_lengths = self.row_stock_lengths()
+        consumption, self.kerf = self.consumption(self.combos, self.demand_lengths, self.kerf_width)
+        self.waste = stock_lengths - consumption
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.utilization = np.round(consumption / stock_lengths * 100, 2)
+
+    @staticmethod
+    def consumption(combos, demand_lengths, kerf_width):
+        """每个模式的总消耗（成品长度 + 锯缝）和锯缝损耗，与原来逐个模式计算的公式相同：最后一段不需要锯缝"""
+        pieces = combos.sum(axis=1, dtype=np.int64)
+        # 按 int32 相乘，避免把整个矩阵提升为 int64；结果不超过原材料长度，不会溢出
+        used = (combos @ np.asarray(demand_lengths).astype(np.int32)).astype(np.int64)
+        kerf = int(kerf_width) * np.maximum(pieces - 1, 0)
+        return used + kerf, kerf
+
+    @classmethod
+    def from_longest(cls, demand_lengths, kerf_width, stock_qty, patterns):
+        """
+        由按最长原材料枚举的模式矩阵建立容器：每种原材料取其中总消耗不超过自身长度的行，
+        与对该长度单独调用 generate_patterns 的结果相同，顺序也一致（同一棵搜索树剪掉更多分支）。
+        余料、利用率按各自的原材料长度计算。
+        """
+        consumption, _ = cls.consumption(patterns, demand_lengths, kerf_width)
+        blocks = {}
+        for stock_len in stock_qty:
+            fits = consumption <= stock_len
+            blocks[stock_len] = patterns if fits.all() else patterns[fits]
+        return cls(demand_lengths, kerf_width, stock_qty, blocks)
+
+    @classmethod
+    def stream_from_longest(cls, demand_lengths, kerf_width, stock_qty, chunks, counts, directory):
+        """
+        流式版本的 from_longest：chunks 逐块给出按最长原材料枚举的模式（见 generate_pattern_chunks），
+        counts 为 {原材料长度: 模式数}（见 estimate_pattern_model）。
+        combos/waste/kerf/utilization 写入 directory 下的内存映射 .npy 文件，按块筛选、计算，
+        内存中只保留当前一块；之后的建模、统计也按块读取。
+        """
+        store = cls(demand_lengths, kerf_width, stock_qty)
+        n = len(store.demand_lengths)
+        total = 0
+        for stock_len in store.stock_qty:
+            store.offsets[stock_len] = total
+            store.counts[stock_len] = counts[stock_len]
+            total += counts[stock_len]
+
+        def open_array(name, dtype, shape):
+            return np.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode="w+", dtype=dtype,
+                                             shape=shape)
+        store.combos = open_array("combos", np.int32, (total, n))
+        store.waste = open_array("waste", np.int64, (total,))
+        store.kerf = open_array("kerf", np.int64, (total,))
+        store.utilization = open_array("utilization", np.float64, (total,))
+
+        filled = dict(store.offsets)
+        for chunk in chunks:
+            consumption, kerf = cls.consumption(chunk, store.demand_lengths, store.kerf_width)
+            for stock_len in store.stock_qty:
+                fits = consumption <= stock_len
+                rows = slice(filled[stock_len], filled[stock_len] + int(fits.sum()))
+                store.combos[rows] = chunk[fits]
+                store.waste[rows] = stock_len - consumption[fits]
+                store.kerf[rows] = kerf[fits]
+                store.utilization[rows] = np.round(consumption[fits] / stock_len * 100, 2)
+                filled[stock_len] = rows.stop
+        for array in (store.combos, store.waste, store.kerf, store.utilization):
+            array.flush()
+        return store
+
+    @classmethod
+    def from_plan(cls, demand_lengths, kerf_width, stock_qty, plan):
+        """由 {(原材料长度, combo): 使用次数} 建立容器，返回 (store, usage)"""
+        blocks = defaultdict(list)
+        used = defaultdict(list)
+        for (stock_len, combo), count in plan.items():
+            blocks[stock_len].append(combo)
+            used[stock_len].append(count)
+        store = cls(demand_lengths, kerf_width, stock_qty, blocks)
+        usage = np.array([count for stock_len in store.stock_qty for count in used.get(stock_len, [])],
+                         dtype=np.int64)
+        return store, usage
+
+    def __len__(self):
+        return len(self.combos)
+
+    def stock_slice(self, stock_len):
+        return slice(self.offsets[stock_len], self.offsets[stock_len] + self.counts[stock_len])
+
+    def row_stock_lengths(self):
+        """每一行模式对应的原材料长度"""
+        return np.repeat(np.array(list(self.stock_qty), dtype=np.int64),
+                         [self.counts[stock_len] for stock_len in self.stock_qty])
+
+    def select(self, rows):
+        """只保留 rows（布尔掩码或行号，按原顺序）对应的模式，返回新的容器"""
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows)
+        blocks = {}
+        for stock_len in self.stock_qty:
+            block = self.stock_slice(stock_len)
+            blocks[stock_len] = self.combos[rows[(rows >= block.start) & (rows < block.stop)]]
+        return PatternStore(self.demand_lengths, self.kerf_width, self.stock_qty, blocks)
+
+    def row_chunks(self):
+        """按块遍历全部模式的行号范围（每块约 PATTERN_CHUNK_BYTES），写入磁盘的容器也只按块读入内存"""
+        step = _chunk_rows(self.combos.shape[1])
+        for start in range(0, len(self), step):
+            yield slice(start, min(start + step, len(self)))
+
+    @property
+    def spilled(self):
+        """模式矩阵是否在磁盘上（stream_from_longest 建立的容器）"""
+        return isinstance(self.combos, np.memmap)
+
+    @property
+    def nbytes(self):
+        return self.combos.nbytes + self.waste.nbytes + self.kerf.nbytes + self.utilization.nbytes
+
+
+class _DiskCache:
+    """
+    磁盘缓存的公共部分：directory 中每个条目一个数据文件，index.json 记录各文件的键、大小和最近使用时间，
+    总大小超过 max_bytes 时按 LRU 删除。多个进程/线程可以同时使用同一目录：索引的读写由锁文件保护，
+    数据文件先写临时文件再原子替换。
+    """
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, directory, max_bytes, lock_timeout=10.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock_timeout = lock_timeout
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """用 O_EXCL 创建锁文件实现跨进程互斥；持锁进程崩溃留下的锁超过 lock_timeout 视为失效"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, self.LOCK_FILE)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) > self.lock_timeout:
+                        os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"缓存被占用: {path}")
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(path)
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def _remove_entry(self, index, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return  # Windows 上文件仍被其他进程映射时删不掉，下次再删
+        del index[name]
+
+    def _evict(self, index, keep):
+        """按最近使用时间淘汰，直到总大小不超过 max_bytes；keep（刚写入的条目）保留"""
+        total = sum(entry["bytes"] for entry in index.values())
+        for old in sorted(index, key=lambda n: index[n]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if old != keep:
+                size = index[old]["bytes"]
+                self._remove_entry(index, old)
+                if old not in index:
+                    total -= size
+
+
+class PatternCache(_DiskCache):
+    """
+    切割模式的磁盘缓存，同样的目录规格、锯缝和调锯次数第二次计算时不再枚举。
+
+    键是 (原材料长度, 排序去重后的需求长度, 各规格的数量上限, 锯缝, 调锯次数) 的规范形式，
+    数量上限取实际起作用的值（见 _max_counts），调锯次数超过规格数时按规格数计。每个键的模式矩阵（列按排序后的需求长度）存为一个 .npy 文件，
+    读取时用内存映射；index.json 记录各文件的键、大小和最近使用时间，总大小超过 max_bytes 时按 LRU 删除。
+    需求长度是某个已缓存键的子集（数量上限、调锯次数也不超过，原材料不比它长）时，从该缓存中筛出
+    只含这些规格、各项都不超限、总消耗不超过原材料长度的行，结果与直接枚举的模式集合相同（行顺序可能不同）。
+
+    缓存出错（磁盘满、文件损坏、锁超时）只会退回到重新枚举，不影响求解。
+    """
+    def __init__(self, directory=PATTERN_CACHE_DIR, max_bytes=PATTERN_CACHE_MAX_BYTES, lock_timeout=10.0):
+        super().__init__(directory, max_bytes, lock_timeout)
+
+    @staticmethod
+    def canonical_key(stock_length, demand_lengths, kerf_width, max_cut_types, max_counts=None):
+        """需求长度有重复时返回 None（此时列无法一一对应，不使用缓存）"""
+        limits = _max_counts(stock_length, demand_lengths, max_counts)
+        pairs = sorted(zip((int(l) for l in demand_lengths), limits))
+        lengths = [length for length, _ in pairs]
+        if len(set(lengths)) != len(lengths):
+            return None
+        return {
+            "stock_length": int(stock_length),
+            "demand_lengths": lengths,
+            "max_counts": [limit for _, limit in pairs],
+            "kerf_width": int(kerf_width),
+            "max_cut_types": min(int(max_cut_types), len(lengths))
+        }
+
+    def lookup(self, stock_length, demand_lengths, kerf_width, max_cut_types, max_counts=None):
+        """返回按 demand_lengths 顺序排列列的模式矩阵；没有可用缓存时返回 None"""
+        key = self.canonical_key(stock_length, demand_lengths, kerf_width, max_cut_types, max_counts)
+        if key is None:
+            return None
+        wanted = dict(zip(key["demand_lengths"], key["max_counts"]))
+
+        def covers(entry_key):
+            if "max_counts" not in entry_key:
+                return False  # 旧格式的缓存，没有记录数量上限
+            limits = dict(zip(entry_key["demand_lengths"], entry_key["max_counts"]))
+            return all(length in limits and limits[length] >= limit for length, limit in wanted.items())
+
+        try:
+            with self._locked():
+                index = self._read_index()
+                # 完全相同的键，或可以筛选出结果的更大的键（行数最少的那个）
+                candidates = [
+                    (entry["rows"], name) for name, entry in index.items()
+                    if entry["key"]["stock_length"] >= key["stock_length"]
+                    and entry["key"]["kerf_width"] == key["kerf_width"]
+                    and entry["key"]["max_cut_types"] >= key["max_cut_types"]
+                    and covers(entry["key"])
+                ]
+                if not candidates:
+                    return None
+                _, name = min(candidates)
+                entry = index[name]
+                entry["last_used"] = time.time()
+                self._write_index(index)
+            cached = np.load(os.path.join(self.directory, name), mmap_mode="r")
+        except (OSError, ValueError, TimeoutError) as e:
+            print(f"读取模式缓存失败: {e}")
+            return None
+
+        columns = entry["key"]["demand_lengths"]
+        positions = [columns.index(int(l)) for l in demand_lengths]
+        others = [i for i, l in enumerate(columns) if l not in wanted]
+        if entry["key"] == key:
+            return np.ascontiguousarray(cached[:, positions])
+        # 更大的键：只保留其余规格全为 0、数量和调锯次数不超限、原材料装得下的行
+        mask = ~(cached[:, others] > 0).any(axis=1)
+        limits = [wanted[int(l)] for l in demand_lengths]
+        if any(entry["key"]["max_counts"][p] > limit for p, limit in zip(positions, limits)):
+            mask &= (cached[:, positions] <= np.array(limits)).all(axis=1)
+        if entry["key"]["max_cut_types"] > key["max_cut_types"]:
+            mask &= (cached[:, positions] > 0).sum(axis=1) <= key["max_cut_types"]
+        patterns = np.ascontiguousarray(cached[mask][:, positions])
+        if entry["key"]["stock_length"] > key["stock_length"]:
+            consumption, _ = PatternStore.consumption(patterns, demand_lengths, key["kerf_width"])
+            patterns = patterns[consumption <= key["stock_length"]]
+        return patterns
+
+    def store(self, stock_length, demand_lengths, kerf_width, max_cut_types, patterns, max_counts=None):
+        """保存 generate_patterns 的结果（列按 demand_lengths 顺序），超出容量时删除最久未用的缓存"""
+        key = self.canonical_key(stock_length, demand_lengths, kerf_width, max_cut_types, max_counts)
+        if key is None:
+            return
+        order = np.argsort(np.asarray(demand_lengths, dtype=np.int64), kind="stable")
+        patterns = np.ascontiguousarray(patterns[:, order], dtype=np.int32)
+        if patterns.nbytes > self.max_bytes:
+            return
+        name = hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest() + ".npy"
+        path = os.path.join(self.directory, name)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "wb") as f:
+                np.save(f, patterns)
+            with self._locked():
+                os.replace(temp_path, path)
+                index = self._read_index()
+                index[name] = {
+                    "key": key,
+                    "rows": len(patterns),
+                    "bytes": os.path.getsize(path),
+                    "last_used": time.time()
+                }
+                self._evict(index, name)
+                self._write_index(index)
+        except (OSError, ValueError, TimeoutError) as e:
+            print(f"写入模式缓存失败: {e}")
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+
+
+class ResultCache(_DiskCache):
+    """
+    整个方案的磁盘缓存：完全相同的订单（原材料、需求、锯缝、调锯次数、求解时间和求解参数）再次计算时
+    直接用上次的方案生成报告。
+
+    键是实例的规范形式（相同长度的行合并、去掉数量为 0 的行、按长度排序）加上求解参数，文件名为其 SHA-1。
+    每个方案存为一个小 JSON 文件：求解状态、计算时间和用到的每个模式（原材料长度、各成品长度的段数、使用次数），
+    与需求的行顺序无关。缓存出错只会退回到重新计算。
+    """
+    def __init__(self, directory=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES, lock_timeout=10.0):
+        super().__init__(directory, max_bytes, lock_timeout)
+
+    @staticmethod
+    def canonical_key(data, solver_time_limit, max_cut_types, **options):
+        """options 为影响求解结果的参数（engine、backend、mip_gap 等）"""
+        def rows(items):
+            return sorted([int(s["length"]), int(s["quantity"])] for s in merge_stock_rows(items)
+                          if s["quantity"] > 0)
+        return {
+            "stock": rows(data["stock"]),
+            "demands": rows(data["demands"]),
+            "kerf_width": int(data["kerf_width"]),
+            "max_cut_types": int(max_cut_types),
+            "solver_time_limit": int(solver_time_limit),
+            **options
+        }
+
+    @staticmethod
+    def _name(key):
+        return hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest() + ".json"
+
+    def lookup(self, key, demand_lengths, kerf_width, stock_qty):
+        """
+        命中时返回 (status, store, usage, 计算时间)：store 只含方案用到的模式，列按 demand_lengths 的顺序；
+        没有缓存时返回 None
+        """
+        name = self._name(key)
+        try:
+            with self._locked():
+                index = self._read_index()
+                if name not in index:
+                    return None
+                index[name]["last_used"] = time.time()
+                self._write_index(index)
+            with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError, TimeoutError) as e:
+            print(f"读取结果缓存失败: {e}")
+            return None
+        columns = {int(length): i for i, length in enumerate(demand_lengths)}
+        plan = {}
+        for stock_len, pieces, count in entry["rows"]:
+            combo = [0] * len(demand_lengths)
+            for length, pieces_count in pieces:
+                combo[columns[length]] = pieces_count
+            plan[(stock_len, tuple(combo))] = count
+        store, usage = PatternStore.from_plan(demand_lengths, kerf_width, stock_qty, plan)
+        return entry["status"], store, usage, entry["solved_at"]
+
+    def store(self, key, status, store, usage):
+        """保存方案（只记录 usage 大于 0 的模式），超出容量时删除最久未用的缓存"""
+        rows = np.flatnonzero(usage)
+        stock_lengths = store.row_stock_lengths()[rows]
+        lengths = store.demand_lengths.tolist()
+        entry = {
+            "status": int(status),
+            "solved_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "rows": [[int(stock_len), [[lengths[i], int(c)] for i, c in enumerate(combo) if c > 0], int(count)]
+                     for stock_len, combo, count in zip(stock_lengths.tolist(), store.combos[rows].tolist(),
+                                                        usage[rows].tolist())]
+        }
+        name = self._name(key)
+        path = os.path.join(self.directory, name)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            with self._locked():
+                os.replace(temp_path, path)
+                index = self._read_index()
+                index[name] = {"bytes": os.path.getsize(path), "last_used": time.time()}
+                self._evict(index, name)
+                self._write_index(index)
+        except (OSError, ValueError, TimeoutError) as e:
+            print(f"写入结果缓存失败: {e}")
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+
+
+def price_pattern(stock_length, demand_lengths, demand_quantities, kerf_width, max_cut_types, duals):
+    """
+    列生成的定价子问题：带锯缝和调锯次数限制的有界背包。
+
+    在一根原材料上选择各规格的数量，使对偶价值之和最大。按 (已用规格数, 已用容量) 做动态规划，
+    每个规格一次向量化更新。返回 (对偶价值, combo)，找不到任何切割时 combo 为 None。
+    """
+    kerf_width = int(kerf_width)
+    capacity = stock_length + kerf_width  # 与 generate_patterns 相同：每段占用 长度+锯缝
+
+    # 对偶价值不为正的规格不会让模式更优，直接跳过
+    items = [i for i, dual in enumerate(duals) if dual > 1e-9 and demand_lengths[i] + kerf_width <= capacity]
+    max_types = min(max_cut_types, len(items))
+    if max_types <= 0:
+        return 0, None
+
+    # best[t, c]: 至多 t 种规格、占用不超过 c 时的最大对偶价值
+    best = np.zeros((max_types + 1, capacity + 1))
+    choices = []
+    for i in items:
+        width = demand_lengths[i] + kerf_width
+        upper = min(capacity // width, demand_quantities[i])
+        updated = best.copy()
+        choice = np.zeros(best.shape, dtype=np.int32)
+        for count in range(1, upper + 1):
+            shift = count * width
+            candidate = best[:-1, :capacity + 1 - shift] + count * duals[i]
+            target = updated[1:, shift:]
+            better = candidate > target
+            target[better] = candidate[better]
+            choice[1:, shift:][better] = count
+        best = updated
+        choices.append(choice)
+
+    combo = [0] * len(demand_lengths)
+    t, c = max_types, capacity
+    for i, choice in zip(reversed(items), reversed(choices)):
+        count = int(choice[t, c])
+        if count:
+            combo[i] = count
+            c -= count * (demand_lengths[i] + kerf_width)
+            t -= 1
+    if sum(combo) == 0:
+        return 0, None
+    return float(best[max_types, capacity]), tuple(combo)
+
+
+def generate_patterns_column_generation(stock, demands, kerf_width, max_cut_types, progress_callback, is_cancelled,
+                                        max_iterations=1000):
+    """
+    用列生成（Gilmore–Gomory）代替完整枚举来产生切割模式。
+
+    从每种规格的单件模式和最大同规格模式出发，反复求解主问题的线性松弛，
+    再对每种原材料求解定价背包，把检验数为负的模式加入主问题，直到没有可改进的模式。
+    返回与完整枚举相同的 PatternStore，供后续整数模型和报告使用。
+    """
+    demand_lengths = [d["length"] for d in demands]
+    demand_quantities = [d["quantity"] for d in demands]
+    kerf_width = int(kerf_width)
+    stock_qty = {s["length"]: s["quantity"] for s in stock}
+    columns = {stock_len: [] for stock_len in stock_qty}
+
+    # 主问题的线性松弛，新模式以新变量的形式增量加入
+    lp = pywraplp.Solver.CreateSolver("GLOP")
+    objective = lp.Objective()
+    objective.SetMinimization()
+    stock_constraints = {stock_len: lp.Constraint(-lp.infinity(), qty) for stock_len, qty in stock_qty.items()}
+    demand_constraints = [lp.Constraint(q, q) for q in demand_quantities]
+
+    # 初始模式往往不够用满库存，给库存约束加高代价的虚拟原材料，保证线性松弛始终可行
+    penalty = sum(demand_quantities) + 1
+    for stock_len, constraint in stock_constraints.items():
+        artificial = lp.NumVar(0, lp.infinity(), f"extra_{stock_len}")
+        objective.SetCoefficient(artificial, penalty)
+        constraint.SetCoefficient(artificial, -1)
+
+    known_combos = {stock_len: set() for stock_len in stock_qty}
+
+    def add_column(stock_len, combo):
+        if combo in known_combos[stock_len]:
+            return False
+        known_combos[stock_len].add(combo)
+        columns[stock_len].append(combo)
+        var = lp.NumVar(0, stock_qty[stock_len], "")
+        objective.SetCoefficient(var, 1)
+        stock_constraints[stock_len].SetCoefficient(var, 1)
+        for i, count in enumerate(combo):
+            if count:
+                demand_constraints[i].SetCoefficient(var, count)
+        return True
+
+    # 初始模式：单件模式保证整数问题可行，最大同规格模式给线性松弛一个好的起点
+    if max_cut_types >= 1:
+        for stock_len in stock_qty:
+            for i, (length, quantity) in enumerate(zip(demand_lengths, demand_quantities)):
+                most = min((stock_len + kerf_width) // (length + kerf_width), quantity)
+                for count in {1, most}:
+                    if count >= 1:
+                        combo = tuple(count if j == i else 0 for j in range(len(demand_lengths)))
+                        add_column(stock_len, combo)
+
+    for iteration in range(max_iterations):
+        if is_cancelled():
+            break
+        if lp.Solve() != lp.OPTIMAL:
+            break  # 线性松弛无解时整数问题同样无解，交给后续求解报告
+
+        duals = [c.dual_value() for c in demand_constraints]
+        stock_duals = {stock_len: c.dual_value() for stock_len, c in stock_constraints.items()}
+        added = 0
+        for stock_len in stock_qty:
+            value, combo = price_pattern(stock_len, demand_lengths, demand_quantities, kerf_width, max_cut_types, duals)
+            reduced_cost = 1 - value - stock_duals[stock_len]
+            if combo is not None and reduced_cost < -1e-6 and add_column(stock_len, combo):
+                added += 1
+
+        progress_callback.emit(int(60 * iteration / (iteration + 10)))
+        if added == 0:
+            break
+
+    return PatternStore(demand_lengths, kerf_width, stock_qty, columns)
+
+
+def filter_maximal_patterns(store, demand_quantities, max_cut_types):
+    """
+    只保留极大切割模式：各规格数量不超过需求，且余料里再也放不下任何一段还没切够的规格。
+
+    对“需求恰好满足”的模型，极大模式加上 >= 需求约束与完整模式集的最优值相同：
+    恰好满足的解中每个模式都可以逐段补成极大模式，原材料数不变；
+    反过来 >= 约束下多切的成品可以从模式中去掉（见 trim_overproduction），原材料数不会增加。
+    返回只含极大模式的新 PatternStore。
+    """
+    quantities = np.asarray(demand_quantities, dtype=np.int64)
+    widths = store.demand_lengths + store.kerf_width
+    maximal = np.zeros(len(store), dtype=bool)
+    # 按块判断，写入磁盘的容器也不必整个读入内存
+    for rows in store.row_chunks():
+        combos = store.combos[rows]
+        within_demand = (combos <= quantities).all(axis=1)
+        types = (combos > 0).sum(axis=1)
+        # 追加一段需要 长度+锯缝 的余料；新规格还要受调锯次数限制
+        extendable = ((combos < quantities) & (widths <= store.waste[rows, None])
+                      & ((combos > 0) | (types < max_cut_types)[:, None])).any(axis=1)
+        maximal[rows] = within_demand & ~extendable
+    return store.select(maximal)
+
+
+def trim_overproduction(store, usage, demands):
+    """
+    从 >= 需求约束的解中去掉多切的成品，得到恰好满足需求的方案。
+
+    去掉若干段后的模式仍然可行（长度和调锯次数都不会增加），原材料数也不会增加。
+    返回新的 (store, usage)，只包含实际使用的模式。
+    """
+    plan = defaultdict(int)
+    stock_lengths = store.row_stock_lengths()
+    for row in np.flatnonzero(usage):
+        plan[(int(stock_lengths[row]), tuple(int(c) for c in store.combos[row]))] += int(usage[row])
+
+    for i, demand in enumerate(demands):
+        surplus = sum(combo[i] * used for (_, combo), used in plan.items()) - demand["quantity"]
+        for stock_len, combo in list(plan):
+            if surplus <= 0:
+                break
+            if combo[i] == 0:
+                continue
+            # 先整根去掉该规格，剩余不足一根的部分只从一根上去掉
+            bars = min(plan[(stock_len, combo)], surplus // combo[i])
+            moves = [(bars, 0)] if bars else []
+            if bars < plan[(stock_len, combo)] and 0 < surplus - bars * combo[i] < combo[i]:
+                moves.append((1, combo[i] - (surplus - bars * combo[i])))
+            for count, remaining in moves:
+                trimmed = combo[:i] + (remaining,) + combo[i + 1:]
+                plan[(stock_len, combo)] -= count
+                if sum(trimmed) > 0:
+                    plan[(stock_len, trimmed)] += count
+                surplus -= count * (combo[i] - remaining)
+            if plan[(stock_len, combo)] == 0:
+                del plan[(stock_len, combo)]
+
+    return PatternStore.from_plan(store.demand_lengths, store.kerf_width, store.stock_qty, plan)
+
+
+def create_mip_solver(backend="SCIP", num_workers=1):
+    """
+    创建整数规划求解器。"SCIP" 为单线程分支定界；"CP-SAT" 使用 num_workers 个并行搜索线程。
+    两者都通过 pywraplp 调用，状态码和 solution_value() 的用法完全相同。
+    """
+    if backend == "CP-SAT":
+        solver = pywraplp.Solver.CreateSolver("CP_SAT")
+        solver.SetNumThreads(max(1, int(num_workers)))
+    else:
+        solver = pywraplp.Solver.CreateSolver("SCIP")
+    return solver
+
+
+def length_lower_bound(stock, demands, kerf_width):
+    """
+    原材料根数的下界：成品总占用长度（每段 长度+锯缝）至少要由这么多根原材料的容量（长度+锯缝）覆盖，
+    按原材料从长到短计入。库存总容量都不够时返回 None。
+    """
+    required = sum(d["quantity"] * (d["length"] + kerf_width) for d in demands)
+    bars = 0
+    for s in sorted(stock, key=lambda s: -s["length"]):
+        capacity = s["length"] + kerf_width
+        if s["quantity"] * capacity >= required:
+            return bars + math.ceil(required / capacity)
+        bars += s["quantity"]
+        required -= s["quantity"] * capacity
+    return None
+
+
+def within_gap(value, bound, relative_gap):
+    """目标值 value 与下界 bound 的相对间隙是否不超过 relative_gap（与 MIP 求解器的定义相同）"""
+    return bound is not None and value - bound <= relative_gap * value
+
+
+def pattern_matrix(store, rows=slice(None)):
+    """
+    把切割模式的组合整理成 需求 × 模式 的稀疏矩阵（CSR：indptr/indices/data），
+    模式编号即 store 中的行号。rows 为行号范围（按块建模时每次一块），默认全部。返回 (indptr, indices, data)。
+    """
+    combos = store.combos[rows]
+    num_demands = combos.shape[1]
+    # 转置后按行取非零元素，顺序正好是 CSR
+    demand_rows, indices = np.nonzero(combos.T)
+    data = combos.T[demand_rows, indices]
+    indptr = np.searchsorted(demand_rows, np.arange(num_demands + 1))
+    return indptr, indices + (rows.start or 0), data
+
+
+def _add_pattern_model(solver, store, demands, exact_demand, integer=True):
+    """
+    在 solver 中建立模式模型的变量、约束和目标函数，返回与 store 行对齐的变量列表。
+
+    不再逐个调用 IntVar/SetCoefficient：先按 pattern_matrix 的稀疏矩阵拼出 MPModelProto，
+    每个约束只写入非零系数（按块整段 extend），再一次性 LoadModelFromProto。
+    """
+    start = time.perf_counter()
+    model = linear_solver_pb2.MPModelProto()
+
+    # 变量：每个模式的使用次数，目标系数 1（最小化总使用次数）
+    for stock_len, stock_qty in store.stock_qty.items():
+        for _ in range(store.counts[stock_len]):
+            var = model.variable.add()
+            var.lower_bound = 0  # MPVariableProto 的默认下界是 -inf
+            var.upper_bound = stock_qty
+            var.objective_coefficient = 1
+            var.is_integer = integer
+
+    # 库存约束
+    for stock_len, stock_qty in store.stock_qty.items():
+        constraint = model.constraint.add()
+        constraint.lower_bound = -math.inf
+        constraint.upper_bound = stock_qty
+        constraint.var_index.extend(range(store.offsets[stock_len], store.offsets[stock_len] + store.counts[stock_len]))
+        constraint.coefficient.extend([1.0] * store.counts[stock_len])
+
+    # 需求约束：只写入非零系数，模式矩阵按块读取
+    demand_constraints = []
+    for demand in demands:
+        constraint = model.constraint.add()
+        constraint.lower_bound = demand["quantity"]
+        constraint.upper_bound = demand["quantity"] if exact_demand else math.inf
+        demand_constraints.append(constraint)
+    nonzeros = 0
+    for rows in store.row_chunks():
+        indptr, indices, data = pattern_matrix(store, rows)
+        for i, constraint in enumerate(demand_constraints):
+            constraint.var_index.extend(indices[indptr[i]:indptr[i + 1]].tolist())
+            constraint.coefficient.extend(data[indptr[i]:indptr[i + 1]].astype(np.float64).tolist())
+        nonzeros += len(data)
+
+    error = solver.LoadModelFromProto(model)
+    if error:
+        raise RuntimeError(f"建立模型失败: {error}")
+    variables = solver.variables()
+    if integer:
+        print(f"模式模型：{len(variables)} 个变量，{nonzeros} 个非零系数，建模 {time.perf_counter() - start:.2f} 秒")
+    return variables
+
+
+def pattern_lp_bound(store, demands, exact_demand=True):
+    """模式模型线性松弛（GLOP）的最优值，向上取整后是原材料根数的下界。松弛不可行时返回 None"""
+    solver = pywraplp.Solver.CreateSolver("GLOP")
+    _add_pattern_model(solver, store, demands, exact_demand, integer=False)
+    if solver.Solve() != solver.OPTIMAL:
+        return None
+    return solver.Objective().Value()
+
+
+def warm_start_budget(solver_time_limit, patterns=None):
+    """
+    精确模式热启动的启发式时间（秒），0 表示不做热启动。patterns 为模式模型的变量数：
+    少于 WARM_START_MIN_PATTERNS 时求解器本身很快，启发式和线性松弛下界只会拖慢；
+    否则按 WARM_START_PATTERNS_PER_SECOND 随模型大小给时间。列生成和弧流（patterns 为 None）直接给上限。
+    上限为求解时间的 5%，且不超过 1 秒。
+    """
+    budget = min(solver_time_limit / 1000 * 0.05, 1.0)
+    if patterns is None:
+        return budget
+    if patterns < WARM_START_MIN_PATTERNS:
+        return 0.0
+    return min(budget, patterns / WARM_START_PATTERNS_PER_SECOND)
+
+
+def merge_warm_start(store, warm_store, warm_usage):
+    """
+    把启发式方案用到的切割模式并入 store（没有的追加到该原材料的末尾，不影响最优值），
+    返回 (新的 store, 与其行对齐的提示值)，提示值可直接传给 solve_pattern_model 的 hint。
+    """
+    blocks = {}
+    hints = {}
+    for stock_len in store.stock_qty:
+        block = store.combos[store.stock_slice(stock_len)]
+        values = [0] * len(block)
+        extra = []
+        if stock_len in warm_store.stock_qty:
+            index = {combo.tobytes(): i for i, combo in enumerate(block)}
+            warm_rows = warm_store.stock_slice(stock_len)
+            for combo, used in zip(warm_store.combos[warm_rows], warm_usage[warm_rows]):
+                key = combo.tobytes()
+                if key not in index:
+                    index[key] = len(block) + len(extra)
+                    extra.append(combo)
+                    values.append(0)
+                values[index[key]] += int(used)
+        blocks[stock_len] = np.vstack([block] + extra) if extra else block
+        hints[stock_len] = values
+    merged = PatternStore(store.demand_lengths, store.kerf_width, store.stock_qty, blocks)
+    hint = np.array([value for stock_len in merged.stock_qty for value in hints[stock_len]], dtype=np.int64)
+    return merged, hint
+
+
+def _solve_with_gap(solver, solver_time_limit, relative_gap=0.0, register_solver=None):
+    """
+    求解整数规划，现有解与求解器自己的下界（根节点线性松弛向上取整起步）的相对间隙
+    不超过 relative_gap 即停止，不必再花时间证明最优。
+    求解前调用 register_solver(solver)，其他线程可以用 solver.InterruptSolve() 中断求解，
+    中断后已有可行解时状态为 FEASIBLE。
+    """
+    if register_solver is not None:
+        register_solver(solver)
+    params = pywraplp.MPSolverParameters()
+    if relative_gap > 0:
+        params.SetDoubleParam(params.RELATIVE_MIP_GAP, relative_gap)
+    solver.SetTimeLimit(solver_time_limit)
+    return solver.Solve(params)
+
+
+def solution_values(solver):
+    """一次取出全部变量的取值（按变量顺序，四舍五入为整数数组），不逐个调用 solution_value()"""
+    response = linear_solver_pb2.MPSolutionResponse()
+    solver.FillSolutionResponseProto(response)
+    return np.rint(np.array(response.variable_value, dtype=np.float64)).astype(np.int64)
+
+
+def solve_pattern_model(store, demands, solver_time_limit, exact_demand=True, backend="SCIP", num_workers=1,
+                        hint=None, relative_gap=0.0, register_solver=None, model=None):
+    """
+    在给定的切割模式上建立整数规划并求解。
+    exact_demand 为 False 时需求约束为 >= 需求数量（配合 filter_maximal_patterns 使用）。
+    backend/num_workers 见 create_mip_solver。
+    hint 为初始可行解（见 merge_warm_start），relative_gap/register_solver 见 _solve_with_gap。
+    model 为已在 store 上建好、界已更新的 (solver, variables)（见 SolveSession.lookup_model），给出时不再建模。
+
+    返回 (solver, status, variables)，variables 为与 store 行对齐的整数变量列表。
+    """
+    if model is None:
+        # 创建求解器
+        solver = create_mip_solver(backend, num_workers)
+        variables = _add_pattern_model(solver, store, demands, exact_demand)
+    else:
+        solver, variables = model
+
+    # 用初始方案热启动（复用的模型先清掉上一次的提示）
+    if hint is not None:
+        solver.SetHint(variables, [float(value) for value in hint])
+    elif model is not None:
+        solver.SetHint([], [])
+
+    # 求解
+    status = _solve_with_gap(solver, solver_time_limit, relative_gap, register_solver)
+    return solver, status, variables
+
+
+def solve_arc_flow(stock, demands, kerf_width, max_cut_types, solver_time_limit, backend="SCIP", num_workers=1,
+                   relative_gap=0.0, register_solver=None):
+    """
+    弧流（arc-flow）精确模型，不需要枚举切割模式。
+
+    每种原材料一张按需求规格分层的有向图：节点 (层 i, 位置 pos, 已用规格数 t)，
+    第 i 层的弧表示切 k 段第 i 种规格（占用 k×(长度+锯缝)），或跳过该规格，
+    每条源点到汇点的路径就是一个切割模式。节点位置会被抬升到剩余容量中后续规格真正能用到的部分，
+    剩余部分相同的节点随之合并，因此模型规模只取决于 原材料长度 × 规格数，与模式数量无关。
+
+    backend/num_workers 见 create_mip_solver，relative_gap/register_solver 见 _solve_with_gap。
+
+    返回 (status, store, usage)，其中 PatternStore 与行对齐的 usage 由流分解得到；没有可行解时后两项为 None。
+    """
+    demand_lengths = [d["length"] for d in demands]
+    demand_quantities = [d["quantity"] for d in demands]
+    kerf_width = int(kerf_width)
+    n = len(demand_lengths)
+    stock_qty = {s["length"]: s["quantity"] for s in stock}
+    max_capacity = max(stock_qty) + kerf_width
+    max_types = max(min(max_cut_types, n), 0)
+    widths = [l + kerf_width for l in demand_lengths]
+    uppers = [min(max_capacity // w, q) for w, q in zip(widths, demand_quantities)]
+
+    # reachable[i, t, r]: 第 i 个及以后的规格、至多 t 种，能否恰好占用 r
+    reachable = np.zeros((n + 1, max_types + 1, max_capacity + 1), dtype=bool)
+    reachable[n, :, 0] = True
+    for i in range(n - 1, -1, -1):
+        reachable[i] = reachable[i + 1]
+        for count in range(1, uppers[i] + 1):
+            shift = count * widths[i]
+            reachable[i, 1:, shift:] |= reachable[i + 1, :-1, :max_capacity + 1 - shift]
+    # usable[i, t, r]: 剩余容量为 r 时，后续规格最多能用掉多少
+    usable = np.maximum.accumulate(
+        np.where(reachable, np.arange(max_capacity + 1, dtype=np.int32), -1).astype(np.int32), axis=2)
+
+    # 为每种原材料逐层构造节点和弧：arc = (tail, head, 规格序号, 段数)
+    arcs = []
+    for stock_len in stock_qty:
+        capacity = stock_len + kerf_width
+        sink = ("sink", stock_len)
+        layer = {(0, 0)}
+        for i in range(n):
+            next_layer = set()
+            for pos, t in layer:
+                tail = (stock_len, i, pos, t)
+                for count in range(0, uppers[i] + 1):
+                    head_pos = pos + count * widths[i]
+                    head_t = t + (count > 0)
+                    if head_pos > capacity or head_t > max_types:
+                        break
+                    used = usable[i + 1, max_types - head_t, capacity - head_pos]
+                    if used == 0:
+                        head = sink  # 后续规格都放不下，直接连到汇点
+                    else:
+                        next_layer.add((capacity - used, head_t))
+                        head = (stock_len, i + 1, capacity - used, head_t)
+                    arcs.append((tail, head, i, count))
+            layer = next_layer
+
+    solver = create_mip_solver(backend, num_workers)
+    total_stock = sum(stock_qty.values())
+    flows = [solver.IntVar(0, total_stock, f"f_{a}") for a in range(len(arcs))]
+
+    balance = {}  # 中间节点的流量守恒约束
+    source_constraints = {stock_len: solver.Constraint(0, qty) for stock_len, qty in stock_qty.items()}
+    demand_constraints = [solver.Constraint(q, q) for q in demand_quantities]
+    objective = solver.Objective()
+    for (tail, head, item, count), flow in zip(arcs, flows):
+        if tail[1] == 0:
+            # 从源点流出的总量即该原材料的使用数量
+            objective.SetCoefficient(flow, 1)
+            source_constraints[tail[0]].SetCoefficient(flow, 1)
+        else:
+            if tail not in balance:
+                balance[tail] = solver.Constraint(0, 0)
+            balance[tail].SetCoefficient(flow, -1)
+        if head[0] != "sink":
+            if head not in balance:
+                balance[head] = solver.Constraint(0, 0)
+            balance[head].SetCoefficient(flow, 1)
+        if count:
+            demand_constraints[item].SetCoefficient(flow, count)
+    objective.SetMinimization()
+
+    print(f"弧流模型：{len(balance) + 2 * len(stock_qty)} 个节点，{len(arcs)} 条弧")
+    status = _solve_with_gap(solver, solver_time_limit, relative_gap, register_solver)
+    if status not in (solver.OPTIMAL, solver.FEASIBLE):
+        return status, None, None
+
+    # 流分解：沿有剩余流量的弧从源点走到汇点，每条路径对应一个切割模式
+    outgoing = defaultdict(list)
+    for arc, value in zip(arcs, solution_values(solver).tolist()):
+        if value > 0:
+            outgoing[arc[0]].append([arc, value])
+
+    plan = defaultdict(int)
+    for stock_len in stock_qty:
+        source = (stock_len, 0, 0, 0)
+        while outgoing[source]:
+            path = []
+            node = source
+            while node[0] != "sink":
+                entry = outgoing[node][0]
+                path.append(entry)
+                node = entry[0][1]
+            amount = min(entry[1] for entry in path)
+            combo = [0] * n
+            for entry in path:
+                (tail, head, item, count), _ = entry
+                combo[item] += count
+                entry[1] -= amount
+                if entry[1] == 0:
+                    outgoing[tail].remove(entry)
+            if sum(combo) > 0:  # 全部跳过的路径是空模式，不占用原材料
+                plan[(stock_len, tuple(combo))] += amount
+
+    store, usage = PatternStore.from_plan(demand_lengths, kerf_width, stock_qty, plan)
+    return status, store, usage
+
+
+def _best_fit_insert(counts, residual, piece_order, widths, stock_left, max_cut_types):
+    """
+    按顺序把成品用最佳适应法放入：放进放得下且余量最小的原材料，都放不下时新开一根
+    stock_left 中还有剩余的最长原材料（库存用完时仍开最长的，由 _assign_stock 计入超出库存）。
+    counts/residual 为每根原材料上各规格的数量和剩余容量（NumPy 数组），返回放入后的新数组。
+    """
+    n = len(widths)
+    stock_left = dict(stock_left)
+    max_capacity = max(stock_left)
+    counts = np.vstack([counts, np.zeros((len(piece_order), n), dtype=np.int32)])
+    residual = np.concatenate([residual, np.zeros(len(piece_order), dtype=np.int64)])
+    types = (counts > 0).sum(axis=1)
+    bins = len(counts) - len(piece_order)
+
+    for i in piece_order:
+        width = widths[i]
+        fits = (residual[:bins] >= width) & ((counts[:bins, i] > 0) | (types[:bins] < max_cut_types))
+        if fits.any():
+            candidates = np.flatnonzero(fits)
+            b = candidates[np.argmin(residual[candidates])]
+        else:
+            b = bins
+            bins += 1
+            available = [c for c, qty in stock_left.items() if qty > 0 and c >= width]
+            residual[b] = max(available) if available else max_capacity
+            stock_left[residual[b]] = stock_left[residual[b]] - 1
+        if counts[b, i] == 0:
+            types[b] += 1
+        counts[b, i] += 1
+        residual[b] -= width
+    return counts[:bins], residual[:bins]
+
+
+def _assign_stock(used, stock_capacity):
+    """
+    按占用从大到小，给每根选库存中能装下的最短原材料。
+    库存不够时按能装下的最短规格虚拟分配。返回 (每根的容量, 超出库存的根数)。
+    """
+    remaining_qty = dict(stock_capacity)
+    assigned = np.zeros(len(used), dtype=np.int64)
+    overflow = 0
+    for b in np.argsort(used)[::-1]:
+        fitting = [c for c, qty in remaining_qty.items() if qty > 0 and c >= used[b]]
+        if fitting:
+            assigned[b] = min(fitting)
+            remaining_qty[assigned[b]] -= 1
+        else:
+            assigned[b] = min(c for c in stock_capacity if c >= used[b])
+            overflow += 1
+    return assigned, overflow
+
+
+def _repair_plan(counts, demand_quantities, widths, stock_capacity, max_cut_types):
+    """
+    把上一次的方案（逐根原材料的组合，列已对齐当前需求）修补成恰好满足当前需求：
+    多出的成品从占用最少的原材料上取下，取空的原材料去掉，缺少的成品按长度递减最佳适应放入。
+    """
+    counts = counts.astype(np.int32)
+    excess = counts.sum(axis=0) - demand_quantities
+    order = np.argsort(counts @ widths)
+    for i in np.flatnonzero(excess > 0):
+        for b in order:
+            take = min(int(counts[b, i]), int(excess[i]))
+            counts[b, i] -= take
+            excess[i] -= take
+            if excess[i] == 0:
+                break
+    counts = counts[counts.any(axis=1)]
+    used = counts @ widths
+    capacity, _ = _assign_stock(used, stock_capacity)
+    stock_left = dict(stock_capacity)
+    for c in capacity:
+        stock_left[int(c)] -= 1
+    missing = [i for i in range(len(widths)) for _ in range(int(demand_quantities[i] - counts[:, i].sum()))]
+    counts, _ = _best_fit_insert(counts, capacity - used, sorted(missing, key=lambda i: -widths[i]), widths,
+                                 stock_left, max_cut_types)
+    return counts
+
+
+def solve_heuristic(stock, demands, kerf_width, max_cut_types, time_budget, is_cancelled, max_time_budget=None,
+                    lower_bound=None, initial=None, stop_over_stock=False):
+    """
+    快速启发式，可随时中断。
+
+    先用最佳适应递减（考虑锯缝和调锯次数）得到初始方案，再在 time_budget 秒内反复做拆除-重插：
+    拆掉一两根利用率最低的原材料并从另外几根上随机取下几段，再按长度递减最佳适应放回，
+    不变差就接受。方案按（超出库存的根数，原材料数，余料集中程度）比较，
+    每根原材料都换成库存中能装下的最短规格。结果总是恰好满足需求，不保证最优。
+    库存紧张时到 time_budget 方案可能仍超出库存，此时继续搜索，最多到 max_time_budget 秒。
+    方案达到下界（长度下界，或调用方给出的更紧的 lower_bound）即停止。
+    initial 为上一次的方案（逐根原材料的组合，列按 demands 的顺序，见 SolveSession），给出时先按当前需求修补，
+    代替最佳适应递减作为初始方案。
+    stop_over_stock 为 True 时（热启动用）初始方案超出库存就直接放弃，不再花时间搜索。
+
+    返回 (status, store, usage)，结构与模式模型相同；无法在库存内完成时返回 INFEASIBLE 和 None, None。
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget
+    hard_deadline = start + max(time_budget, max_time_budget or 0)
+    demand_lengths = [d["length"] for d in demands]
+    kerf_width = int(kerf_width)
+    n = len(demand_lengths)
+    stock_qty = {s["length"]: s["quantity"] for s in stock}
+    # 与 generate_patterns 相同：每段占用 长度+锯缝，原材料容量为 长度+锯缝
+    widths = np.array([l + kerf_width for l in demand_lengths], dtype=np.int64)
+    stock_capacity = {stock_len + kerf_width: qty for stock_len, qty in stock_qty.items()}
+    max_capacity = max(stock_capacity)
+    demand_quantities = np.array([d["quantity"] for d in demands], dtype=np.int64)
+    if n == 0 or widths.max() > max_capacity or max_cut_types < 1:
+        return pywraplp.Solver.INFEASIBLE, None, None
+    lower_bound = max(length_lower_bound(stock, demands, kerf_width) or 0, lower_bound or 0)
+    rng = np.random.default_rng(0)
+
+    def evaluate(counts):
+        # 重新分配原材料（尽量用短的），剩余容量随之更新
+        used = counts @ widths
+        capacity, overflow = _assign_stock(used, stock_capacity)
+        # 原材料数相同时，余料越集中越好（更容易在下一轮腾空一根）
+        residual = capacity - used
+        return (overflow, len(counts), -float((residual.astype(np.float64) ** 2).sum())), residual, capacity
+
+    # 初始方案：修补上一次的方案，或最佳适应递减
+    if initial is not None:
+        counts = _repair_plan(initial, demand_quantities, widths, stock_capacity, max_cut_types)
+    else:
+        pieces = [i for i in range(n) for _ in range(demand_quantities[i])]
+        counts, _ = _best_fit_insert(np.zeros((0, n), dtype=np.int32), np.zeros(0, dtype=np.int64),
+                                     sorted(pieces, key=lambda i: -widths[i]), widths, stock_capacity, max_cut_types)
+    current, residual, capacity = evaluate(counts)
+    best = (current, counts)
+    if stop_over_stock and current[0] > 0:
+        return pywraplp.Solver.INFEASIBLE, None, None
+
+    while best[0][:2] > (0, lower_bound) and not is_cancelled():
+        now = time.perf_counter()
+        if now >= hard_deadline or (now >= deadline and best[0][0] == 0):
+            break
+
+        # 拆除：利用率最低的一两根整根拆掉，再从几根随机的原材料上各取下一段腾出空间
+        order = np.argsort(residual * rng.uniform(0.8, 1.2, len(counts)))[::-1]
+        emptied = order[:rng.integers(1, 3)]
+        trial_counts = counts.copy()
+        trial_residual = residual.copy()
+        removed = []
+        for b in emptied:
+            removed.extend(i for i in np.flatnonzero(trial_counts[b]) for _ in range(trial_counts[b, i]))
+        for b in rng.choice(len(counts), size=min(len(counts), int(rng.integers(1, 6))), replace=False):
+            if b in emptied:
+                continue
+            i = rng.choice(np.flatnonzero(trial_counts[b]))
+            trial_counts[b, i] -= 1
+            trial_residual[b] += widths[i]
+            removed.append(i)
+        kept = np.ones(len(counts), dtype=bool)
+        kept[emptied] = False
+        stock_left = dict(stock_capacity)
+        for c in capacity[kept]:
+            stock_left[int(c)] -= 1
+
+        # 重插：按长度递减（带少量扰动）最佳适应放回
+        removed.sort(key=lambda i: -widths[i] * rng.uniform(0.95, 1.05))
+        trial_counts, _ = _best_fit_insert(trial_counts[kept], trial_residual[kept], removed, widths, stock_left,
+                                           max_cut_types)
+        trial, trial_residual, trial_capacity = evaluate(trial_counts)
+        if trial <= current:
+            counts, residual, capacity, current = trial_counts, trial_residual, trial_capacity, trial
+            if current < best[0]:
+                best = (current, counts)
+
+    (overflow, _, _), counts = best
+    if overflow:
+        print(f"快速模式：库存不足，仍差 {overflow} 根原材料")
+        return pywraplp.Solver.INFEASIBLE, None, None
+
+    plan = defaultdict(int)
+    capacity, _ = _assign_stock(counts @ widths, stock_capacity)
+    for row, c in zip(counts, capacity):
+        plan[(int(c) - kerf_width, tuple(int(x) for x in row))] += 1
+
+    store, usage = PatternStore.from_plan(demand_lengths, kerf_width, stock_qty, plan)
+    return pywraplp.Solver.FEASIBLE, store, usage
+
+
+def summarize_plan(store, usage, demand_lengths, detail_mode="bars"):
+    """
+    整理方案报告的数据：只取用到的模式，各项统计由矩阵乘积和归约一次算出，不逐根原材料循环。
+
+    返回 {"summary": 方案汇总表（每个用到的模式一行）, "detail": 详细记录表, "groups": 详细记录的分组数据,
+    "produced": 各规格的切出数量, "bars", "stock_length", "finished_count", "finished_length",
+    "kerf_loss", "max_waste"}，后几项为原材料根数、原材料总长、成品总数、成品总长、锯缝总损耗和最长余料。
+    detail_mode 为 "bars" 时详细记录每根原材料一行；为 "grouped" 时每个用到的模式一行，
+    序号写成区间（如 "1–148"），大小只与模式数有关。逐根的明细可再由 write_detail_csv 按 groups 流式写出。
+    """
+    rows = np.flatnonzero(usage)
+    used = np.asarray(usage[rows], dtype=np.int64)
+    combos = np.asarray(store.combos[rows], dtype=np.int64)
+    stock_lengths = store.row_stock_lengths()[rows]
+    waste = np.asarray(store.waste[rows])
+    kerf = np.asarray(store.kerf[rows])
+    utilization = np.asarray(store.utilization[rows])
+
+    # 方案汇总每个用到的模式一行，详细记录每根原材料一行（按使用次数重复）
+    pieces = [[(l, c) for l, c in zip(demand_lengths, combo) if c > 0] for combo in combos.tolist()]
+    summary = pd.DataFrame({
+        "序号": np.arange(1, len(rows) + 1),
+        "原材料长度(mm)": stock_lengths,
+        "使用次数": used,
+        "总余料(mm)": waste * used,
+        "总锯缝损耗(mm)": kerf * used,
+        "平均利用率(%)": utilization,
+        "切割模式": [" + ".join(f"{l}mm×{c}" for l, c in combo) for combo in pieces]  # 剔除数量为0的成品尺寸
+    })
+    # 同一模式的原材料序号连续：第 i 个模式占 first[i] .. last[i]
+    last = np.cumsum(used)
+    first = last - used + 1
+    groups = pd.DataFrame({
+        "起始序号": first,
+        "根数": used,
+        "原材料长度(mm)": stock_lengths,
+        "成品组合": [" , ".join(f"{l}mm×{c}" for l, c in combo) for combo in pieces],
+        "总消耗(mm)": stock_lengths - waste,
+        "锯缝损耗(mm)": kerf,
+        "余料(mm)": waste,
+        "材料利用率(%)": utilization  # 单根原材料的利用率
+    })
+    if detail_mode == "grouped":
+        detail = groups.drop(columns="起始序号")
+        detail.insert(0, "序号", [f"{a}–{b}" if a != b else str(a) for a, b in zip(first.tolist(), last.tolist())])
+    else:
+        bars = np.repeat(np.arange(len(rows)), used)
+        detail = groups.iloc[bars].drop(columns=["起始序号", "根数"]).reset_index(drop=True)
+        detail.insert(0, "序号", np.arange(1, len(bars) + 1))
+    return {
+        "summary": summary,
+        "detail": detail,
+        "groups": groups,
+        "produced": combos.T @ used,
+        "bars": int(used.sum()),
+        "stock_length": int(stock_lengths @ used),
+        "finished_count": int(combos.sum(axis=1) @ used),
+        "finished_length": int(combos @ np.asarray(demand_lengths, dtype=np.int64) @ used),
+        "kerf_loss": int(kerf @ used),
+        "max_waste": int(waste.max(initial=0))
+    }
+
+
+# 报告的命名样式：微软雅黑不加粗、无边框，偶数行浅灰底色，序号列（第一列）上下左右居中
+REPORT_FONT = Font(name='微软雅黑', bold=False)
+REPORT_FILL = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+REPORT_STYLES = {
+    "报告序号": {"alignment": Alignment(horizontal='center', vertical='center')},
+    "报告序号隔行": {"alignment": Alignment(horizontal='center', vertical='center'), "fill": REPORT_FILL},
+    "报告正文": {},
+    "报告正文隔行": {"fill": REPORT_FILL},
+}
+
+
+def write_report(output_path, sheets):
+    """
+    流式写出 Excel 报告，sheets 为 [(工作表名, DataFrame), ...]，每个表的第一列是序号。
+
+    用 openpyxl 的只写模式逐行写出，样式是工作簿中只定义一次的命名样式（REPORT_STYLES），
+    列宽按 DataFrame 中各列最长的文本计算（空值不计长度，与原来扫描单元格的结果一致），
+    不再写完后回头逐个单元格设置样式、计算列宽。
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    for name, style in REPORT_STYLES.items():
+        workbook.add_named_style(NamedStyle(name=name, font=REPORT_FONT, border=Border(), **style))
+
+    def styled(sheet, value, style):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.style = style
+        return cell
+
+    for sheet_name, df in sheets:
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.sheet_view.showGridLines = False  # 取消网格线
+        columns = [[None if isinstance(v, float) and math.isnan(v) else v for v in df[column].tolist()]
+                   for column in df.columns]
+        for i, (header, values) in enumerate(zip(df.columns, columns), start=1):
+            max_length = max([len(str(header))] + [len(str(v)) for v in values if v is not None])
+            sheet.column_dimensions[get_column_letter(i)].width = (max_length + 2) * 1.5
+
+        sheet.append([styled(sheet, header, "报告序号" if i == 0 else "报告正文")
+                      for i, header in enumerate(df.columns)])
+        for row_index, row in enumerate(zip(*columns), start=2):
+            # 偶数行加浅灰底色
+            suffix = "隔行" if row_index % 2 == 0 else ""
+            sheet.append([styled(sheet, row[0], "报告序号" + suffix)]
+                         + [styled(sheet, value, "报告正文" + suffix) for value in row[1:]])
+    workbook.save(output_path)
+
+
+def iter_detail_rows(groups):
+    """按 summarize_plan 返回的 groups 逐根原材料生成详细记录的行（第一行是表头），不在内存中展开整张表。"""
+    yield ["序号"] + [column for column in groups.columns if column not in ("起始序号", "根数")]
+    for start, count, *values in groups.itertuples(index=False, name=None):
+        for serial in range(start, start + count):
+            yield [serial] + values
+
+
+def write_detail_csv(output_path, groups):
+    """
+    把逐根原材料的详细记录流式写入 CSV（UTF-8 带 BOM，Excel 可直接打开中文），
+    用于详细记录按模式分组（detail_mode="grouped"）时另存完整明细，内存占用与原材料根数无关。
+    """
+    with open(output_path, "w", newline="", encoding="utf-8-sig") as f:
+        csv.writer(f).writerows(iter_detail_rows(groups))
+
+
+def merge_stock_rows(stock):
+    """合并长度相同的行（原材料或成品，数量相加），按每个长度第一次出现的顺序返回新的列表"""
+    merged = {}
+    for s in stock:
+        if s["length"] in merged:
+            merged[s["length"]]["quantity"] += s["quantity"]
+        else:
+            merged[s["length"]] = dict(s)
+    return list(merged.values())
+
+
+def presolve(data, max_cut_types):
+    """
+    求解前化简实例，各求解方式共用，结果与原实例等价：
+
+    - 合并长度相同的原材料行和成品行（数量相加），去掉数量为 0 的行；
+    - 去掉比最长原材料还长、无法切出的成品规格，记入 dropped 并给出提示；
+    - max_counts：每种成品在一个模式中最多切到需求数量为止（多切的模式在精确需求下用不上）；
+    - scale：成品长度和锯缝的最大公约数，枚举模式时全部长度除以它，计数表随之缩小。
+
+    返回 {"kerf_width", "stock", "demands", "dropped", "max_counts", "scale", "notes"}，
+    notes 为给用户看的提示（删除了哪些规格、搜索空间缩小了多少）。
+    """
+    kerf_width = int(data["kerf_width"])
+    stock = [s for s in merge_stock_rows(data["stock"]) if s["quantity"] > 0]
+    raw_demands = data["demands"]
+    merged = merge_stock_rows(raw_demands)
+    notes = []
+
+    if len(merged) < len(raw_demands):
+        notes.append(f"合并重复的成品规格：{len(raw_demands)} 行 → {len(merged)} 种")
+    longest = max((s["length"] for s in stock), default=0)
+    demands, dropped = [], []
+    for d in merged:
+        if d["quantity"] <= 0:
+            continue
+        if d["length"] > longest:
+            dropped.append(d)
+            notes.append(f"成品 {d['length']}mm 比最长的原材料 {longest}mm 还长，无法切出，已忽略")
+        else:
+            demands.append(d)
+
+    demand_lengths = [d["length"] for d in demands]
+    max_counts = [min(d["quantity"], longest // d["length"]) for d in demands]
+    scale = math.gcd(kerf_width, *demand_lengths) if demand_lengths else 1
+    if scale > 1:
+        notes.append(f"成品长度和锯缝的公约数为 {scale}，枚举时按 1/{scale} 缩放")
+
+    if longest > 0 and demand_lengths:
+        before = count_patterns(longest, [d["length"] for d in raw_demands], kerf_width, max_cut_types)
+        after = count_patterns((longest + kerf_width) // scale - kerf_width // scale,
+                               [l // scale for l in demand_lengths], kerf_width // scale, max_cut_types, max_counts)
+        if after < before:
+            notes.append(f"预处理后最长原材料的切割模式数：{before} → {after}")
+
+    for note in notes:
+        print(f"预处理：{note}")
+    return {
+        "kerf_width": kerf_width,
+        "stock": stock,
+        "demands": demands,
+        "dropped": dropped,
+        "max_counts": max_counts,
+        "scale": scale,
+        "notes": notes
+    }
+
+
+class RunControl:
+    """
+    一次计算的控制状态：取消标志、正在运行的求解器（取消时中断）和给用户的提示（notices）。
+    cancel 可以在任意线程中调用。取消时已有可行方案的话由 keep_incumbent 决定是否仍然返回该方案，
+    默认放弃；界面的子进程（_WorkerState）改为询问用户。
+    """
+    def __init__(self, status_signal=None):
+        self.condition = threading.Condition()
+        self.status_update = status_signal
+        self.cancelled = False
+        self.solver = None
+        self.notices = []
+
+    def cancel(self):
+        with self.condition:
+            self.cancelled = True
+            if self.solver is not None:
+                self.solver.InterruptSolve()  # 立即中断正在运行的求解器
+            self.condition.notify_all()
+
+    def is_cancelled(self):
+        with self.condition:
+            return self.cancelled
+
+    def register_solver(self, solver):
+        # 记下正在运行的求解器，取消时中断；已经取消则直接中断
+        with self.condition:
+            self.solver = solver
+            if self.cancelled:
+                solver.InterruptSolve()
+
+    def keep_incumbent(self, bars):
+        """已取消、已有 bars 根原材料的可行方案（没有时为 None）时调用，返回 True 则撤销取消、使用该方案"""
+        return False
+
+
+class SolveSession:
+    """
+    上一次计算留下的状态，订单小改后再次计算时增量求解（传给 solve 的 session，界面的常驻子进程中保留一个）：
+
+    - 方案（逐根原材料的组合）：锯缝、调锯次数和原材料规格不变时，按新的需求修补后作为快速启发式的起点
+      （见 solve_heuristic 的 initial），只改了几个数量时常常直接达到下界，不再求解整数规划；
+    - 枚举的模式（最长原材料的模式矩阵）：最长原材料、锯缝和调锯次数不变时，规格增删或数量上限改变
+      只由 update_patterns 补上或删去受影响的模式；
+    - 模式模型（求解器）：模式和原材料规格都不变、只改数量时，原地修改库存和需求约束的界后直接再次求解。
+
+    只在一个线程中使用，不保存到磁盘。
+    """
+    def __init__(self):
+        self.plan = None  # (键, 需求长度, 逐根组合矩阵)
+        self.patterns = None  # (键, 需求长度, 数量上限, 模式矩阵)
+        self.model = None  # (键, store, solver, variables)
+
+    def previous_bars(self, key, demand_lengths):
+        """上一次方案的逐根组合，列换成 demand_lengths 的顺序（去掉的规格丢弃、新增的为 0）；不可用时返回 None"""
+        if self.plan is None or self.plan[0] != key:
+            return None
+        _, lengths, bars = self.plan
+        column = {length: j for j, length in enumerate(lengths)}
+        counts = np.zeros((len(bars), len(demand_lengths)), dtype=np.int32)
+        for i, length in enumerate(demand_lengths):
+            if length in column:
+                counts[:, i] = bars[:, column[length]]
+        return counts[counts.any(axis=1)]
+
+    def remember_plan(self, key, demand_lengths, store, usage):
+        rows = np.flatnonzero(usage)
+        self.plan = (key, list(demand_lengths), np.repeat(np.asarray(store.combos[rows]), usage[rows], axis=0))
+
+    def lookup_patterns(self, key, stock_length, demand_lengths, kerf_width, max_cut_types, max_counts):
+        """由上一次的模式增量得到当前的模式矩阵（并记下）；键不同时返回 None"""
+        if self.patterns is None or self.patterns[0] != key:
+            return None
+        _, lengths, caps, patterns = self.patterns
+        patterns, new_caps, added = update_patterns(patterns, lengths, caps, stock_length, demand_lengths, kerf_width,
+                                                    max_cut_types, max_counts)
+        print(f"{stock_length}mm: 增量更新模式 {len(self.patterns[3])} → {len(patterns)} 个（新增 {added} 个）")
+        self.patterns = (key, list(demand_lengths), new_caps, patterns)
+        return patterns
+
+    def keep_patterns(self, key, stock_length, demand_lengths, max_counts, patterns):
+        self.patterns = (key, list(demand_lengths), _max_counts(stock_length, demand_lengths, max_counts),
+                         np.asarray(patterns))
+
+    def lookup_model(self, key, stock_qty, demands):
+        """
+        键（模式、原材料顺序和求解器设置）相同时，把上一次模型中库存约束、变量上限和需求约束的界
+        改成当前的数量，返回 (store, (solver, variables))；否则返回 None
+        """
+        if self.model is None or self.model[0] != key:
+            return None
+        _, store, solver, variables = self.model
+        constraints = solver.constraints()
+        for s, (stock_len, qty) in enumerate(stock_qty.items()):
+            constraints[s].SetUb(qty)
+            for variable in variables[store.stock_slice(stock_len)]:
+                variable.SetUb(qty)
+            store.stock_qty[stock_len] = qty
+        for constraint, demand in zip(constraints[len(stock_qty):], demands):
+            constraint.SetBounds(demand["quantity"], demand["quantity"])
+        print(f"复用上一次的模式模型（{len(variables)} 个变量），只更新约束的界")
+        return store, (solver, variables)
+
+    def keep_model(self, key, store, solver, variables):
+        self.model = (key, store, solver, variables)
+
+
+def default_report_path():
+    """界面使用的报告位置：桌面上按当前时间命名的 Excel 文件"""
+    desktop = os.path.join(os.path.expanduser("~"), "Desktop")
+    # 获取当前时间并格式化
+    current_time = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    return os.path.join(desktop, f"优化切割方案_{current_time}.xlsx")
+
+
+def solve(data, solver_time_limit, max_cut_types, progress_callback=None, control=None, output_path=None,
+          engine="enumerate", dominance=False, backend="SCIP", num_workers=1, mip_gap=0.0, pattern_cache=None,
+          pattern_workers=None, memory_budget=PATTERN_MEMORY_BUDGET_MB, time_budget=PATTERN_TIME_BUDGET,
+          auto_fallback=True, detail_mode="bars", detail_csv=False, result_cache=None, session=None):
+    """
+    求解一个实例并整理出方案。
+
+    data 为实例：{"kerf_width": 锯缝, "stock": [{"length", "quantity"}, ...], "demands": [...]}；
+    solver_time_limit 为求解时间限制（毫秒），max_cut_types 为调锯次数。
+    progress_callback 接收 0-100 的总进度（可以为 None），control 为 RunControl（用于取消和收集提示，
+    默认新建一个）。没有可行解或被取消时返回 None，否则返回方案：summarize_plan 的结果再加上
+    "sheets"（报告的各个工作表 [(名称, DataFrame), ...]）、"status"、"notices" 和 "output_path"；
+    给出 output_path 时把报告写入该文件，否则 "output_path" 为 None。
+
+    engine 选择求解方式："enumerate" 完整枚举模式，"column_generation" 列生成模式，
+    "arc_flow" 弧流模型（不生成模式），"heuristic" 快速启发式（1 秒内给出方案，不保证最优）。
+    dominance 为 True 时枚举得到的模式只保留极大模式，求解后再去掉多切的成品。
+    backend 选择整数规划求解器（"SCIP" 或 "CP-SAT"），num_workers 为 CP-SAT 的并行线程数。
+    精确模式先用快速启发式得到初始方案作为热启动，并计算原材料根数的下界；
+    方案与下界的相对间隙不超过 mip_gap 时即停止求解。
+    pattern_cache 为枚举模式使用的 PatternCache，默认使用 PATTERN_CACHE_DIR；传入 False 不使用缓存。
+    pattern_workers 为并行枚举模式的进程数（见 generate_patterns_parallel），默认见 default_pattern_workers。
+    枚举模式预计超出 memory_budget（MB）或 time_budget（秒）时（见 estimate_pattern_model），
+    auto_fallback 为 True 则改用列生成，否则抛出 RuntimeError 说明预计的规模。
+    只是模式矩阵放不下时，模式逐块写入磁盘临时文件（PatternStore.stream_from_longest），计算结束后删除。
+    detail_mode 为 "grouped" 时详细记录表每个切割模式一行（序号为区间），适合原材料根数很多的方案；
+    detail_csv 为 True 时另在报告旁边流式写出逐根原材料的详细记录 CSV（见 write_detail_csv）。
+    result_cache 为整个方案的 ResultCache（True 表示使用 RESULT_CACHE_DIR），默认不使用。相同的订单和求解参数
+    命中缓存时直接用缓存的方案生成报告，统计信息表中注明“方案来源”；只缓存证明最优的方案，
+    超时、被取消或中断得到的方案不写入缓存。
+    session 为 SolveSession 时在上一次计算的基础上增量求解（上一次的方案作为热启动的起点，
+    枚举的模式只更新受影响的部分，只改数量时复用模型），并记下本次的结果。
+    """
+    if control is None:
+        control = RunControl()
+    is_cancelled = control.is_cancelled
+
+    # 各阶段在进度条中的权重
+    if engine == "heuristic":
+        phases = {"solve": 95, "report": 5}
+    elif engine == "arc_flow":
+        phases = {"build": 10, "solve": 85, "report": 5}
+    else:
+        phases = {"patterns": 30, "build": 10, "solve": 55, "report": 5}
+    progress = ProgressReporter(progress_callback, phases, control.status_update)
+
+    def register_solver(solver):
+        # 模型已建好：进入求解阶段（求解器不汇报进度，按时间限制推进）
+        progress.start_phase("solve", solve_detail, solver_time_limit / 1000)
+        control.register_solver(solver)
+
+    spill_dir = None  # 模式写入磁盘时的临时目录
+    cached_at = None  # 命中结果缓存时方案的计算时间
+    try:
+        total_stock_count = len(data["stock"])
+        # 预处理：合并重复规格（否则按长度区分的模式和库存约束会互相覆盖），去掉切不出的成品，
+        # 按需求数量限制每个模式中的段数，按公约数缩放枚举
+        reduced = presolve(data, max_cut_types)
+        control.notices.extend(reduced["notes"])
+        kerf_width = reduced["kerf_width"]
+        stock = reduced["stock"]
+        demands = reduced["demands"]
+        if not demands:
+            # 没有能切的成品（全都比原材料长，或数量都是 0），不建模
+            control.notices.append("所有成品规格都比最长的原材料长，无法切割" if reduced["dropped"]
+                                   else "没有需要切割的成品")
+            return None
+        demand_lengths = [d["length"] for d in demands]
+        max_counts = reduced["max_counts"]
+        scale = reduced["scale"]
+        stock_qty = {s["length"]: s["quantity"] for s in stock}
+        # 上一次的方案在锯缝、调锯次数和原材料规格不变时可以修补后作为热启动
+        plan_key = (kerf_width, max_cut_types, tuple(sorted(stock_qty)))
+        previous = session.previous_bars(plan_key, demand_lengths) if session else None
+        model = None  # 复用的模型 (solver, variables)
+
+        # 同一订单和求解参数算过的方案直接读取（键与预处理前的行顺序、重复行无关）
+        if result_cache is True:
+            result_cache = ResultCache()
+        cache_key = ResultCache.canonical_key(data, solver_time_limit, max_cut_types, engine=engine,
+                                              dominance=dominance, backend=backend, mip_gap=mip_gap,
+                                              memory_budget=memory_budget, time_budget=time_budget,
+                                              auto_fallback=auto_fallback) if result_cache else None
+        cached = result_cache.lookup(cache_key, demand_lengths, kerf_width, stock_qty) if result_cache else None
+        if cached is not None and cached[0] == pywraplp.Solver.OPTIMAL:
+            status, pattern_store, usage, cached_at = cached
+            print(f"从结果缓存读取方案（{cached_at} 计算）")
+            control.notices.append(f"该订单已于 {cached_at} 计算过，直接使用缓存的方案")
+            engine = "cached"
+
+        spill = False
+        if engine == "enumerate":
+            # 枚举前估算规模。模式矩阵放不下时流式写入磁盘，内存中只保留一块；求解器模型必须在内存里，
+            # 只保留极大模式时模型大小要过滤后才知道（见下面）。仍超出内存或时间预算时改用列生成，
+            # 不允许改用时拒绝计算并给出估计
+            estimate = estimate_pattern_model([s["length"] for s in stock], demand_lengths, kerf_width, max_cut_types,
+                                              max_counts, scale, backend)
+            for stock_len, count in estimate["counts"].items():
+                print(f"{stock_len}mm: 预计 {count} 个模式")
+            budget_bytes = memory_budget * 1024 * 1024
+            model_bytes = 0 if dominance else estimate["model_bytes"]
+            spill = model_bytes + estimate["pattern_bytes"] > budget_bytes
+            resident = model_bytes + (min(PATTERN_CHUNK_BYTES, estimate["pattern_bytes"]) if spill
+                                      else estimate["pattern_bytes"])
+            summary = (f"预计 {estimate['patterns']} 个切割模式（模型 {estimate['variables']} 个变量），"
+                       f"约需 {estimate['bytes'] / 1024 / 1024:.0f} MB 内存、枚举 {estimate['seconds']:.1f} 秒")
+            print(summary)
+            if resident > budget_bytes or estimate["seconds"] > time_budget:
+                summary += f"，超出预算（{memory_budget} MB、{time_budget} 秒）"
+                if not auto_fallback:
+                    raise RuntimeError(f"{summary}，请改用列生成模式或提高预算")
+                print(f"{summary}，改用列生成")
+                control.notices.append(f"{summary}，已改用列生成")
+                engine = "column_generation"
+            elif spill:
+                print(f"模式矩阵约 {estimate['pattern_bytes'] / 1024 / 1024:.1f} MB，超出内存预算，写入磁盘临时文件")
+                spill_dir = tempfile.TemporaryDirectory(prefix="linercut_", ignore_cleanup_errors=True)
+
+        if engine == "heuristic":
+            heuristic_budget = min(solver_time_limit / 1000, HEURISTIC_TIME_BUDGET)
+            progress.start_phase("solve", duration=heuristic_budget)
+            status, pattern_store, usage = solve_heuristic(stock, demands, kerf_width, max_cut_types, heuristic_budget,
+                                                           is_cancelled, heuristic_budget + HEURISTIC_STOCK_EXTENSION,
+                                                           initial=previous)
+            if usage is None and not is_cancelled():
+                control.notices.append(f"快速模式在 {heuristic_budget + HEURISTIC_STOCK_EXTENSION:.1f} 秒内没有找到"
+                                       "库存以内的方案，请改用精确模式")
+        elif engine == "column_generation":
+            # 列生成只产生对线性松弛有改进的模式，规格多时也能在可控时间内完成
+            progress.start_phase("patterns")
+            pattern_store = generate_patterns_column_generation(stock, demands, kerf_width, max_cut_types,
+                                                                progress, is_cancelled)
+            if is_cancelled():
+                return None
+        elif engine == "enumerate":
+            # 只按最长的原材料枚举一次，较短原材料的模式是其中消耗不超过自身长度的那些
+            longest = max((s["length"] for s in stock), default=0)
+            # 按公约数缩放后枚举，得到的模式（各规格的段数）与原单位下完全相同
+            scaled_longest = (longest + kerf_width) // scale - kerf_width // scale
+            scaled_lengths = [l // scale for l in demand_lengths]
+            scaled_kerf = kerf_width // scale
+            total_patterns = count_patterns(scaled_longest, scaled_lengths, scaled_kerf, max_cut_types, max_counts)
+            progress.start_phase("patterns")
+
+            # 上一次计算的模式增量更新；相同或更大的规格组合算过的直接从缓存读取（缓存按原单位记录）；
+            # 写入磁盘的模式太大，不放进会话和缓存
+            patterns_key = (longest, kerf_width, max_cut_types)
+            patterns = session.lookup_patterns(patterns_key, longest, demand_lengths, kerf_width, max_cut_types,
+                                               max_counts) if session and not spill else None
+            if pattern_cache is None:
+                pattern_cache = PatternCache()
+            if patterns is None and pattern_cache and not spill:
+                patterns = pattern_cache.lookup(longest, demand_lengths, kerf_width, max_cut_types, max_counts)
+            if spill:
+                # 逐块枚举、逐块筛选写入内存映射文件
+                chunks = generate_pattern_chunks(scaled_longest, scaled_lengths, scaled_kerf, max_cut_types, progress,
+                                                 max(total_patterns, 1), is_cancelled, max_counts)
+                pattern_store = PatternStore.stream_from_longest(demand_lengths, kerf_width,
+                                                                 {s["length"]: s["quantity"] for s in stock}, chunks,
+                                                                 estimate["counts"], spill_dir.name)
+                if is_cancelled():
+                    return None
+            elif patterns is not None:
+                print(f"{longest}mm: 从缓存读取 {len(patterns)} 个模式")
+            else:
+                # 模式多时分给多个进程枚举，否则在本线程枚举
+                pattern_workers = pattern_workers or default_pattern_workers(total_patterns)
+                if pattern_workers > 1 and demand_lengths and total_patterns >= PARALLEL_PATTERN_THRESHOLD:
+                    print(f"用 {pattern_workers} 个进程枚举 {total_patterns} 个模式")
+                    generated = generate_patterns_parallel([scaled_longest], scaled_lengths, scaled_kerf,
+                                                           max_cut_types, progress, is_cancelled, pattern_workers,
+                                                           total_patterns, max_counts=max_counts)
+                    patterns = generated[scaled_longest] if generated is not None else None
+                else:
+                    # 将进度汇总器传递给 generate_patterns
+                    patterns = generate_patterns(scaled_longest, scaled_lengths, scaled_kerf, max_cut_types,
+                                                 progress, max(total_patterns, 1), is_cancelled,
+                                                 max_counts=max_counts)
+                # 被取消时只得到部分模式，不能写入缓存
+                if is_cancelled():
+                    return None
+                if pattern_cache:
+                    pattern_cache.store(longest, demand_lengths, kerf_width, max_cut_types, patterns, max_counts)
+            if session and not spill:
+                session.keep_patterns(patterns_key, longest, demand_lengths, max_counts, patterns)
+            # 模式和原材料规格都没变时复用上一次的模型，只改约束的界
+            model_key = (patterns_key, tuple(demand_lengths), tuple(_max_counts(longest, demand_lengths, max_counts)),
+                         tuple(stock_qty), backend, num_workers)
+            reused = session.lookup_model(model_key, stock_qty, demands) if session and not (spill or dominance) \
+                else None
+            if reused is not None:
+                pattern_store, model = reused
+            elif not spill:
+                pattern_store = PatternStore.from_longest(demand_lengths, kerf_width, stock_qty, patterns)
+            print(f"切割模式：{len(pattern_store)} 个，{'写入磁盘' if spill else '占用内存'} "
+                  f"{pattern_store.nbytes / 1024 / 1024:.1f} MB")
+
+            if dominance:
+                demand_quantities = [d["quantity"] for d in demands]
+                maximal = filter_maximal_patterns(pattern_store, demand_quantities, max_cut_types)
+                for stock_len in pattern_store.stock_qty:
+                    print(f"{stock_len}mm: 极大模式 {maximal.counts[stock_len]} / {pattern_store.counts[stock_len]}")
+                pattern_store = maximal
+                # 极大模式的模型也要放进内存预算
+                model_bytes = len(pattern_store) * MODEL_BYTES_PER_VARIABLE.get(backend, 4096)
+                if model_bytes + pattern_store.nbytes > memory_budget * 1024 * 1024:
+                    summary = (f"极大模式 {len(pattern_store)} 个，模型约需 {model_bytes / 1024 / 1024:.0f} MB 内存，"
+                               f"超出预算（{memory_budget} MB）")
+                    if not auto_fallback:
+                        raise RuntimeError(f"{summary}，请改用列生成模式或提高预算")
+                    print(f"{summary}，改用列生成")
+                    control.notices.append(f"{summary}，已改用列生成")
+                    engine = "column_generation"
+                    pattern_store = generate_patterns_column_generation(stock, demands, kerf_width, max_cut_types,
+                                                                        progress, is_cancelled)
+                    if is_cancelled():
+                        return None
+
+        if engine not in ("heuristic", "cached"):
+            progress.start_phase("build")
+            exact_demand = not (dominance and engine == "enumerate")
+            # 热启动：快速启发式，时间按模型大小给（见 warm_start_budget），达到下界即停、初始方案超出库存即放弃；
+            # 模型很小时不做。有上一次的方案可修补时总做
+            warm_budget = warm_start_budget(solver_time_limit, len(pattern_store) if engine == "enumerate" else None)
+            if previous is not None and not warm_budget:
+                warm_budget = warm_start_budget(solver_time_limit)
+            lower_bound = length_lower_bound(stock, demands, kerf_width)
+            warm_status, warm_store, warm_usage = solve_heuristic(
+                stock, demands, kerf_width, max_cut_types, warm_budget, is_cancelled, lower_bound=lower_bound,
+                initial=previous, stop_over_stock=True) if warm_budget else (pywraplp.Solver.NOT_SOLVED, None, None)
+            warm_bars = int(warm_usage.sum()) if warm_usage is not None else None
+            # 初始方案没有达到长度下界时，完整枚举再取线性松弛下界判断能否跳过整数规划
+            # （列生成可能提前结束，其受限主问题的松弛值不一定是下界）
+            if warm_bars is not None and warm_bars != lower_bound and engine == "enumerate":
+                lp_bound = pattern_lp_bound(pattern_store, demands, exact_demand)
+                if lp_bound is not None:
+                    lower_bound = max(lower_bound or 0, math.ceil(lp_bound - 1e-6))
+            if warm_budget:
+                print(f"下界 {lower_bound} 根，初始方案 {warm_bars} 根")
+            solve_detail = f"初始方案 {warm_bars} 根，下界 {lower_bound} 根" if warm_bars is not None else ""
+            if warm_bars is not None and warm_bars == lower_bound:
+                warm_status = pywraplp.Solver.OPTIMAL
+            elif warm_bars is not None:
+                warm_status = pywraplp.Solver.FEASIBLE
+            else:
+                warm_status = pywraplp.Solver.NOT_SOLVED
+
+            if warm_bars is not None and within_gap(warm_bars, lower_bound, mip_gap):
+                print("初始方案已在下界的允许间隙内，跳过整数规划")
+                status, pattern_store, usage = warm_status, warm_store, warm_usage
+            elif is_cancelled():
+                status, pattern_store, usage = warm_status, warm_store, warm_usage
+            elif engine == "arc_flow":
+                status, pattern_store, usage = solve_arc_flow(stock, demands, kerf_width, max_cut_types,
+                                                              solver_time_limit, backend, num_workers, mip_gap,
+                                                              register_solver)
+            else:
+                # SCIP 自己很快就能找到同样好的解，提示反而拖慢求解，只给 CP-SAT
+                hint = None
+                # 写入磁盘的模式不做合并（要把全部模式读进内存建索引）
+                if warm_bars is not None and backend == "CP-SAT" and not pattern_store.spilled:
+                    merged, hint = merge_warm_start(pattern_store, warm_store, warm_usage)
+                    if len(merged) != len(pattern_store):
+                        model = None  # 初始方案带来了新的模式，复用的模型里没有，重新建模
+                    pattern_store = merged
+                solver, status, variables = solve_pattern_model(pattern_store, demands, solver_time_limit,
+                                                                exact_demand, backend, num_workers, hint, mip_gap,
+                                                                register_solver, model)
+                if session and engine == "enumerate" and exact_demand and not pattern_store.spilled:
+                    if is_cancelled():
+                        session.model = None  # 被中断过的求解器（SCIP）改界后再求解会出错，不再复用
+                    else:
+                        session.keep_model(model_key, pattern_store, solver, variables)
+                usage = solution_values(solver) if status in (solver.OPTIMAL, solver.FEASIBLE) else None
+                if usage is not None and not exact_demand:
+                    pattern_store, usage = trim_overproduction(pattern_store, usage, demands)
+
+            # 求解被取消中断或到时间限制时，如果没有解或初始方案更好就退回到初始方案
+            if warm_bars is not None and (usage is None or usage.sum() > warm_bars):
+                status, pattern_store, usage = warm_status, warm_store, warm_usage
+
+        interrupted = is_cancelled()
+        if interrupted:
+            # 已取消：有可行方案时由用户决定是否仍然生成报告
+            has_plan = status in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE) and usage is not None
+            if not control.keep_incumbent(int(usage.sum()) if has_plan else None):
+                return None
+
+        if (status == pywraplp.Solver.OPTIMAL) or (status == pywraplp.Solver.FEASIBLE):
+            print("优化成功，正在生成报告...")
+            # 只缓存最优方案：受时间限制的可行方案下次给更多时间可能更好，不能当作最终结果
+            if result_cache and cached_at is None and not interrupted and status == pywraplp.Solver.OPTIMAL:
+                result_cache.store(cache_key, status, pattern_store, usage)
+            if session:
+                session.remember_plan(plan_key, demand_lengths, pattern_store, usage)
+            progress.start_phase("report")
+            # 解析结果：汇总表、详细记录和各项统计一次算出
+            plan = summarize_plan(pattern_store, usage, demand_lengths, detail_mode)
+            df_summary, df_detail, produced = plan["summary"], plan["detail"], plan["produced"]
+            total_stock_count += plan["bars"]
+            total_stock_length_used = plan["stock_length"]
+            total_finished_count = plan["finished_count"]
+            total_finished_length = plan["finished_length"]
+            total_kerf_loss = plan["kerf_loss"]
+            max_waste = plan["max_waste"]
+
+            progress.update(0.5)
+
+            # 计算总材料利用率
+            total_utilization = round((total_finished_length / total_stock_length_used) * 100, 2) if total_stock_length_used else 0
+
+            # 计算总材料利用率（含锯缝）
+            total_material_used_with_kerf = total_finished_length + total_kerf_loss
+            total_utilization_with_kerf = round((total_finished_length / total_material_used_with_kerf) * 100, 2) if total_material_used_with_kerf else 0
+
+            # 方案汇总表
+            # 计算整体利用率
+            total_consumption = df_summary["原材料长度(mm)"] * df_summary["使用次数"] - df_summary["总余料(mm)"]
+            total_stock = df_summary["原材料长度(mm)"] * df_summary["使用次数"]
+            df_summary["整体利用率(%)"] = round((total_consumption / total_stock) * 100, 2)
+
+            # 确保 "序号" 列在最前面
+            df_summary = df_summary[[
+                "序号", "原材料长度(mm)", "使用次数", "切割模式",
+                "总锯缝损耗(mm)", "总余料(mm)", "平均利用率(%)", "整体利用率(%)"
+            ]]
+
+            # 需求完成情况；预处理时去掉的规格（比所有原材料都长）无法完成，完成数量为 0
+            all_demands = demands + reduced["dropped"]
+            quantities = np.array([d["quantity"] for d in all_demands], dtype=np.int64)
+            # 完成数量不超过需求数量
+            completed = np.minimum(np.concatenate([produced, np.zeros(len(reduced["dropped"]), dtype=np.int64)]),
+                                   quantities)
+            df_completed = pd.DataFrame({
+                "序号": np.arange(1, len(all_demands) + 1),
+                "成品规格(mm)": [d["length"] for d in all_demands],
+                "需求数量": quantities,
+                "完成数量": completed,
+                "完成率(%)": np.round(np.minimum(100, 100 * completed / quantities), 2)
+            })
+
+            # 新增统计信息表
+            summary_data = {
+                "项目": [
+                    "原材料总数",
+                    "原材料总使用长度(m)",
+                    "切割出来的成品总数量",
+                    "切割出来的成品总长度(m)",
+                    "总材料利用率(%)",
+                    "总材料利用率（含锯缝）(%)",
+                    "最长余料长度(mm)"
+                ],
+                "数值": [
+                    total_stock_count,
+                    round(total_stock_length_used / 1000, 2),
+                    total_finished_count,
+                    round(total_finished_length / 1000, 2),
+                    total_utilization,
+                    total_utilization_with_kerf,
+                    max_waste
+                ]
+            }
+            if cached_at is not None:
+                summary_data["项目"].append("方案来源")
+                summary_data["数值"].append(f"缓存（{cached_at} 计算）")
+            df_summary_info = pd.DataFrame({"序号": range(1, len(summary_data["项目"]) + 1), **summary_data})
+
+            plan["sheets"] = [
+                ("详细记录", df_detail),
+                ("方案汇总", df_summary),
+                ("需求完成", df_completed),
+                ("统计信息", df_summary_info)
+            ]
+            plan["status"] = status
+            plan["notices"] = control.notices
+            plan["output_path"] = output_path
+
+            # 生成Excel报告
+            if output_path is not None:
+                write_report(output_path, plan["sheets"])
+                if detail_csv:
+                    write_detail_csv(os.path.splitext(output_path)[0] + "_详细记录.csv", plan["groups"])
+                print(f"报告已生成至：{output_path}")
+            progress.finish() # Indicate completion of Excel writing
+
+            return plan
+        else:
+            print("未找到可行解")
+            return None
+    except Exception as e:
+        print(f"Error in solve: {e}")  # 打印错误信息
+        raise e
+    finally:
+        progress.close()
+        if spill_dir is not None:
+            # 先释放内存映射再删除临时文件
+            pattern_store = None
+            spill_dir.cleanup()
+
+
+class _PipeSignal:
+    """子进程中代替 pyqtSignal：emit 的值经管道发给界面进程中的 OptimizationThread"""
+    def __init__(self, connection, kind, lock):
+        self.connection = connection
+        self.kind = kind
+        self.lock = lock
+
+    def emit(self, value):
+        with self.lock:
+            try:
+                self.connection.send((self.kind, value))
+            except OSError:
+                pass  # 界面进程已经退出
+
+
+class _WorkerState(RunControl):
+    """
+    界面子进程中的 RunControl：取消和用户对已有方案的选择由 listen 线程从管道收到后写入，
+    取消时已有可行方案则经管道询问用户并等待回答。界面进程退出（管道关闭）时视为取消，并且不再等待回答。
+    常驻子进程（session_worker）中收到的计算任务放进 jobs，界面进程退出时放入 None。
+    """
+    def __init__(self, connection, jobs=None):
+        self.connection = connection
+        self.send_lock = threading.Lock()
+        super().__init__(_PipeSignal(connection, "status", self.send_lock))
+        self.progress_update = _PipeSignal(connection, "progress", self.send_lock)
+        self.incumbent_ready = _PipeSignal(connection, "incumbent", self.send_lock)
+        self.incumbent_answered = False
+        self.keep = False
+        self.detached = False
+        self.jobs = jobs
+
+    def reset(self):
+        """
+        常驻子进程收到下一个任务时清除上一个任务的取消状态、求解器和提示。在 listen 中按消息顺序调用，
+        任务之前到达的过期取消被清除，之后到达的取消保留
+        """
+        with self.condition:
+            self.cancelled = False
+            self.solver = None
+            self.notices = []
+            self.incumbent_answered = False
+            self.keep = False
+
+    def keep_incumbent(self, bars):
+        # 把已有方案交给用户选择，阻塞到用户回答；没有可行方案时直接放弃
+        if bars is None:
+            return False
+        with self.condition:
+            self.incumbent_answered = False
+            self.incumbent_ready.emit(bars)
+            while not (self.incumbent_answered or self.detached):
+                self.condition.wait()
+            return self.keep and not self.detached
+
+    def listen(self):
+        while True:
+            try:
+                kind, value = self.connection.recv()
+            except (EOFError, OSError):
+                kind, value = "detach", None
+            if kind == "solve":
+                self.reset()
+                self.jobs.put(value)
+            elif kind == "incumbent":
+                with self.condition:
+                    self.keep = value
+                    if value:
+                        self.cancelled = False
+                    self.incumbent_answered = True
+                    self.condition.notify_all()
+            else:
+                with self.condition:
+                    self.detached = kind == "detach"
+                self.cancel()
+            if kind == "detach":
+                if self.jobs is not None:
+                    self.jobs.put(None)
+                return
+
+
+def _run_worker_job(connection, state, data, args, options, session=None):
+    """在子进程中运行一个任务，把提示和结果（报告路径，没有方案时为 None）或错误信息经 connection 发回"""
+    try:
+        plan = solve(data, *args, state.progress_update, state, default_report_path(), session=session, **options)
+        message = ("result", plan["output_path"] if plan is not None else None)
+    except Exception as e:
+        message = ("error", str(e))
+    with state.send_lock:
+        try:
+            connection.send(("notices", state.notices))
+            connection.send(message)
+        except OSError:
+            pass
+
+
+def optimization_worker(connection, data, args, options):
+    """
+    界面子进程的入口：对界面传来的实例运行 solve 并把报告写到桌面（default_report_path），
+    进度、提示和报告路径（没有方案时为 None，出错时为错误信息）经 connection 发回。
+    """
+    state = _WorkerState(connection)
+    threading.Thread(target=state.listen, daemon=True).start()
+    try:
+        _run_worker_job(connection, state, data, args, options)
+    finally:
+        shutdown_pattern_pool()
+
+
+def session_worker(connection):
+    """
+    界面常驻子进程的入口：依次处理经 connection 发来的 ("solve", (data, args, options)) 任务，
+    消息格式与 optimization_worker 相同。各任务共用一个 SolveSession，订单小改后再计算时增量求解。
+    界面进程退出（管道关闭）后结束，结束前关闭枚举模式的进程池。
+    """
+    jobs = queue.Queue()
+    state = _WorkerState(connection, jobs)
+    threading.Thread(target=state.listen, daemon=True).start()
+    session = SolveSession()
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            data, args, options = job
+            _run_worker_job(connection, state, data, args, options, session)
+    finally:
+        shutdown_pattern_pool()
+
+
+def read_order(path):
+    """
+    读取一个订单文件：Excel 文件中名为 "Stock" 和 "Demands" 的两个工作表（与界面的模板相同），
+    或者一对 CSV 文件 <订单>_Stock.csv、<订单>_Demands.csv（path 为其中任意一个）。
+    每个表的前两列依次为长度和数量，空行跳过。返回 {"stock": [...], "demands": [...]}。
+    """
+    if path.lower().endswith(".csv"):
+        prefix = path[:-len(".csv")].rsplit("_", 1)[0]
+        tables = {name: pd.read_csv(f"{prefix}_{name}.csv") for name in ("Stock", "Demands")}
+    else:
+        tables = pd.read_excel(path, sheet_name=None)
+        if "Stock" not in tables or "Demands" not in tables:
+            raise ValueError(f"{path} 中缺少名为 'Stock' 或 'Demands' 的sheet")
+    order = {}
+    for name, key in (("Stock", "stock"), ("Demands", "demands")):
+        rows = tables[name].iloc[:, :2].dropna()
+        order[key] = [{"length": int(length), "quantity": int(quantity)} for length, quantity in rows.values.tolist()]
+    return order
+
+
+def find_orders(directory):
+    """
+    列出目录中的订单：[(订单名, 文件路径), ...]，按订单名排序。CSV 订单以 <订单>_Stock.csv 为准；
+    批量模式写出的报告（<订单名>_优化切割方案.xlsx，报告默认写在订单目录）不算订单。
+    """
+    orders = []
+    for file_name in os.listdir(directory):
+        stem, ext = os.path.splitext(file_name)
+        if file_name.startswith("~$"):
+            continue  # Excel 打开文件时留下的临时文件
+        if ext.lower() in (".xlsx", ".xls") and not stem.endswith(BATCH_REPORT_SUFFIX):
+            orders.append((stem, os.path.join(directory, file_name)))
+        elif ext.lower() == ".csv" and stem.endswith("_Stock"):
+            orders.append((stem[:-len("_Stock")], os.path.join(directory, file_name)))
+    return sorted(orders)
+
+
+def solve_order(name, path, output_dir, kerf_width, solver_time_limit, max_cut_types, options):
+    """
+    批量处理中的一个任务（在进程池中运行）：读取订单、求解并把报告写入 output_dir/<订单名>_优化切割方案.xlsx。
+    返回 {"order", "bars", "utilization", "seconds", "output_path", "error"}，出错时 error 为错误信息。
+    """
+    start = time.perf_counter()
+    result = {"order": name, "bars": None, "utilization": None, "output_path": None, "error": None}
+    try:
+        data = {"kerf_width": kerf_width, **read_order(path)}
+        output_path = os.path.join(output_dir, f"{name}{BATCH_REPORT_SUFFIX}.xlsx")
+        plan = solve(data, solver_time_limit, max_cut_types, output_path=output_path, **options)
+        if plan is None:
+            result["error"] = "未找到可行解"
+        else:
+            result["bars"] = plan["bars"]
+            if plan["stock_length"]:
+                result["utilization"] = round(plan["finished_length"] / plan["stock_length"] * 100, 2)
+            result["output_path"] = output_path
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(directory, output_dir, kerf_width, solver_time_limit, max_cut_types, workers=None, **options):
+    """
+    用进程池批量处理 directory 中的全部订单（见 find_orders），报告写入 output_dir。
+    workers 默认等于 CPU 核数；多个订单并行时每个订单的模式枚举只用一个进程（除非 options 指定 pattern_workers）。
+    options 为 solve 的其他参数。按完成顺序打印每个订单的结果，返回按订单名排序的结果列表（见 solve_order）。
+    """
+    orders = find_orders(directory)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(orders) or 1))
+    if workers > 1:
+        options.setdefault("pattern_workers", 1)
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(solve_order, name, path, output_dir, kerf_width, solver_time_limit, max_cut_types,
+                               options) for name, path in orders]
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                if result["error"] is None:
+                    print(f"[{len(results)}/{len(orders)}] {result['order']}: {result['bars']} 根原材料，"
+                          f"利用率 {result['utilization']}%，{result['seconds']:.1f} 秒")
+                else:
+                    print(f"[{len(results)}/{len(orders)}] {result['order']}: 失败（{result['error']}）")
+    return sorted(results, key=lambda result: result["order"])
+
+
+def cli(argv=None):
+    """命令行批量模式，返回进程退出码（有订单失败时为 1）"""
+    parser = argparse.ArgumentParser(description="LinerCut 批量优化：处理目录中的全部订单文件")
+    parser.add_argument("directory",
+                        help="订单目录（Excel 文件含 Stock、Demands 两个sheet，或 <订单>_Stock.csv 与 <订单>_Demands.csv）")
+    parser.add_argument("--output", help="报告目录，默认为订单目录")
+    parser.add_argument("--workers", type=int, help="同时处理的订单数，默认等于 CPU 核数")
+    parser.add_argument("--kerf", type=int, default=5, help="锯缝 (mm)")
+    parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    parser.add_argument("--time-limit", type=float, default=60, help="每个订单的求解时间限制（秒）")
+    parser.add_argument("--engine", default="enumerate",
+                        choices=["enumerate", "column_generation", "arc_flow", "heuristic"], help="求解模式")
+    parser.add_argument("--backend", default="SCIP", choices=["SCIP", "CP-SAT"], help="整数规划求解器")
+    parser.add_argument("--mip-gap", type=float, default=0.0, help="允许的相对间隙")
+    parser.add_argument("--dominance", action="store_true", help="只保留极大模式")
+    parser.add_argument("--detail", default="bars", choices=["bars", "grouped"], help="详细记录逐根一行或按模式合并")
+    parser.add_argument("--detail-csv", action="store_true", help="另存逐根原材料的详细记录 CSV")
+    parser.add_argument("--reuse", action="store_true", help="使用结果缓存：算过的订单直接用上次的最优方案")
+    args = parser.parse_args(argv)
+    options = {"result_cache": True} if args.reuse else {}
+    results = run_batch(args.directory, args.output or args.directory, args.kerf, int(args.time_limit * 1000),
+                        args.max_cut_types, args.workers, engine=args.engine, backend=args.backend,
+                        mip_gap=args.mip_gap, dominance=args.dominance, detail_mode=args.detail,
+                        detail_csv=args.detail_csv, **options)
+    failed = [result["order"] for result in results if result["error"] is not None]
+    print(f"完成 {len(results) - len(failed)} / {len(results)} 个订单" + (f"，失败：{', '.join(failed)}" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # 打包成 exe 后进程池的子进程也从这里启动，需要先交给 multiprocessing 处理
+    multiprocessing.freeze_support()
+    sys.exit(cli())
@@ -0,0 +1,451 @@
+"""
+LinerCut 的本机 HTTP/JSON 优化服务：一台性能好的机器运行服务，各工位的界面把订单发给它计算。
+
+    python LinerCutService.py --port 8765 --workers 4 --queue 8
+
+接口（请求和响应都是 JSON，报告除外）：
+    POST   /jobs              提交任务：{"kerf_width", "stock", "demands", "max_cut_types", "solver_time_limit"（毫秒）,
+                              以及可选的 "engine"、"backend"、"num_workers"、"dominance"、"mip_gap"、"memory_budget"、
+                              "time_budget"、"auto_fallback"、"detail_mode"、"reuse_result"}，
+                              返回 202 和 {"id", "status"}；格式或参数取值不对时返回 400；
+                              排队已满时返回 503 并在 Retry-After 中给出建议的等待秒数
+    GET    /jobs/<id>         任务状态：queued / running / done / failed / cancelled，以及进度、排队位置、结果或错误
+    GET    /jobs/<id>/report  下载完成任务的 Excel 报告
+    DELETE /jobs/<id>         取消任务（运行中的任务中断求解，不生成报告）
+    GET    /health            工作进程数、运行和排队中的任务数
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from LinerCutEngine import RunControl, solve
+
+# 每个任务的求解时间上限（毫秒），客户端请求的 solver_time_limit 超过时按此计
+SERVICE_MAX_TIME_LIMIT = 10 * 60 * 1000
+# 求解时间限制之外再给枚举、建模和写报告留的时间（秒），超过后停止计算、用已有的最好方案
+SERVICE_JOB_MARGIN = 120
+# 保留的已结束任务数，更早的任务连同报告一起删除
+SERVICE_MAX_FINISHED_JOBS = 200
+# 客户端可以指定的 solve 参数，及可以取的值（mip_gap 和正整数参数另外检查）。
+# 报告只下载 Excel，detail_csv 不接受；num_workers 不超过服务器的 CPU 核数
+SERVICE_JOB_OPTIONS = ("engine", "backend", "num_workers", "dominance", "mip_gap", "memory_budget", "time_budget",
+                       "auto_fallback", "detail_mode")
+SERVICE_OPTION_CHOICES = {
+    "engine": ("enumerate", "column_generation", "arc_flow", "heuristic"),
+    "backend": ("SCIP", "CP-SAT"),
+    "dominance": (True, False),
+    "auto_fallback": (True, False),
+    "detail_mode": ("bars", "grouped"),
+}
+SERVICE_POSITIVE_INT_OPTIONS = ("num_workers", "memory_budget", "time_budget")
+
+
+class ServiceBusy(RuntimeError):
+    """服务排队已满（HTTP 503），retry_after 为建议的等待秒数"""
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_job(payload, max_time_limit=SERVICE_MAX_TIME_LIMIT):
+    """
+    检查并整理客户端提交的任务，返回 (实例, solver_time_limit, max_cut_types, solve 的其他参数)。
+    格式不对时抛出 ValueError。
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("任务必须是 JSON 对象")
+    data = {"kerf_width": int(payload.get("kerf_width", 5))}
+    if data["kerf_width"] < 0:
+        raise ValueError("锯缝不能为负数")
+    for key in ("stock", "demands"):
+        rows = payload.get(key)
+        if not isinstance(rows, list) or not rows:
+            raise ValueError(f"缺少 {key}")
+        data[key] = [{"length": int(row["length"]), "quantity": int(row["quantity"])} for row in rows]
+        if any(row["length"] <= 0 or row["quantity"] < 0 for row in data[key]):
+            raise ValueError(f"{key} 中的长度必须为正数，数量不能为负数")
+    max_cut_types = int(payload.get("max_cut_types", 5))
+    if max_cut_types < 1:
+        raise ValueError("调锯次数至少为 1")
+    solver_time_limit = min(int(payload.get("solver_time_limit", 60000)), max_time_limit)
+    if solver_time_limit <= 0:
+        raise ValueError("求解时间必须为正数")
+    options = {key: payload[key] for key in SERVICE_JOB_OPTIONS if key in payload}
+    for key, choices in SERVICE_OPTION_CHOICES.items():
+        # 1 == True，dominance、auto_fallback 要求真正的布尔值
+        if key in options and not any(options[key] == c and type(options[key]) is type(c) for c in choices):
+            raise ValueError(f"{key} 只能是 {' / '.join(json.dumps(c) for c in choices)}")
+    if "mip_gap" in options:
+        mip_gap = options["mip_gap"]
+        if isinstance(mip_gap, bool) or not isinstance(mip_gap, (int, float)) or not 0 <= mip_gap < 1:
+            raise ValueError("mip_gap 必须是 0 到 1 之间（不含 1）的数")
+    for key in SERVICE_POSITIVE_INT_OPTIONS:
+        if key in options and (type(options[key]) is not int or options[key] <= 0):
+            raise ValueError(f"{key} 必须是正整数")
+    if "num_workers" in options:
+        options["num_workers"] = min(options["num_workers"], os.cpu_count() or 1)
+    if payload.get("reuse_result", False) is True:
+        options["result_cache"] = True  # 客户端要求复用算过的最优方案
+    return data, solver_time_limit, max_cut_types, options
+
+
+class _QueueSignal:
+    """工作进程中代替 pyqtSignal：把任务的进度放进服务进程的消息队列"""
+    def __init__(self, messages, job_id):
+        self.messages = messages
+        self.job_id = job_id
+
+    def emit(self, value):
+        self.messages.put(("progress", self.job_id, value))
+
+
+class _JobControl(RunControl):
+    """服务任务的 RunControl：客户端取消时放弃方案，超时停止时保留已有的最好方案"""
+    def __init__(self):
+        super().__init__()
+        self.timed_out = False
+
+    def keep_incumbent(self, bars):
+        return self.timed_out and bars is not None
+
+
+# 工作进程中的消息队列和取消表（由 _init_service_worker 设置）
+_service_messages = None
+_service_cancelled = None
+
+
+def _init_service_worker(messages, cancelled):
+    global _service_messages, _service_cancelled
+    _service_messages = messages
+    _service_cancelled = cancelled
+
+
+def _run_service_job(job_id, data, solver_time_limit, max_cut_types, options, output_path):
+    """
+    在工作进程中运行一个任务：开始时通知服务进程，计算中每 0.5 秒检查一次取消表和时间限制，
+    返回结果摘要（见 OptimizationService.status）；没有方案时返回 None。
+    """
+    if _service_cancelled.get(job_id):
+        return None  # 排队时已被取消
+    _service_messages.put(("started", job_id, None))
+    # 多个任务同时运行，每个任务的模式枚举只用一个进程（同 run_batch）
+    options.setdefault("pattern_workers", 1)
+    control = _JobControl()
+    deadline = time.monotonic() + solver_time_limit / 1000 + SERVICE_JOB_MARGIN
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(0.5):
+            if _service_cancelled.get(job_id):
+                control.cancel()
+            elif time.monotonic() > deadline and not control.timed_out:
+                control.timed_out = True
+                control.cancel()
+
+    threading.Thread(target=watch, daemon=True).start()
+    try:
+        plan = solve(data, solver_time_limit, max_cut_types, _QueueSignal(_service_messages, job_id), control,
+                     output_path, **options)
+    finally:
+        finished.set()
+    if plan is None:
+        return None
+    return {
+        "bars": plan["bars"],
+        "stock_length": plan["stock_length"],
+        "finished_count": plan["finished_count"],
+        "finished_length": plan["finished_length"],
+        "kerf_loss": plan["kerf_loss"],
+        "max_waste": plan["max_waste"],
+        "utilization": round(plan["finished_length"] / plan["stock_length"] * 100, 2) if plan["stock_length"] else 0,
+        "notices": list(plan["notices"]) + (["计算超时，使用已有的最好方案"] if control.timed_out else [])
+    }
+
+
+class OptimizationService:
+    """
+    任务队列和工作进程池。同时运行 workers 个任务，另外最多排队 queue_size 个，再提交时抛出 ServiceBusy。
+    报告写在 directory 中（默认为临时目录），已结束的任务最多保留 SERVICE_MAX_FINISHED_JOBS 个。
+    """
+    def __init__(self, workers=None, queue_size=8, directory=None, max_time_limit=SERVICE_MAX_TIME_LIMIT):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_time_limit = max_time_limit
+        self.temp_dir = None if directory else tempfile.TemporaryDirectory(prefix="linercut_service_")
+        self.directory = directory or self.temp_dir.name
+        os.makedirs(self.directory, exist_ok=True)
+        context = multiprocessing.get_context("spawn")
+        self.manager = context.Manager()
+        self.messages = self.manager.Queue()
+        self.cancelled = self.manager.dict()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                        initializer=_init_service_worker, initargs=(self.messages, self.cancelled))
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.closed = False
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+
+    def submit(self, payload):
+        """提交任务，返回任务号；格式不对时抛出 ValueError，排队已满时抛出 ServiceBusy"""
+        data, solver_time_limit, max_cut_types, options = parse_job(payload, self.max_time_limit)
+        with self.lock:
+            active = [job for job in self.jobs.values() if job["status"] in ("queued", "running")]
+            if len(active) >= self.workers + self.queue_size:
+                # 建议等到最早的一个运行中任务按时间限制结束
+                retry_after = max(1, int(min(job["solver_time_limit"] for job in active) / 1000))
+                raise ServiceBusy(f"排队已满（{len(active)} 个任务）", retry_after)
+            job_id = str(next(self.ids))
+            output_path = os.path.join(self.directory, f"优化切割方案_{job_id}.xlsx")
+            self.jobs[job_id] = {"id": job_id, "status": "queued", "progress": 0, "submitted": time.time(),
+                                 "started": None, "finished": None, "solver_time_limit": solver_time_limit,
+                                 "output_path": output_path, "result": None, "error": None, "future": None}
+            future = self.pool.submit(_run_service_job, job_id, data, solver_time_limit, max_cut_types, options,
+                                      output_path)
+            self.jobs[job_id]["future"] = future
+        future.add_done_callback(lambda future: self._finish(job_id, future))
+        return job_id
+
+    def _finish(self, job_id, future):
+        with self.lock:
+            job = self.jobs[job_id]
+            job["finished"] = time.time()
+            if future.cancelled() or self.cancelled.get(job_id):
+                job["status"] = "cancelled"
+            elif future.exception() is not None:
+                job["status"], job["error"] = "failed", str(future.exception())
+            elif future.result() is None:
+                job["status"], job["error"] = "failed", "未找到可行解"
+            else:
+                job["status"], job["result"], job["progress"] = "done", future.result(), 100
+            self._evict()
+
+    def _evict(self):
+        # 在持有 lock 时调用：删除最早结束的任务和报告
+        finished = sorted((job for job in self.jobs.values() if job["finished"] is not None),
+                          key=lambda job: job["finished"])
+        for job in finished[:max(0, len(finished) - SERVICE_MAX_FINISHED_JOBS)]:
+            del self.jobs[job["id"]]
+            self.cancelled.pop(job["id"], None)
+            if os.path.exists(job["output_path"]):
+                os.remove(job["output_path"])
+
+    def _listen(self):
+        # 接收工作进程发来的开始和进度消息
+        while not self.closed:
+            try:
+                kind, job_id, value = self.messages.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is None or job["finished"] is not None:
+                    continue
+                if kind == "started":
+                    job["status"], job["started"] = "running", time.time()
+                else:
+                    job["progress"] = max(job["progress"], value)
+
+    def status(self, job_id):
+        """任务状态（可转换为 JSON），任务不存在时返回 None"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            status = {key: job[key] for key in ("id", "status", "progress", "submitted", "started", "finished",
+                                                 "solver_time_limit", "result", "error")}
+            if job["status"] == "queued":
+                status["position"] = sum(1 for other in self.jobs.values()
+                                         if other["status"] == "queued" and int(other["id"]) < int(job_id))
+            return status
+
+    def report_path(self, job_id):
+        """完成任务的报告路径，任务不存在或未完成时返回 None"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job["output_path"] if job is not None and job["status"] == "done" else None
+
+    def cancel(self, job_id):
+        """取消任务，返回是否找到了未结束的任务"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["finished"] is not None:
+                return False
+            self.cancelled[job_id] = True
+            future = job["future"]
+        future.cancel()  # 还在排队的任务直接取消，运行中的由工作进程的检查线程中断
+        return True
+
+    def health(self):
+        with self.lock:
+            statuses = [job["status"] for job in self.jobs.values()]
+        return {"workers": self.workers, "queue_size": self.queue_size,
+                "running": statuses.count("running"), "queued": statuses.count("queued")}
+
+    def close(self):
+        self.closed = True
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.manager.shutdown()
+        if self.temp_dir is not None:
+            self.temp_dir.cleanup()
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """把 HTTP 请求转给 server.service（OptimizationService）"""
+    def _send_json(self, code, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job_path(self):
+        # /jobs/<id> 或 /jobs/<id>/report，返回 (id, 是否为报告)
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "jobs":
+            return parts[1], False
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "report":
+            return parts[1], True
+        return None, False
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "没有这个接口"})
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            job_id = self.server.service.submit(payload)
+        except ServiceBusy as e:
+            return self._send_json(503, {"error": str(e)}, {"Retry-After": str(e.retry_after)})
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send_json(400, {"error": f"任务格式错误：{e}"})
+        self._send_json(202, {"id": job_id, "status": "queued"}, {"Location": f"/jobs/{job_id}"})
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            return self._send_json(200, self.server.service.health())
+        job_id, report = self._job_path()
+        status = self.server.service.status(job_id) if job_id is not None else None
+        if status is None:
+            return self._send_json(404, {"error": "没有这个任务"})
+        if not report:
+            return self._send_json(200, status)
+        path = self.server.service.report_path(job_id)
+        if path is None:
+            return self._send_json(409, {"error": f"任务状态为 {status['status']}，没有报告"})
+        with open(path, "rb") as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_DELETE(self):
+        job_id, report = self._job_path()
+        if job_id is None or report:
+            return self._send_json(404, {"error": "没有这个接口"})
+        if not self.server.service.cancel(job_id):
+            return self._send_json(404, {"error": "没有未结束的这个任务"})
+        self._send_json(200, {"id": job_id, "status": "cancelled"})
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}")
+
+
+def create_server(host="127.0.0.1", port=8765, **service_options):
+    """创建 HTTP 服务（尚未开始处理请求），service_options 传给 OptimizationService；port 为 0 时自动选择端口"""
+    server = ThreadingHTTPServer((host, port), _ServiceHandler)
+    server.service = OptimizationService(**service_options)
+    return server
+
+
+class ServiceClient:
+    """访问优化服务的客户端（界面的“计算服务器”使用），url 形如 http://主机:端口（可省略 http://）"""
+    def __init__(self, url, timeout=10):
+        self.url = (url if "://" in url else f"http://{url}").rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read(), response.headers.get("Content-Type", "")
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())["error"]
+            except (ValueError, KeyError):
+                message = e.reason
+            if e.code == 503:
+                raise ServiceBusy(message, int(e.headers.get("Retry-After", 1)))
+            raise RuntimeError(f"服务器返回 {e.code}：{message}")
+
+    def submit(self, data, solver_time_limit, max_cut_types, **options):
+        """提交任务（data 为 solve 的实例），返回任务号；排队已满时抛出 ServiceBusy"""
+        body, _ = self._request("POST", "/jobs", {**data, "solver_time_limit": solver_time_limit,
+                                                  "max_cut_types": max_cut_types, **options})
+        return json.loads(body)["id"]
+
+    def status(self, job_id):
+        body, _ = self._request("GET", f"/jobs/{job_id}")
+        return json.loads(body)
+
+    def cancel(self, job_id):
+        self._request("DELETE", f"/jobs/{job_id}")
+
+    def download_report(self, job_id, output_path):
+        body, _ = self._request("GET", f"/jobs/{job_id}/report")
+        with open(output_path + ".tmp", "wb") as f:
+            f.write(body)
+        shutil.move(output_path + ".tmp", output_path)
+        return output_path
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="LinerCut 优化服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，供其他电脑访问时用 0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765, help="端口")
+    parser.add_argument("--workers", type=int, help="同时计算的任务数，默认等于 CPU 核数")
+    parser.add_argument("--queue", type=int, default=8, help="最多排队的任务数，再提交时返回 503")
+    parser.add_argument("--directory", help="保存报告的目录，默认为临时目录")
+    parser.add_argument("--max-time-limit", type=float, default=SERVICE_MAX_TIME_LIMIT / 1000,
+                        help="每个任务的求解时间上限（秒）")
+    args = parser.parse_args(argv)
+    server = create_server(args.host, args.port, workers=args.workers, queue_size=args.queue,
+                           directory=args.directory, max_time_limit=int(args.max_time_limit * 1000))
+    print(f"LinerCut 优化服务：http://{args.host}:{server.server_address[1]}，{server.service.workers} 个工作进程")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    # 打包成 exe 后进程池的子进程也从这里启动，需要先交给 multiprocessing 处理
+    multiprocessing.freeze_support()
+    sys.exit(cli())
@@ -0,0 +1,992 @@
+"""
+LinerCut 性能基准脚本。
+
+用法：
+    python benchmark.py patterns      # 切割模式枚举：剪枝深度优先 vs itertools.product
+    python benchmark.py colgen        # 列生成 vs 完整枚举，另加一个多规格的随机实例
+    python benchmark.py arcflow       # 弧流模型 vs 完整枚举的模式模型
+    python benchmark.py dominance     # 只保留极大模式 vs 全部模式，并核对最优值一致
+    python benchmark.py backends      # SCIP vs CP-SAT（模式模型和弧流模型）
+    python benchmark.py heuristic     # 快速启发式 vs 精确的模式模型
+    python benchmark.py warmstart     # 冷启动 vs 启发式热启动 + 下界提前停止
+    python benchmark.py build         # 建模：逐个 SetCoefficient（含零系数）vs 稀疏矩阵 + MPModelProto
+    python benchmark.py memory        # 模式存储：每个模式一个 dict vs PatternStore 数组
+    python benchmark.py cache         # 模式磁盘缓存：首次枚举 vs 命中 vs 从超集筛选
+    python benchmark.py parallel      # 模式枚举：单线程 vs 进程池（按原材料和前缀切分）
+    python benchmark.py derive        # 每种原材料各枚举一次 vs 只枚举最长原材料再按消耗筛选
+    python benchmark.py presolve      # 预处理（合并重复规格、按需求数量限段数、公约数缩放）前后的枚举
+    python benchmark.py estimate      # 枚举前的规模估计 vs 实际枚举（模式数、内存、时间）
+    python benchmark.py spill         # 长料短件：模式全部放在内存 vs 逐块写入磁盘（峰值内存）
+    python benchmark.py report        # 结果解析：逐个 solution_value() + 逐根循环 vs 一次取值 + 矩阵运算
+    python benchmark.py excel         # 写报告：pandas + 逐个单元格设置样式 vs 只写模式 + 命名样式
+    python benchmark.py detail        # 详细记录：逐根原材料一行 vs 按模式合并 + 流式写出逐根 CSV
+    python benchmark.py worker        # 计算时界面线程的最长卡顿：同进程线程 vs 子进程
+    python benchmark.py batch         # 命令行批量模式：逐个订单求解 vs 进程池
+    python benchmark.py service       # 本机优化服务：逐个在本进程求解 vs 经 HTTP 提交给服务的进程池（含排队重试）
+    python benchmark.py result        # 整个方案的结果缓存：首次求解并写报告 vs 命中缓存（含行顺序打乱的同一订单）
+    python benchmark.py incremental   # 订单小改（改数量、增删规格、改库存）后重新计算 vs 在上一次的会话上增量求解
+
+基准实例取自 OR-Tools_test.py 中的 create_data_model。
+"""
+import argparse
+import copy
+import importlib.util
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import LinerCutEngine
+import LinerCutService
+
+
+class _NullSignal:
+    """代替 pyqtSignal 的空进度回调"""
+    def emit(self, value):
+        pass
+
+
+def load_test_data_model():
+    """加载 OR-Tools_test.py 中的基准数据模型（文件名含连字符，需按路径导入）"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "OR-Tools_test.py")
+    spec = importlib.util.spec_from_file_location("ortools_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.create_data_model()
+
+
+def generate_instance(num_lengths, seed=0, kerf_width=5):
+    """生成一个随机的多规格实例，库存充足"""
+    rng = random.Random(seed)
+    lengths = rng.sample(range(300, 2600), num_lengths)
+    demands = [{"length": l, "quantity": rng.randint(5, 60)} for l in sorted(lengths, reverse=True)]
+    total_length = sum((d["length"] + kerf_width) * d["quantity"] for d in demands)
+    return {
+        "kerf_width": kerf_width,
+        "stock": [
+            {"length": 6000, "quantity": total_length // 6000 + 1},
+            {"length": 5400, "quantity": 30},
+            {"length": 5000, "quantity": 30},
+        ],
+        "demands": demands
+    }
+
+
+def generate_short_piece_instance(num_lengths, seed=0, kerf_width=5):
+    """生成一个短料为主的随机实例（成品 150-1500mm，只有 6000mm 一种原材料），日常订单多是这种"""
+    rng = random.Random(seed)
+    lengths = rng.sample(range(150, 1500, 5), num_lengths)
+    demands = [{"length": l, "quantity": rng.randint(5, 60)} for l in sorted(lengths, reverse=True)]
+    total_length = sum((d["length"] + kerf_width) * d["quantity"] for d in demands)
+    return {
+        "kerf_width": kerf_width,
+        "stock": [{"length": 6000, "quantity": total_length // 6000 + 10}],
+        "demands": demands
+    }
+
+
+def legacy_generate_patterns(stock_length, demand_lengths, kerf_width, max_cut_types):
+    """原先基于 itertools.product 的枚举方式，作为对照"""
+    patterns = []
+    max_counts = [stock_length // length for length in demand_lengths]
+    for combo in itertools.product(*[range(0, c + 1) for c in max_counts]):
+        if sum(1 for c in combo if c > 0) > max_cut_types:
+            continue
+        total_pieces = sum(combo)
+        if total_pieces == 0:
+            continue
+        total_used = sum(int(c) * int(l) for c, l in zip(combo, demand_lengths))
+        total_kerf = int(kerf_width) * (total_pieces - 1) if total_pieces > 1 else 0
+        total_consumption = total_used + total_kerf
+        if total_consumption <= stock_length:
+            utilization = round((total_consumption / stock_length) * 100, 2)
+            patterns.append({
+                "combo": combo,
+                "waste": stock_length - total_consumption,
+                "kerf": total_kerf,
+                "utilization": utilization
+            })
+    return patterns
+
+
+def legacy_stock_patterns(store):
+    """原来的模式存储：每种原材料一个 dict 列表，每个模式一个含 combo 元组的 dict"""
+    stock_patterns = {}
+    for stock_len, stock_qty in store.stock_qty.items():
+        rows = store.stock_slice(stock_len)
+        stock_patterns[stock_len] = {
+            "patterns": [
+                {"combo": tuple(combo), "waste": waste, "kerf": kerf, "utilization": utilization}
+                for combo, waste, kerf, utilization in zip(store.combos[rows].tolist(), store.waste[rows].tolist(),
+                                                           store.kerf[rows].tolist(),
+                                                           store.utilization[rows].tolist())
+            ],
+            "stock_qty": stock_qty
+        }
+    return stock_patterns
+
+
+def legacy_build_pattern_model(solver, stock_patterns, demands, exact_demand=True):
+    """原来的建模方式：逐个创建变量，需求约束对每个模式（包括零系数）调用 SetCoefficient"""
+    variables = {}
+    for stock_len in stock_patterns:
+        stock_qty = stock_patterns[stock_len]["stock_qty"]
+        variables[stock_len] = [solver.IntVar(0, stock_qty, f"x_{stock_len}_{i}")
+                                for i in range(len(stock_patterns[stock_len]["patterns"]))]
+    for stock_len in stock_patterns:
+        solver.Add(sum(variables[stock_len]) <= stock_patterns[stock_len]["stock_qty"])
+    for i, demand in enumerate(demands):
+        upper = demand["quantity"] if exact_demand else solver.infinity()
+        constraint = solver.Constraint(demand["quantity"], upper)
+        for stock_len in variables:
+            for var_idx, var in enumerate(variables[stock_len]):
+                constraint.SetCoefficient(var, stock_patterns[stock_len]["patterns"][var_idx]["combo"][i])
+    objective = solver.Objective()
+    for stock_len in variables:
+        for var in variables[stock_len]:
+            objective.SetCoefficient(var, 1)
+    objective.SetMinimization()
+    return variables
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_patterns(args):
+    data = load_test_data_model()
+    kerf_width = data["kerf_width"]
+    demand_lengths = [d["length"] for d in data["demands"]]
+
+    print(f"需求规格数: {len(demand_lengths)}, 锯缝: {kerf_width}mm, 调锯次数: {args.max_cut_types}")
+    print(f"{'原材料(mm)':>10} {'模式数':>8} {'product(s)':>11} {'剪枝DFS(s)':>11} {'加速比':>8}")
+    for s in data["stock"]:
+        stock_length = s["length"]
+        total = 1
+        for length in demand_lengths:
+            total *= stock_length // length + 1
+
+        legacy, legacy_time = _timed(legacy_generate_patterns, stock_length, demand_lengths,
+                                     kerf_width, args.max_cut_types)
+        pruned, pruned_time = _timed(LinerCutEngine.generate_patterns, stock_length, demand_lengths,
+                                     kerf_width, args.max_cut_types, _NullSignal(), total)
+        if [tuple(combo) for combo in pruned.tolist()] != [p["combo"] for p in legacy]:
+            raise AssertionError(f"{stock_length}mm: 剪枝枚举结果与 itertools.product 不一致")
+        print(f"{stock_length:>10} {len(pruned):>8} {legacy_time:>11.3f} {pruned_time:>11.3f} "
+              f"{legacy_time / pruned_time:>7.1f}x")
+
+
+def _never_cancelled():
+    return False
+
+
+def _enumerate_pattern_store(data, max_cut_types):
+    demand_lengths = [d["length"] for d in data["demands"]]
+    blocks = {
+        s["length"]: LinerCutEngine.generate_patterns(s["length"], demand_lengths, data["kerf_width"], max_cut_types,
+                                                _NullSignal(), float("inf"))
+        for s in data["stock"]
+    }
+    return LinerCutEngine.PatternStore(demand_lengths, data["kerf_width"], {s["length"]: s["quantity"] for s in data["stock"]},
+                                 blocks)
+
+
+def _column_generation_pattern_store(data, max_cut_types):
+    return LinerCutEngine.generate_patterns_column_generation(data["stock"], data["demands"], data["kerf_width"],
+                                                        max_cut_types, _NullSignal(), _never_cancelled)
+
+
+def _report_engine(name, data, pattern_source, args):
+    store, build_time = _timed(pattern_source, data, args.max_cut_types)
+    (solver, status, _), solve_time = _timed(LinerCutEngine.solve_pattern_model, store, data["demands"],
+                                             args.time_limit * 1000)
+    columns = len(store)
+    bars = solver.Objective().Value() if status in (solver.OPTIMAL, solver.FEASIBLE) else float("nan")
+    print(f"{name:>10} {columns:>8} {build_time:>10.3f} {solve_time:>10.3f} {bars:>8.0f}")
+
+
+def bench_colgen(args):
+    header = f"{'模式来源':>10} {'模式数':>8} {'生成(s)':>10} {'求解(s)':>10} {'原材料数':>8}"
+
+    data = load_test_data_model()
+    print(f"OR-Tools_test.py 实例，需求规格数: {len(data['demands'])}")
+    print(header)
+    _report_engine("枚举", data, _enumerate_pattern_store, args)
+    _report_engine("列生成", data, _column_generation_pattern_store, args)
+
+    data = generate_instance(args.lengths, seed=args.seed)
+    print(f"随机实例，需求规格数: {len(data['demands'])}（完整枚举不可行，仅列生成）")
+    print(header)
+    _report_engine("列生成", data, _column_generation_pattern_store, args)
+
+
+def _solve_enumerated(data, args):
+    store = _enumerate_pattern_store(data, args.max_cut_types)
+    solver, status, _ = LinerCutEngine.solve_pattern_model(store, data["demands"], args.time_limit * 1000)
+    columns = len(store)
+    bars = solver.Objective().Value() if status in (solver.OPTIMAL, solver.FEASIBLE) else float("nan")
+    return f"{columns} 个模式变量", bars
+
+
+def _solve_arc_flow(data, args):
+    status, _, usage = LinerCutEngine.solve_arc_flow(data["stock"], data["demands"], data["kerf_width"],
+                                               args.max_cut_types, args.time_limit * 1000)
+    bars = usage.sum() if usage is not None else float("nan")
+    return "见上方弧流模型规模", bars
+
+
+def bench_arcflow(args):
+    instances = [("OR-Tools_test.py", load_test_data_model()),
+                 (f"随机 {args.lengths} 规格", generate_instance(args.lengths, seed=args.seed))]
+    for name, data in instances:
+        print(f"{name} 实例，需求规格数: {len(data['demands'])}")
+        for engine, solve in (("枚举", _solve_enumerated), ("弧流", _solve_arc_flow)):
+            (size, bars), elapsed = _timed(solve, data, args)
+            print(f"  {engine:>4}: {elapsed:8.3f}s  原材料数 {bars:.0f}  ({size})")
+
+
+def bench_dominance(args):
+    instances = [("OR-Tools_test.py", load_test_data_model()),
+                 (f"随机 {args.lengths} 规格", generate_instance(args.lengths, seed=args.seed))]
+    for name, data in instances:
+        demand_lengths = [d["length"] for d in data["demands"]]
+        demand_quantities = [d["quantity"] for d in data["demands"]]
+        store = _enumerate_pattern_store(data, args.max_cut_types)
+        maximal_store = LinerCutEngine.filter_maximal_patterns(store, demand_quantities, args.max_cut_types)
+
+        print(f"{name} 实例，需求规格数: {len(demand_lengths)}")
+        objectives = []
+        for label, patterns, exact in (("全部模式", store, True), ("极大模式", maximal_store, False)):
+            (solver, status, _), elapsed = _timed(LinerCutEngine.solve_pattern_model, patterns, data["demands"],
+                                                  args.time_limit * 1000, exact)
+            columns = len(patterns)
+            objectives.append((status, solver.Objective().Value()))
+            print(f"  {label}: {columns:>7} 个变量  {elapsed:8.3f}s  原材料数 {solver.Objective().Value():.0f}"
+                  f"  {'最优' if status == solver.OPTIMAL else '未证明最优'}")
+        if all(status == 0 for status, _ in objectives) and abs(objectives[0][1] - objectives[1][1]) > 0.5:
+            raise AssertionError("极大模式模型的最优值与完整模型不一致")
+
+
+def bench_backends(args):
+    data = generate_instance(args.lengths, seed=args.seed)
+    store = _enumerate_pattern_store(data, args.max_cut_types)
+    print(f"随机 {args.lengths} 规格实例，CP-SAT 线程数: {args.workers}")
+    for backend in ("SCIP", "CP-SAT"):
+        (solver, status, _), elapsed = _timed(LinerCutEngine.solve_pattern_model, store, data["demands"],
+                                              args.time_limit * 1000, True, backend, args.workers)
+        print(f"  模式模型 {backend:>6}: {elapsed:8.3f}s  原材料数 {solver.Objective().Value():.0f}"
+              f"  {'最优' if status == solver.OPTIMAL else '未证明最优'}")
+        (status, _, usage), elapsed = _timed(LinerCutEngine.solve_arc_flow, data["stock"], data["demands"],
+                                             data["kerf_width"], args.max_cut_types, args.time_limit * 1000,
+                                             backend, args.workers)
+        bars = usage.sum() if usage is not None else float("nan")
+        print(f"  弧流模型 {backend:>6}: {elapsed:8.3f}s  原材料数 {bars:.0f}"
+              f"  {'最优' if status == 0 else '未证明最优'}")
+
+
+def bench_heuristic(args):
+    instances = [("OR-Tools_test.py", load_test_data_model()),
+                 (f"随机 {args.lengths} 规格", generate_instance(args.lengths, seed=args.seed))]
+    for name, data in instances:
+        print(f"{name} 实例，需求规格数: {len(data['demands'])}")
+        for budget in args.budgets:
+            (status, _, usage), elapsed = _timed(LinerCutEngine.solve_heuristic, data["stock"], data["demands"],
+                                                 data["kerf_width"], args.max_cut_types, budget, _never_cancelled)
+            bars = usage.sum() if usage is not None else float("nan")
+            print(f"  快速 {budget:>4}s: {elapsed:8.3f}s  原材料数 {bars:.0f}")
+        (size, bars), elapsed = _timed(_solve_enumerated, data, args)
+        print(f"  精确    : {elapsed:8.3f}s  原材料数 {bars:.0f}  ({size})")
+
+
+def bench_warmstart(args):
+    instances = [("OR-Tools_test.py", load_test_data_model())]
+    instances += [(f"随机 {n} 规格", generate_instance(n, seed=args.seed)) for n in args.lengths]
+    instances += [(f"短料 {n} 规格", generate_short_piece_instance(n, seed=args.seed + 1)) for n in args.short_lengths]
+    for name, data in instances:
+        print(f"{name} 实例，需求规格数: {len(data['demands'])}")
+        store = _enumerate_pattern_store(data, args.max_cut_types)
+        (solver, status, _), elapsed = _timed(LinerCutEngine.solve_pattern_model, store, data["demands"],
+                                              args.time_limit * 1000, True, args.backend)
+        bars = solver.Objective().Value() if status in (solver.OPTIMAL, solver.FEASIBLE) else float("nan")
+        print(f"  冷启动: {elapsed:8.3f}s  原材料数 {bars:.0f}"
+              f"  {'最优' if status == solver.OPTIMAL else '未证明最优'}")
+
+        # 和 solve 一样：按模型大小给启发式时间，模型小时不做热启动；初始方案没达到长度下界时再算线性松弛下界
+        start = time.perf_counter()
+        warm_time = args.warm_time
+        if warm_time is None:
+            warm_time = LinerCutEngine.warm_start_budget(args.time_limit * 1000, len(store))
+        lower_bound = LinerCutEngine.length_lower_bound(data["stock"], data["demands"], data["kerf_width"])
+        warm_status, warm_store, warm_usage = LinerCutEngine.solve_heuristic(
+            data["stock"], data["demands"], data["kerf_width"], args.max_cut_types, warm_time, _never_cancelled,
+            lower_bound=lower_bound, stop_over_stock=True) if warm_time else (None, None, None)
+        warm_bars = warm_usage.sum() if warm_usage is not None else float("nan")
+        if warm_usage is not None and warm_bars != lower_bound:
+            lp_bound = LinerCutEngine.pattern_lp_bound(store, data["demands"])
+            lower_bound = max(lower_bound, math.ceil(lp_bound - 1e-6))
+        if LinerCutEngine.within_gap(warm_bars, lower_bound, args.gap):
+            elapsed = time.perf_counter() - start
+            print(f"  热启动: {elapsed:8.3f}s  原材料数 {warm_bars:.0f}  初始方案已达到下界 {lower_bound}")
+            continue
+        hint = None
+        if warm_usage is not None and args.backend == "CP-SAT":
+            store, hint = LinerCutEngine.merge_warm_start(store, warm_store, warm_usage)
+        solver, status, _ = LinerCutEngine.solve_pattern_model(store, data["demands"], args.time_limit * 1000, True,
+                                                         args.backend, 1, hint, args.gap)
+        elapsed = time.perf_counter() - start
+        print(f"  热启动: {elapsed:8.3f}s  原材料数 {solver.Objective().Value():.0f}"
+              f"  {'最优' if status == solver.OPTIMAL else '未证明最优'}  (下界 {lower_bound}, 初始方案 {warm_bars:.0f})")
+
+
+def bench_build(args):
+    for n in args.lengths:
+        data = generate_instance(n, seed=args.seed)
+        store = _enumerate_pattern_store(data, args.max_cut_types)
+        print(f"随机 {n} 规格实例，{len(store)} 个模式")
+        _, legacy_time = _timed(legacy_build_pattern_model, LinerCutEngine.create_mip_solver(), legacy_stock_patterns(store),
+                                data["demands"])
+        _, sparse_time = _timed(LinerCutEngine._add_pattern_model, LinerCutEngine.create_mip_solver(), store,
+                                data["demands"], True)
+        print(f"  逐个系数: {legacy_time:8.3f}s  稀疏矩阵: {sparse_time:8.3f}s  加速比 {legacy_time / sparse_time:.1f}x")
+
+
+def _traced(func, *args):
+    """返回 (结果, 调用期间新分配并仍然存活的内存字节数, 峰值字节数, 耗时)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def bench_memory(args):
+    for n in args.lengths:
+        data = generate_instance(n, seed=args.seed)
+        store, store_bytes, store_peak, store_time = _traced(_enumerate_pattern_store, data, args.max_cut_types)
+        _, legacy_bytes, legacy_peak, legacy_time = _traced(legacy_stock_patterns, store)
+        print(f"随机 {n} 规格实例，{len(store)} 个模式")
+        print(f"  dict 列表  : 常驻 {legacy_bytes / 2 ** 20:8.1f} MB  峰值 {legacy_peak / 2 ** 20:8.1f} MB"
+              f"  （由数组转换，{legacy_time:.3f}s）")
+        print(f"  PatternStore: 常驻 {store_bytes / 2 ** 20:8.1f} MB  峰值 {store_peak / 2 ** 20:8.1f} MB"
+              f"  （枚举 {store_time:.3f}s）  每个模式 {store.nbytes / max(len(store), 1):.0f} 字节")
+
+
+def bench_cache(args):
+    data = generate_instance(args.lengths, seed=args.seed)
+    demand_lengths = [d["length"] for d in data["demands"]]
+    subset = demand_lengths[:-args.drop] if args.drop else demand_lengths
+    with tempfile.TemporaryDirectory() as directory:
+        cache = LinerCutEngine.PatternCache(directory)
+        print(f"随机 {args.lengths} 规格实例，缓存目录 {directory}")
+        for s in data["stock"]:
+            patterns, enumerate_time = _timed(LinerCutEngine.generate_patterns, s["length"], demand_lengths,
+                                              data["kerf_width"], args.max_cut_types, _NullSignal(), float("inf"))
+            _, store_time = _timed(cache.store, s["length"], demand_lengths, data["kerf_width"], args.max_cut_types,
+                                   patterns)
+            hit, hit_time = _timed(cache.lookup, s["length"], demand_lengths, data["kerf_width"], args.max_cut_types)
+            sub, sub_time = _timed(cache.lookup, s["length"], subset, data["kerf_width"], args.max_cut_types)
+            reference, reference_time = _timed(LinerCutEngine.generate_patterns, s["length"], subset, data["kerf_width"],
+                                               args.max_cut_types, _NullSignal(), float("inf"))
+            if sorted(map(tuple, hit.tolist())) != sorted(map(tuple, patterns.tolist())) or \
+                    sorted(map(tuple, sub.tolist())) != sorted(map(tuple, reference.tolist())):
+                raise AssertionError(f"{s['length']}mm: 缓存读出的模式与枚举结果不一致")
+            print(f"  {s['length']}mm {len(patterns):>7} 个模式: 枚举 {enumerate_time:7.3f}s  写入 {store_time:6.3f}s"
+                  f"  命中 {hit_time:6.3f}s  |  少 {args.drop} 种规格 {len(sub):>7} 个: "
+                  f"枚举 {reference_time:7.3f}s  超集筛选 {sub_time:6.3f}s")
+
+
+def bench_parallel(args):
+    data = generate_instance(args.lengths, seed=args.seed)
+    demand_lengths = [d["length"] for d in data["demands"]]
+    stock_lengths = [s["length"] for s in data["stock"]]
+    total = sum(LinerCutEngine.count_patterns(length, demand_lengths, data["kerf_width"], args.max_cut_types)
+                for length in stock_lengths)
+    print(f"随机 {args.lengths} 规格实例，{len(stock_lengths)} 种原材料，{total} 个模式，CPU 核数 {os.cpu_count()}")
+    serial, serial_time = _timed(lambda: {
+        length: LinerCutEngine.generate_patterns(length, demand_lengths, data["kerf_width"], args.max_cut_types, None, 1)
+        for length in stock_lengths
+    })
+    print(f"  单线程     : {serial_time:8.3f}s")
+    for workers in args.workers:
+        # 第一次调用要启动进程，不计入时间
+        LinerCutEngine.generate_patterns_parallel(stock_lengths[:1], demand_lengths[:2], data["kerf_width"],
+                                            args.max_cut_types, _NullSignal(), _never_cancelled, workers, 1)
+        blocks, elapsed = _timed(LinerCutEngine.generate_patterns_parallel, stock_lengths, demand_lengths,
+                                 data["kerf_width"], args.max_cut_types, _NullSignal(), _never_cancelled, workers,
+                                 total)
+        if any((blocks[length] != serial[length]).any() for length in stock_lengths):
+            raise AssertionError("并行枚举结果与单线程不一致")
+        print(f"  {workers:>2} 个进程  : {elapsed:8.3f}s  加速比 {serial_time / elapsed:.1f}x")
+    LinerCutEngine.shutdown_pattern_pool()
+    print(f"  solve 默认用 {LinerCutEngine.default_pattern_workers(total)} 个进程（default_pattern_workers）")
+
+
+def bench_derive(args):
+    for n in args.lengths:
+        data = generate_instance(n, seed=args.seed)
+        demand_lengths = [d["length"] for d in data["demands"]]
+        stock_qty = {s["length"]: s["quantity"] for s in data["stock"]}
+        stock_qty.update({length: 10 for length in args.extra_stock})
+        per_stock, per_stock_time = _timed(lambda: LinerCutEngine.PatternStore(demand_lengths, data["kerf_width"], stock_qty, {
+            length: LinerCutEngine.generate_patterns(length, demand_lengths, data["kerf_width"], args.max_cut_types, None, 1)
+            for length in stock_qty
+        }))
+        derived, derived_time = _timed(lambda: LinerCutEngine.PatternStore.from_longest(
+            demand_lengths, data["kerf_width"], stock_qty,
+            LinerCutEngine.generate_patterns(max(stock_qty), demand_lengths, data["kerf_width"], args.max_cut_types, None, 1)))
+        if not (per_stock.combos == derived.combos).all():
+            raise AssertionError("按消耗筛选得到的模式与逐个枚举不一致")
+        print(f"随机 {n} 规格实例，{len(stock_qty)} 种原材料，{len(derived)} 个模式")
+        print(f"  逐个枚举: {per_stock_time:8.3f}s  最长原材料枚举 + 筛选: {derived_time:8.3f}s"
+              f"  加速比 {per_stock_time / derived_time:.1f}x")
+
+
+def generate_pasted_instance(num_lengths, seed=0, kerf_width=10, duplicates=4):
+    """生成一个从表格粘贴来的随机订单：长度取整到 10mm，需求数量少，部分规格分成多行重复出现"""
+    rng = random.Random(seed)
+    lengths = rng.sample(range(300, 2600, 10), num_lengths)
+    demands = [{"length": l, "quantity": rng.randint(1, 4)} for l in sorted(lengths, reverse=True)]
+    for demand in rng.sample(demands, duplicates):
+        demands.append({"length": demand["length"], "quantity": rng.randint(1, 4)})
+    return {
+        "kerf_width": kerf_width,
+        "stock": [{"length": 6000, "quantity": 100}, {"length": 5000, "quantity": 30}],
+        "demands": demands
+    }
+
+
+def bench_presolve(args):
+    for n in args.lengths:
+        data = generate_pasted_instance(n, seed=args.seed)
+        kerf_width = data["kerf_width"]
+        longest = max(s["length"] for s in data["stock"])
+        raw_lengths = [d["length"] for d in data["demands"]]
+        raw, raw_time = _timed(lambda: LinerCutEngine.generate_patterns(longest, raw_lengths, kerf_width,
+                                                                  args.max_cut_types, None, 1))
+
+        def presolved():
+            reduced = LinerCutEngine.presolve(data, args.max_cut_types)
+            scale = reduced["scale"]
+            return LinerCutEngine.generate_patterns((longest + kerf_width) // scale - kerf_width // scale,
+                                              [d["length"] // scale for d in reduced["demands"]],
+                                              kerf_width // scale, args.max_cut_types, None, 1,
+                                              max_counts=reduced["max_counts"])
+        reduced, reduced_time = _timed(presolved)
+        print(f"随机 {len(raw_lengths)} 行订单（{n} 种规格）")
+        print(f"  原实例: {len(raw):>10} 个模式 {raw_time:8.3f}s"
+              f"  预处理后: {len(reduced):>10} 个模式 {reduced_time:8.3f}s  加速比 {raw_time / reduced_time:.1f}x")
+
+
+def bench_estimate(args):
+    for n in args.lengths:
+        data = generate_instance(n, seed=args.seed)
+        demand_lengths = [d["length"] for d in data["demands"]]
+        stock_qty = {s["length"]: s["quantity"] for s in data["stock"]}
+        estimate, estimate_time = _timed(lambda: LinerCutEngine.estimate_pattern_model(
+            list(stock_qty), demand_lengths, data["kerf_width"], args.max_cut_types))
+        store, enumerate_time = _timed(lambda: LinerCutEngine.PatternStore.from_longest(
+            demand_lengths, data["kerf_width"], stock_qty,
+            LinerCutEngine.generate_patterns(max(stock_qty), demand_lengths, data["kerf_width"], args.max_cut_types, None, 1)))
+        if estimate["counts"] != store.counts:
+            raise AssertionError("估计的模式数与实际枚举不一致")
+        print(f"随机 {n} 规格实例，{len(store)} 个模式变量")
+        print(f"  估计: {estimate_time:8.3f}s  预计内存 {estimate['bytes'] / 1024 / 1024:8.1f} MB"
+              f"  预计枚举 {estimate['seconds']:6.2f}s")
+        print(f"  枚举: {enumerate_time:8.3f}s  PatternStore {store.nbytes / 1024 / 1024:8.1f} MB（不含求解器模型）")
+
+
+def bench_spill(args):
+    data = generate_short_piece_instance(args.lengths, seed=args.seed)
+    demand_lengths = [d["length"] for d in data["demands"]]
+    demand_quantities = [d["quantity"] for d in data["demands"]]
+    kerf_width = data["kerf_width"]
+    stock_qty = {length: 100 for length in args.stock}
+    longest = max(stock_qty)
+    estimate = LinerCutEngine.estimate_pattern_model(list(stock_qty), demand_lengths, kerf_width, args.max_cut_types)
+    print(f"{longest}mm 长料、{args.lengths} 种短件：{estimate['variables']} 个模式变量，"
+          f"模式矩阵约 {estimate['pattern_bytes'] / 1024 / 1024:.0f} MB")
+
+    def in_memory():
+        store = LinerCutEngine.PatternStore.from_longest(demand_lengths, kerf_width, stock_qty, LinerCutEngine.generate_patterns(
+            longest, demand_lengths, kerf_width, args.max_cut_types, None, 1))
+        return LinerCutEngine.filter_maximal_patterns(store, demand_quantities, args.max_cut_types)
+
+    def spilled(directory):
+        chunks = LinerCutEngine.generate_pattern_chunks(longest, demand_lengths, kerf_width, args.max_cut_types, None,
+                                                  max(estimate["patterns"], 1))
+        store = LinerCutEngine.PatternStore.stream_from_longest(demand_lengths, kerf_width, stock_qty, chunks,
+                                                          estimate["counts"], directory)
+        return LinerCutEngine.filter_maximal_patterns(store, demand_quantities, args.max_cut_types)
+
+    memory_result, _, memory_peak, memory_time = _traced(in_memory)
+    with tempfile.TemporaryDirectory() as directory:
+        spilled_result, _, spilled_peak, spilled_time = _traced(spilled, directory)
+    if not (memory_result.combos == spilled_result.combos).all():
+        raise AssertionError("写入磁盘后得到的极大模式与全部放在内存时不一致")
+    print(f"  极大模式 {len(memory_result)} 个")
+    print(f"  全部在内存: 峰值 {memory_peak / 1024 / 1024:8.1f} MB  {memory_time:8.2f}s")
+    print(f"  逐块写入磁盘: 峰值 {spilled_peak / 1024 / 1024:8.1f} MB  {spilled_time:8.2f}s"
+          f"（每块约 {LinerCutEngine.PATTERN_CHUNK_BYTES / 1024 / 1024:.0f} MB）")
+
+
+def legacy_report_stats(variables, store, demands):
+    """原先的结果解析：逐个变量取值，逐根原材料累加统计，需求完成对每种规格再遍历全部变量"""
+    demand_lengths = [d["length"] for d in demands]
+    usage = [int(round(var.solution_value())) for var in variables]
+    stock_lengths = store.row_stock_lengths()
+    total_stock_length_used = total_finished_count = total_finished_length = max_waste = total_kerf_loss = 0
+    for row, used in enumerate(usage):
+        combo = store.combos[row].tolist()
+        for _ in range(used):
+            total_stock_length_used += int(stock_lengths[row])
+            total_finished_count += sum(combo)
+            total_finished_length += sum(c * l for c, l in zip(combo, demand_lengths))
+            total_kerf_loss += int(store.kerf[row])
+            max_waste = max(max_waste, int(store.waste[row]))
+    produced = [sum(variables[row].solution_value() * store.combos[row][i] for row in range(len(variables)))
+                for i in range(len(demands))]
+    return total_stock_length_used, total_finished_count, total_finished_length, total_kerf_loss, max_waste, produced
+
+
+def bench_report(args):
+    for n in args.lengths:
+        data = generate_instance(n, seed=args.seed)
+        store = _enumerate_pattern_store(data, args.max_cut_types)
+        # 线性松弛的解四舍五入后当作方案，只比较解析结果的时间
+        solver = LinerCutEngine.pywraplp.Solver.CreateSolver("GLOP")
+        variables = LinerCutEngine._add_pattern_model(solver, store, data["demands"], False, integer=False)
+        solver.Solve()
+        demand_lengths = [d["length"] for d in data["demands"]]
+        legacy, legacy_time = _timed(lambda: legacy_report_stats(variables, store, data["demands"]))
+        plan, plan_time = _timed(lambda: LinerCutEngine.summarize_plan(store, LinerCutEngine.solution_values(solver),
+                                                                 demand_lengths))
+        if legacy[:5] != (plan["stock_length"], plan["finished_count"], plan["finished_length"], plan["kerf_loss"],
+                          plan["max_waste"]):
+            raise AssertionError("矩阵运算得到的统计与逐根累加不一致")
+        print(f"随机 {n} 规格实例，{len(store)} 个模式变量，{plan['bars']} 根原材料")
+        print(f"  逐个取值 + 循环: {legacy_time:8.3f}s  一次取值 + 矩阵运算: {plan_time:8.3f}s"
+              f"  加速比 {legacy_time / plan_time:.0f}x")
+
+
+def legacy_write_report(output_path, sheets):
+    """原先的写法：pandas 写出各表后，再逐个单元格设置字体、边框、底色，并扫描单元格计算列宽"""
+    from openpyxl.styles import Alignment, Border, Font, PatternFill
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        for sheet_name, df in sheets:
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+        msyh_font = Font(name='微软雅黑', bold=False)
+        center_alignment = Alignment(horizontal='center', vertical='center')
+        for sheet_name in writer.sheets:
+            sheet = writer.sheets[sheet_name]
+            for row in sheet.iter_rows(min_row=1, max_row=sheet.max_row, min_col=1, max_col=sheet.max_column):
+                for cell in row:
+                    cell.font = msyh_font
+                    cell.border = Border(bottom=None, top=None, left=None, right=None)
+            for cell in sheet['A']:
+                cell.alignment = center_alignment
+            for row_index, row in enumerate(sheet.iter_rows(min_row=2, max_row=sheet.max_row, min_col=1,
+                                                            max_col=sheet.max_column), start=2):
+                if row_index % 2 == 0:
+                    for cell in row:
+                        cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+            for column_cells in sheet.columns:
+                max_length = max(len(str(cell.value)) for cell in column_cells)
+                sheet.column_dimensions[column_cells[0].column_letter].width = (max_length + 2) * 1.5
+            sheet.sheet_view.showGridLines = False
+
+
+def _report_plan(bars, seed=0, detail_mode="bars"):
+    """随机生成一个 bars 根原材料、最多 200 个模式的方案（summarize_plan 的结果）"""
+    data = generate_instance(18, seed=seed)
+    store = _enumerate_pattern_store(data, 5)
+    rng = np.random.default_rng(seed)
+    usage = np.zeros(len(store), dtype=np.int64)
+    rows = rng.choice(len(store), size=min(200, len(store)), replace=False)
+    np.add.at(usage, rng.choice(rows, size=bars), 1)
+    return LinerCutEngine.summarize_plan(store, usage, [d["length"] for d in data["demands"]], detail_mode)
+
+
+def _report_sheets(bars, seed=0):
+    """随机生成一个 bars 根原材料的方案报告（详细记录每根一行）"""
+    plan = _report_plan(bars, seed)
+    return [("详细记录", plan["detail"]), ("方案汇总", plan["summary"])]
+
+
+def bench_excel(args):
+    for bars in args.bars:
+        sheets = _report_sheets(bars, args.seed)
+        with tempfile.TemporaryDirectory() as directory:
+            legacy_path = os.path.join(directory, "legacy.xlsx")
+            path = os.path.join(directory, "report.xlsx")
+            _, legacy_time = _timed(lambda: legacy_write_report(legacy_path, sheets))
+            _, write_time = _timed(lambda: LinerCutEngine.write_report(path, sheets))
+            legacy_size, size = os.path.getsize(legacy_path), os.path.getsize(path)
+        print(f"{bars} 根原材料，详细记录 {len(sheets[0][1])} 行")
+        print(f"  逐个单元格设置样式: {legacy_time:8.3f}s {legacy_size / 1024:8.0f} KB"
+              f"  只写模式 + 命名样式: {write_time:8.3f}s {size / 1024:8.0f} KB  加速比 {legacy_time / write_time:.1f}x")
+
+
+def bench_detail(args):
+    for bars in args.bars:
+        with tempfile.TemporaryDirectory() as directory:
+            def report(detail_mode):
+                plan = _report_plan(bars, args.seed, detail_mode)
+                path = os.path.join(directory, f"{detail_mode}.xlsx")
+                LinerCutEngine.write_report(path, [("详细记录", plan["detail"]), ("方案汇总", plan["summary"])])
+                return plan, os.path.getsize(path)
+
+            (_, bars_size), _, bars_peak, bars_time = _traced(report, "bars")
+            (plan, grouped_size), _, grouped_peak, grouped_time = _traced(report, "grouped")
+            csv_path = os.path.join(directory, "detail.csv")
+            _, _, csv_peak, csv_time = _traced(LinerCutEngine.write_detail_csv, csv_path, plan["groups"])
+            csv_size = os.path.getsize(csv_path)
+        print(f"{bars} 根原材料，{len(plan['groups'])} 个模式")
+        print(f"  逐根一行  : {bars_time:8.3f}s  峰值 {bars_peak / 2 ** 20:8.1f} MB  文件 {bars_size / 1024:8.0f} KB")
+        print(f"  按模式合并: {grouped_time:8.3f}s  峰值 {grouped_peak / 2 ** 20:8.1f} MB  文件 {grouped_size / 1024:8.0f} KB")
+        print(f"  逐根 CSV  : {csv_time:8.3f}s  峰值 {csv_peak / 2 ** 20:8.1f} MB  文件 {csv_size / 1024:8.0f} KB")
+
+
+def _stall_while(start_worker, connection, interval=0.01):
+    """
+    模拟界面的事件循环：每 interval 秒醒来一次并处理管道中的消息，直到收到结果。
+    返回 (最长卡顿秒数, 结果消息, 耗时)；卡顿为两次醒来的间隔减去 interval。
+    """
+    start = time.perf_counter()
+    start_worker()
+    last, stall, result = time.perf_counter(), 0.0, None
+    while result is None:
+        time.sleep(interval)
+        while connection.poll():
+            kind, value = connection.recv()
+            if kind in ("result", "error"):
+                result = (kind, value)
+        now = time.perf_counter()
+        stall = max(stall, now - last - interval)
+        last = now
+    return stall, result, time.perf_counter() - start
+
+
+def bench_worker(args):
+    data = generate_instance(args.lengths, seed=args.seed)
+    worker_args = (args.time_limit * 1000, args.max_cut_types)
+    options = dict(engine="enumerate", pattern_cache=False, pattern_workers=1, result_cache=False)
+    print(f"随机 {args.lengths} 规格实例")
+    for name in ("同进程线程", "子进程"):
+        connection, child_connection = multiprocessing.Pipe()
+        worker = (threading.Thread if name == "同进程线程" else multiprocessing.get_context("spawn").Process)(
+            target=LinerCutEngine.optimization_worker,
+            args=(child_connection, data, worker_args, options))
+        stall, result, elapsed = _stall_while(worker.start, connection)
+        worker.join()
+        print(f"  {name}: 最长卡顿 {stall * 1000:8.1f} ms  总耗时 {elapsed:7.2f}s  {result[0]}")
+
+
+def bench_batch(args):
+    with tempfile.TemporaryDirectory() as directory:
+        orders = os.path.join(directory, "orders")
+        os.makedirs(orders)
+        for i in range(args.orders):
+            data = generate_instance(args.lengths, seed=args.seed + i)
+            with pd.ExcelWriter(os.path.join(orders, f"订单{i}.xlsx")) as writer:
+                for sheet_name, key in (("Stock", "stock"), ("Demands", "demands")):
+                    pd.DataFrame([[row["length"], row["quantity"]] for row in data[key]],
+                                 columns=["Length", "Quantity"]).to_excel(writer, sheet_name=sheet_name, index=False)
+        print(f"{args.orders} 个 {args.lengths} 规格的随机订单，CPU 核数 {os.cpu_count()}")
+        for workers in (1, args.workers or os.cpu_count() or 1):
+            results, elapsed = _timed(lambda: LinerCutEngine.run_batch(
+                orders, os.path.join(directory, f"reports{workers}"), 5, args.time_limit * 1000, args.max_cut_types,
+                workers, result_cache=False))
+            print(f"  {workers} 个进程: {elapsed:8.2f}s  共 {sum(result['bars'] or 0 for result in results)} 根原材料")
+        # 报告写在订单目录（cli 的默认）时，再次运行不能把上次的报告当作订单
+        for run in range(2):
+            results = LinerCutEngine.run_batch(orders, orders, 5, args.time_limit * 1000, args.max_cut_types,
+                                               args.workers, result_cache=False)
+            if len(results) != args.orders or any(result["error"] is not None for result in results):
+                raise AssertionError(f"第 {run + 1} 次在订单目录中运行：{[result['error'] for result in results]}")
+        print(f"  报告写在订单目录中连续运行两次：每次 {args.orders} 个订单，全部成功")
+
+
+def bench_result(args):
+    with tempfile.TemporaryDirectory() as directory:
+        cache = LinerCutEngine.ResultCache(os.path.join(directory, "cache"))
+        output_path = os.path.join(directory, "report.xlsx")
+        for n in args.lengths:
+            data = generate_instance(n, seed=args.seed)
+            # 同一订单换一种写法：行顺序打乱、多一行数量为 0 的规格
+            shuffled = dict(data, stock=data["stock"][::-1],
+                            demands=random.Random(args.seed).sample(data["demands"], len(data["demands"])) +
+                            [{"length": data["demands"][0]["length"] + 1, "quantity": 0}])
+            runs = []
+            for instance in (data, data, shuffled):
+                plan, elapsed = _timed(lambda: LinerCutEngine.solve(instance, args.time_limit * 1000,
+                                                                    args.max_cut_types, output_path=output_path,
+                                                                    pattern_cache=False, result_cache=cache))
+                runs.append((plan, elapsed))
+            if len({plan["bars"] for plan, _ in runs}) != 1:
+                raise AssertionError("命中缓存的方案与首次求解不一致")
+            source = [dict(zip(plan["sheets"][-1][1]["项目"], plan["sheets"][-1][1]["数值"])).get("方案来源", "求解")
+                      for plan, _ in runs]
+            print(f"随机 {n} 规格实例，{runs[0][0]['bars']} 根原材料")
+            for name, (_, elapsed), origin in zip(("首次求解", "命中缓存", "打乱行顺序"), runs, source):
+                print(f"  {name}: {elapsed:8.3f}s  {origin}")
+
+
+def _edited_orders(data, seed):
+    """模拟计划员的几次小改，依次返回 (说明, 订单)，每次在上一次的基础上修改"""
+    rng = random.Random(seed)
+    changed = rng.randrange(len(data["demands"]))
+    order = copy.deepcopy(data)
+    lengths = [d["length"] for d in order["demands"]]
+    edits = [
+        ("一种数量 +1", lambda o: o["demands"][changed].update(quantity=o["demands"][changed]["quantity"] + 1)),
+        ("一种数量 -2", lambda o: o["demands"][-1].update(quantity=max(1, o["demands"][-1]["quantity"] - 2))),
+        ("一种数量改为 1", lambda o: o["demands"][1].update(quantity=1)),
+        ("新增一种规格", lambda o: o["demands"].append({"length": min(lengths) + 7, "quantity": 5})),
+        ("删除一种规格", lambda o: o["demands"].pop(2)),
+        ("库存 +5", lambda o: o["stock"][0].update(quantity=o["stock"][0]["quantity"] + 5)),
+    ]
+    for name, edit in edits:
+        edit(order)
+        yield name, copy.deepcopy(order)
+
+
+def bench_incremental(args):
+    data = generate_instance(args.lengths, seed=args.seed)
+    time_limit = args.time_limit * 1000
+    options = dict(backend=args.backend, pattern_cache=False, result_cache=False, pattern_workers=1)
+    session = LinerCutEngine.SolveSession()
+    plan, elapsed = _timed(lambda: LinerCutEngine.solve(data, time_limit, args.max_cut_types, session=session,
+                                                        **options))
+    print(f"随机 {args.lengths} 规格实例（{args.backend}），首次计算 {elapsed:.2f}s  {plan['bars']} 根原材料")
+    for name, order in _edited_orders(data, args.seed):
+        fresh, fresh_time = _timed(lambda: LinerCutEngine.solve(order, time_limit, args.max_cut_types, **options))
+        incremental, incremental_time = _timed(lambda: LinerCutEngine.solve(order, time_limit, args.max_cut_types,
+                                                                            session=session, **options))
+        print(f"  {name:<8}: 重新计算 {fresh_time:7.2f}s {fresh['bars']:>5} 根  |  "
+              f"增量 {incremental_time:7.2f}s {incremental['bars']:>5} 根")
+
+
+def bench_service(args):
+    orders = [generate_instance(args.lengths, seed=args.seed + i) for i in range(args.orders)]
+    time_limit = args.time_limit * 1000
+    _, local_time = _timed(lambda: [LinerCutEngine.solve(data, time_limit, args.max_cut_types, result_cache=False)
+                                        for data in orders])
+
+    server = LinerCutService.create_server(port=0, workers=args.workers, queue_size=args.queue)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = LinerCutService.ServiceClient(f"127.0.0.1:{server.server_address[1]}")
+    start = time.perf_counter()
+    pending, retries, latencies = list(orders), 0, []
+    jobs = {}
+    try:
+        while pending or jobs:
+            while pending:
+                try:
+                    jobs[client.submit(pending[0], time_limit, args.max_cut_types,
+                                       reuse_result=False)] = time.perf_counter()
+                    pending.pop(0)
+                except LinerCutService.ServiceBusy:
+                    retries += 1
+                    break
+            for job_id in list(jobs):
+                if client.status(job_id)["finished"] is not None:
+                    latencies.append(time.perf_counter() - jobs.pop(job_id))
+            time.sleep(0.1)
+        service_time = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.service.close()
+    print(f"{args.orders} 个 {args.lengths} 规格的随机订单，服务 {server.service.workers} 个工作进程、排队 {args.queue}")
+    print(f"  本进程逐个求解: {local_time:8.2f}s")
+    print(f"  提交给服务    : {service_time:8.2f}s  单个任务最长 {max(latencies):.2f}s  排队已满被拒 {retries} 次")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LinerCut 性能基准")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    patterns_parser = subparsers.add_parser("patterns", help="切割模式枚举")
+    patterns_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    patterns_parser.set_defaults(func=bench_patterns)
+
+    colgen_parser = subparsers.add_parser("colgen", help="列生成")
+    colgen_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    colgen_parser.add_argument("--lengths", type=int, default=40, help="随机实例的需求规格数")
+    colgen_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    colgen_parser.add_argument("--time-limit", type=int, default=60, help="整数求解时间（秒）")
+    colgen_parser.set_defaults(func=bench_colgen)
+
+    arcflow_parser = subparsers.add_parser("arcflow", help="弧流模型")
+    arcflow_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    arcflow_parser.add_argument("--lengths", type=int, default=12, help="随机实例的需求规格数")
+    arcflow_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    arcflow_parser.add_argument("--time-limit", type=int, default=60, help="求解时间（秒）")
+    arcflow_parser.set_defaults(func=bench_arcflow)
+
+    dominance_parser = subparsers.add_parser("dominance", help="极大模式过滤")
+    dominance_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    dominance_parser.add_argument("--lengths", type=int, default=18, help="随机实例的需求规格数")
+    dominance_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    dominance_parser.add_argument("--time-limit", type=int, default=60, help="求解时间（秒）")
+    dominance_parser.set_defaults(func=bench_dominance)
+
+    backends_parser = subparsers.add_parser("backends", help="求解器后端")
+    backends_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    backends_parser.add_argument("--lengths", type=int, default=18, help="随机实例的需求规格数")
+    backends_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    backends_parser.add_argument("--time-limit", type=int, default=60, help="求解时间（秒）")
+    backends_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="CP-SAT 线程数")
+    backends_parser.set_defaults(func=bench_backends)
+
+    heuristic_parser = subparsers.add_parser("heuristic", help="快速启发式")
+    heuristic_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    heuristic_parser.add_argument("--lengths", type=int, default=12, help="随机实例的需求规格数")
+    heuristic_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    heuristic_parser.add_argument("--time-limit", type=int, default=60, help="精确模型的求解时间（秒）")
+    heuristic_parser.add_argument("--budgets", type=float, nargs="+", default=[0.2, 1.0, 3.0],
+                                  help="启发式的时间预算（秒）")
+    heuristic_parser.set_defaults(func=bench_heuristic)
+
+    warmstart_parser = subparsers.add_parser("warmstart", help="热启动和下界")
+    warmstart_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    warmstart_parser.add_argument("--lengths", type=int, nargs="+", default=[12, 18], help="随机实例的需求规格数")
+    warmstart_parser.add_argument("--short-lengths", type=int, nargs="*", default=[10],
+                                  help="短料随机实例的需求规格数")
+    warmstart_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    warmstart_parser.add_argument("--time-limit", type=int, default=60, help="求解时间（秒）")
+    warmstart_parser.add_argument("--backend", default="SCIP", choices=["SCIP", "CP-SAT"], help="求解器")
+    warmstart_parser.add_argument("--warm-time", type=float, default=None,
+                                  help="启发式时间（秒），默认和 solve 一样按模型大小定，0 为不做热启动")
+    warmstart_parser.add_argument("--gap", type=float, default=0.0, help="允许的相对间隙")
+    warmstart_parser.set_defaults(func=bench_warmstart)
+
+    build_parser = subparsers.add_parser("build", help="建模时间")
+    build_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    build_parser.add_argument("--lengths", type=int, nargs="+", default=[18, 24, 30], help="随机实例的需求规格数")
+    build_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    build_parser.set_defaults(func=bench_build)
+
+    memory_parser = subparsers.add_parser("memory", help="模式存储内存")
+    memory_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    memory_parser.add_argument("--lengths", type=int, nargs="+", default=[18, 30], help="随机实例的需求规格数")
+    memory_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    memory_parser.set_defaults(func=bench_memory)
+
+    cache_parser = subparsers.add_parser("cache", help="模式磁盘缓存")
+    cache_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    cache_parser.add_argument("--lengths", type=int, default=24, help="随机实例的需求规格数")
+    cache_parser.add_argument("--drop", type=int, default=2, help="近似重复订单比原订单少的规格数")
+    cache_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    cache_parser.set_defaults(func=bench_cache)
+
+    parallel_parser = subparsers.add_parser("parallel", help="并行模式枚举")
+    parallel_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    parallel_parser.add_argument("--lengths", type=int, default=40, help="随机实例的需求规格数")
+    parallel_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    parallel_parser.add_argument("--workers", type=int, nargs="+", default=[2, os.cpu_count() or 1],
+                                 help="进程数")
+    parallel_parser.set_defaults(func=bench_parallel)
+
+    derive_parser = subparsers.add_parser("derive", help="由最长原材料的模式得到较短原材料的模式")
+    derive_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    derive_parser.add_argument("--lengths", type=int, nargs="+", default=[24, 30], help="随机实例的需求规格数")
+    derive_parser.add_argument("--extra-stock", type=int, nargs="*", default=[5800, 5600, 5200, 4800, 4500, 4000, 3600],
+                               help="另外加入的原材料长度（常见的一单有 3-10 种原材料）")
+    derive_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    derive_parser.set_defaults(func=bench_derive)
+
+    presolve_parser = subparsers.add_parser("presolve", help="预处理")
+    presolve_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    presolve_parser.add_argument("--lengths", type=int, nargs="+", default=[24, 30], help="随机订单的需求规格数")
+    presolve_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    presolve_parser.set_defaults(func=bench_presolve)
+
+    estimate_parser = subparsers.add_parser("estimate", help="枚举规模估计")
+    estimate_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    estimate_parser.add_argument("--lengths", type=int, nargs="+", default=[18, 24, 30], help="随机实例的需求规格数")
+    estimate_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    estimate_parser.set_defaults(func=bench_estimate)
+
+    spill_parser = subparsers.add_parser("spill", help="模式写入磁盘")
+    spill_parser.add_argument("--max-cut-types", type=int, default=4, help="调锯次数")
+    spill_parser.add_argument("--lengths", type=int, default=16, help="短件规格数")
+    spill_parser.add_argument("--stock", type=int, nargs="+", default=[12000, 6000], help="原材料长度")
+    spill_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    spill_parser.set_defaults(func=bench_spill)
+
+    report_parser = subparsers.add_parser("report", help="结果解析")
+    report_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    report_parser.add_argument("--lengths", type=int, nargs="+", default=[18, 24], help="随机实例的需求规格数")
+    report_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    report_parser.set_defaults(func=bench_report)
+
+    excel_parser = subparsers.add_parser("excel", help="写 Excel 报告")
+    excel_parser.add_argument("--bars", type=int, nargs="+", default=[1000, 10000, 50000], help="方案的原材料根数")
+    excel_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    excel_parser.set_defaults(func=bench_excel)
+
+    detail_parser = subparsers.add_parser("detail", help="详细记录按模式合并")
+    detail_parser.add_argument("--bars", type=int, nargs="+", default=[10000, 100000], help="方案的原材料根数")
+    detail_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    detail_parser.set_defaults(func=bench_detail)
+
+    worker_parser = subparsers.add_parser("worker", help="子进程计算时的界面响应")
+    worker_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    worker_parser.add_argument("--lengths", type=int, default=20, help="随机实例的需求规格数")
+    worker_parser.add_argument("--time-limit", type=int, default=10, help="求解时间限制（秒）")
+    worker_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    worker_parser.set_defaults(func=bench_worker)
+
+    batch_parser = subparsers.add_parser("batch", help="命令行批量模式")
+    batch_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    batch_parser.add_argument("--orders", type=int, default=8, help="订单数")
+    batch_parser.add_argument("--lengths", type=int, default=12, help="每个订单的需求规格数")
+    batch_parser.add_argument("--time-limit", type=int, default=10, help="每个订单的求解时间限制（秒）")
+    batch_parser.add_argument("--workers", type=int, help="进程池大小，默认等于 CPU 核数")
+    batch_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    batch_parser.set_defaults(func=bench_batch)
+
+    service_parser = subparsers.add_parser("service", help="本机优化服务")
+    service_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    service_parser.add_argument("--orders", type=int, default=6, help="订单数")
+    service_parser.add_argument("--lengths", type=int, default=12, help="每个订单的需求规格数")
+    service_parser.add_argument("--time-limit", type=int, default=10, help="每个订单的求解时间限制（秒）")
+    service_parser.add_argument("--workers", type=int, help="服务的工作进程数，默认等于 CPU 核数")
+    service_parser.add_argument("--queue", type=int, default=2, help="服务最多排队的任务数")
+    service_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    service_parser.set_defaults(func=bench_service)
+
+    result_parser = subparsers.add_parser("result", help="整个方案的结果缓存")
+    result_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    result_parser.add_argument("--lengths", type=int, nargs="+", default=[8, 15], help="随机实例的需求规格数")
+    result_parser.add_argument("--time-limit", type=int, default=10, help="求解时间限制（秒）")
+    result_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    result_parser.set_defaults(func=bench_result)
+
+    incremental_parser = subparsers.add_parser("incremental", help="订单小改后增量求解")
+    incremental_parser.add_argument("--max-cut-types", type=int, default=5, help="调锯次数")
+    incremental_parser.add_argument("--lengths", type=int, default=20, help="随机实例的需求规格数")
+    incremental_parser.add_argument("--time-limit", type=int, default=30, help="求解时间限制（秒）")
+    incremental_parser.add_argument("--backend", default="SCIP", choices=["SCIP", "CP-SAT"], help="整数规划求解器")
+    incremental_parser.add_argument("--seed", type=int, default=0, help="随机实例的种子")
+    incremental_parser.set_defaults(func=bench_incremental)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()